@@ -31,20 +31,25 @@ Created on 13 Feb 2014
 """
 
 import os
+import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
 import shutil
-import struct
 import itertools
 from datetime import datetime
+import numpy as np
 import yaml
 import mathutils
 import bpy
 import phobos.robotdictionary as robotdictionary
 import phobos.defs as defs
+import phobos.meshio as meshio
 import phobos.utils.blender as bUtils
 import phobos.utils.selection as sUtils
 import phobos.utils.naming as nUtils
 import phobos.utils.general as gUtils
-from phobos.utils.general import securepath, roundVector
+from phobos.utils.general import securepath
 from phobos.logging import log
 
 
@@ -67,138 +72,280 @@ xmlHeader = '<?xml version="1.0"?>\n<!-- created with Phobos ' + defs.version +
 xmlFooter = indent + '</robot>\n'
 
 
-def exportBobj(path, obj):
-    """This function exports an object to the specified path as a .bobj
+def deriveMeshBuffers(mesh, polygons=False):
+    """This function pulls the vertex and tessellated face data of a mesh into flat arrays in bulk.
 
-    :param path: The path to export the object to. *without filename!*
-    :type path: str
-    :param obj: The blender object you want to export.
-    :type: bpy.types.Object
+    :param mesh: The (evaluated) mesh to read the data from.
+    :type mesh: bpy.types.Mesh
+    :param polygons: If True, the polygons are read as well, see meshio.mesh.from_polygons.
+    :type polygons: bool
+    :return: dict -- arrays for 'coords', 'vertexnormals', 'facevertices', 'facesmooth', 'facenormals' and 'faceuvs',
+        with polygons also for 'loops', 'loopstart', 'looptotal', 'polysmooth', 'polynormals' and 'loopuvs'.
 
     """
-    bpy.ops.object.select_all(action='DESELECT')
-    obj.select = True
-    bpy.context.scene.objects.active = obj
-    #TODO: make this exception-handled
-    totverts = totuvco = totno = 1
+    nverts = len(mesh.vertices)
+    nfaces = len(mesh.tessfaces)
+    buffers = {'coords': np.empty(nverts * 3, dtype=np.float32),
+               'vertexnormals': np.empty(nverts * 3, dtype=np.float32),
+               'facevertices': np.empty(nfaces * 4, dtype=np.int32),
+               'facesmooth': np.empty(nfaces, dtype=bool),
+               'facenormals': np.empty(nfaces * 3, dtype=np.float32),
+               'faceuvs': None}
+    mesh.vertices.foreach_get('co', buffers['coords'])
+    mesh.vertices.foreach_get('normal', buffers['vertexnormals'])
+    mesh.tessfaces.foreach_get('vertices_raw', buffers['facevertices'])
+    mesh.tessfaces.foreach_get('use_smooth', buffers['facesmooth'])
+    mesh.tessfaces.foreach_get('normal', buffers['facenormals'])
+    if len(mesh.tessface_uv_textures):
+        buffers['faceuvs'] = np.empty(nfaces * 8, dtype=np.float32)
+        mesh.tessface_uv_textures.active.data.foreach_get('uv_raw', buffers['faceuvs'])
+    if polygons:
+        nloops = len(mesh.loops)
+        npolygons = len(mesh.polygons)
+        buffers.update({'loops': np.empty(nloops, dtype=np.int32),
+                        'loopstart': np.empty(npolygons, dtype=np.int32),
+                        'looptotal': np.empty(npolygons, dtype=np.int32),
+                        'polysmooth': np.empty(npolygons, dtype=bool),
+                        'polynormals': np.empty(npolygons * 3, dtype=np.float32),
+                        'loopuvs': None})
+        mesh.loops.foreach_get('vertex_index', buffers['loops'])
+        mesh.polygons.foreach_get('loop_start', buffers['loopstart'])
+        mesh.polygons.foreach_get('loop_total', buffers['looptotal'])
+        mesh.polygons.foreach_get('use_smooth', buffers['polysmooth'])
+        mesh.polygons.foreach_get('normal', buffers['polynormals'])
+        if len(mesh.uv_layers):
+            buffers['loopuvs'] = np.empty(nloops * 2, dtype=np.float32)
+            mesh.uv_layers.active.data.foreach_get('uv', buffers['loopuvs'])
+    return buffers
+
+
+# the keys of the buffers converted by meshio.mesh.from_tessfaces and meshio.mesh.from_polygons
+tessfaceBufferKeys = ('coords', 'vertexnormals', 'facevertices', 'facesmooth', 'facenormals', 'faceuvs')
+polygonBufferKeys = ('coords', 'vertexnormals', 'loops', 'loopstart', 'looptotal', 'polysmooth', 'polynormals',
+                     'loopuvs')
+
+
+def evaluateMesh(obj, modifiers=True, polygons=False):
+    """This function evaluates the mesh of an object and returns its buffers.
+
+    The temporary mesh is removed again, so the scene is left unchanged. .bobj files are written with the modifiers
+    applied, while .obj, .stl and .dae files contain the plain mesh data, as Blender's exporters used to be run on a
+    temporary object without modifiers.
+
+    :param obj: The blender object whose mesh to evaluate.
+    :type obj: bpy.types.Object
+    :param modifiers: If True, the modifiers of the object are applied to the mesh.
+    :type modifiers: bool
+    :param polygons: If True, the polygons are read as well, which .obj and .dae files keep.
+    :type polygons: bool
+    :return: dict -- the mesh buffers as returned by deriveMeshBuffers.
 
-    globalNormals = {}
+    """
+    mesh = obj.to_mesh(bpy.context.scene, modifiers, 'PREVIEW')
+    mesh.calc_normals()
+    buffers = deriveMeshBuffers(mesh, polygons)
+    bpy.data.meshes.remove(mesh)
+    return buffers
+
+
+def encodeBobj(coords, vertexnormals, facevertices, facesmooth, facenormals, faceuvs=None, version=1,
+               compression=None, quantize=False, indexed=False, optimizecache=False):
+    """This function encodes mesh buffers as the sections of a .bobj file.
+
+    The buffers are converted with meshio.mesh.from_tessfaces, see doc/bobj.md for the layout of both format
+    versions.
+
+    :param coords: The vertex coordinates as returned by deriveMeshBuffers.
+    :param vertexnormals: The vertex normals.
+    :param facevertices: The four vertex indices of each face, the last being 0 for triangles.
+    :param facesmooth: The smooth flag of each face.
+    :param facenormals: The face normals.
+    :param faceuvs: The four uv coordinates of each face, or None if the mesh has no uv layer.
+    :param version: The .bobj format version to write, 1 or 2.
+    :type version: int
+    :param compression: The compression of the version 2 sections, None, 'zlib' or 'lzma'.
+    :type compression: str
+    :param quantize: If True, version 2 vertices and normals are stored as 16 bit integers.
+    :type quantize: bool
+    :param indexed: If True, version 2 files store a welded vertex stream with one index per triangle corner.
+    :type indexed: bool
+    :param optimizecache: If True, the triangles of an indexed vertex stream are reordered for the vertex cache.
+    :type optimizecache: bool
+    :return: list -- the bytes of the file sections.
 
-    # ignore dupli children
-    if obj.parent and obj.parent.dupli_type in {'VERTS', 'FACES'}:
-        print(nUtils.getObjectName(obj), 'is a dupli child - ignoring')
-        return
+    """
+    if indexed and version == 2:
+        # weld the corners from the buffers, rather than from the index triples of a version 1 encoding
+        return meshio.bobj.pack_indexed(*meshio.mesh.weld_tessfaces(coords, vertexnormals, facevertices, facesmooth,
+                                                                    facenormals, faceuvs),
+                                        compression=compression, quantize=quantize, optimize_cache=optimizecache)
+    mesh = meshio.mesh.from_tessfaces(coords, vertexnormals, facevertices, facesmooth, facenormals, faceuvs)
+    return meshio.bobj.pack(mesh['vertices'], mesh['uvs'], mesh['normals'], mesh['faces'], version, compression,
+                            quantize, indexed, optimizecache)
 
-    mesh = obj.to_mesh(bpy.context.scene, True, 'PREVIEW') #Jan Paul: ", True)": calculate tesselation faces added as test
-    #mesh.transform(obj.matrix_world)
 
-    faceuv = len(mesh.uv_textures)
-    if faceuv:
-        uv_layer = mesh.uv_textures.active.data[:]
+def writeMeshFile(filepath, fmt, buffers, name='mesh', bobjoptions=None, mesh=None):
+    """This function encodes mesh buffers in one of the mesh formats and writes them to a file.
 
-    if bpy.app.version[0] * 100 + bpy.app.version[1] >= 265:
-        face_index_pairs = [(face, index) for index, face in enumerate(mesh.tessfaces)]
+    It only works on the buffers and does not access Blender data, so it can run in a worker thread while the main
+    thread evaluates further meshes.
+
+    :param filepath: The path of the file to write.
+    :type filepath: str
+    :param fmt: The mesh format, one of 'bobj', 'obj', 'stl' or 'dae'.
+    :type fmt: str
+    :param buffers: The mesh buffers as returned by deriveMeshBuffers.
+    :type buffers: dict
+    :param name: The object name written to .obj and .dae files.
+    :type name: str
+    :param bobjoptions: The keyword arguments for encodeBobj, as returned by bobjExportOptions.
+    :type bobjoptions: dict
+    :param mesh: The buffers converted by meshio.mesh.from_tessfaces, which is done here if not given. .obj and .dae
+        files are converted by meshio.mesh.from_polygons instead if the buffers contain the polygons.
+    :type mesh: dict
+    :return: dict -- the converted mesh, to be reused for further formats of the same buffers.
+
+    """
+    if fmt == 'stl':
+        # binary stl only needs the triangle corners, which are cheaper to get from the buffers directly
+        with open(filepath, "wb") as out:
+            out.write(meshio.stl.encode(meshio.mesh.triangle_corners(buffers['coords'], buffers['facevertices'])))
+        return mesh
+    if fmt not in ('bobj', 'obj', 'dae'):
+        raise ValueError('Unknown mesh format ' + fmt)
+    options = bobjoptions or {}
+    if fmt == 'bobj' and options.get('indexed', False):
+        # indexed files are welded from the buffers directly and need no converted mesh
+        with open(filepath, "wb") as out:
+            for section in encodeBobj(**dict({key: buffers[key] for key in tessfaceBufferKeys}, **options)):
+                out.write(section)
+        return mesh
+    # .obj and .dae files keep polygons like Blender's exporters, the other formats only hold triangles
+    polygonal = fmt in ('obj', 'dae') and 'loops' in buffers
+    if mesh is None or ('polygons' in mesh) != polygonal:
+        if polygonal:
+            mesh = meshio.mesh.from_polygons(**{key: buffers[key] for key in polygonBufferKeys})
+        else:
+            mesh = meshio.mesh.from_tessfaces(**{key: buffers[key] for key in tessfaceBufferKeys})
+    if fmt == 'bobj':
+        with open(filepath, "wb") as out:
+            for section in meshio.bobj.pack(mesh['vertices'], mesh['uvs'], mesh['normals'], mesh['faces'],
+                                            options.get('version', 1), options.get('compression'),
+                                            options.get('quantize', False), options.get('indexed', False),
+                                            options.get('optimizecache', False)):
+                out.write(section)
+    elif fmt == 'obj':
+        objmesh = dict(mesh)
+        # x, y, z becomes x, z, -y, as with axis_forward='-Z' and axis_up='Y' of the operator
+        for key in ('vertices', 'normals'):
+            objmesh[key] = mesh[key][:, [0, 2, 1]] * np.array((1, 1, -1), dtype=np.float32)
+        meshio.obj.write(filepath, objmesh, name=name)
     else:
-        face_index_pairs = [(face, index) for index, face in enumerate(mesh.faces)]
+        meshio.dae.write(filepath, mesh, name=name)
+    return mesh
 
-    mesh.calc_normals()
 
-    me_verts = mesh.vertices[:]
+def writeMeshFiles(files, buffers, name='mesh', bobjoptions=None):
+    """This function writes the same mesh buffers to files of several formats, converting them only once.
 
-    out = open(os.path.join(path, obj.data.name + "." + 'bobj'), "wb")
+    :param files: The formats to write, as a list of (format, filepath) tuples.
+    :type files: list
+    :param buffers: The mesh buffers as returned by deriveMeshBuffers.
+    :type buffers: dict
+    :param name: The object name written to .obj and .dae files.
+    :type name: str
+    :param bobjoptions: The keyword arguments for encodeBobj, as returned by bobjExportOptions.
+    :type bobjoptions: dict
 
-    for v in mesh.vertices:
-        out.write(struct.pack('ifff', 1, v.co[0], v.co[1], v.co[2]))
+    """
+    mesh = None
+    for fmt, filepath in files:
+        mesh = writeMeshFile(filepath, fmt, buffers, name, bobjoptions, mesh)
 
-    if faceuv:
-        uv = uvkey = f_index = uv_index = None
 
-        #uv_face_mapping = [[0, 0, 0, 0]] * len(face_index_pairs)  # a bit of a waste for tri's :/
-        uv_face_mapping = [[0, 0, 0, 0] for i in range(len(face_index_pairs))]
+def isDupliChild(obj):
+    """This function checks whether an object is instanced by the vertices or faces of its parent.
 
-        uv_dict = {}  # could use a set() here
-        if bpy.app.version[1] >= 65:
-            uv_layer = mesh.tessface_uv_textures.active.data[:]
-        else:
-            uv_layer = mesh.uv_textures.active.data
-        for f, f_index in face_index_pairs:
-            for uv_index, uv in enumerate(uv_layer[f_index].uv):
-                uvkey = round(uv[0], 6), round(uv[1], 6)
-                try:
-                    uv_face_mapping[f_index][uv_index] = uv_dict[uvkey]
-                except:  # TODO: what can really go wrong here?
-                    uv_face_mapping[f_index][uv_index] = uv_dict[uvkey] = len(uv_dict)
-                    out.write(struct.pack('iff', 2, uv[0], uv[1]))
-
-        del uv, uvkey, uv_dict, f_index, uv_index
-
-    for f, f_index in face_index_pairs:
-        if f.use_smooth:
-            for v_idx in f.vertices:
-                v = me_verts[v_idx]
-                noKey = roundVector(v.normal, 6)
-                if noKey not in globalNormals:
-                    globalNormals[noKey] = totno
-                    totno += 1
-                    out.write(struct.pack('ifff', 3, noKey[0], noKey[1], noKey[2]))
-        else:
-            # Hard, 1 normal from the face.
-            noKey = roundVector(f.normal, 6)
-            if noKey not in globalNormals:
-                globalNormals[noKey] = totno
-                totno += 1
-                out.write(struct.pack('ifff', 3, noKey[0], noKey[1], noKey[2]))
+    :param obj: The blender object to check.
+    :type obj: bpy.types.Object
+    :return: bool -- True if the object is a dupli child.
 
-    for f, f_index in face_index_pairs:
-        f_smooth = f.use_smooth
-        # write smooth info for face?
+    """
+    return bool(obj.parent and obj.parent.dupli_type in {'VERTS', 'FACES'})
 
-        f_v_orig = [(vi, me_verts[v_idx]) for vi, v_idx in enumerate(f.vertices)]
 
-        if len(f_v_orig) == 3:
-            f_v_iter = (f_v_orig, )
-        else:
-            f_v_iter = (f_v_orig[0], f_v_orig[1], f_v_orig[2]), (f_v_orig[0], f_v_orig[2], f_v_orig[3])
-
-        for f_v in f_v_iter:
-            da = struct.pack('i', 4)
-            out.write(da)
-
-            if faceuv:
-                if f_smooth:  # Smoothed, use vertex normals
-                    for vi, v in f_v:
-                        out.write(struct.pack('iii', v.index + totverts, totuvco + uv_face_mapping[f_index][vi],
-                                              globalNormals[roundVector(v.normal, 6)]))
-                else:  # No smoothing, face normals
-                    no = globalNormals[roundVector(f.normal, 6)]
-                    for vi, v in f_v:
-                        out.write(struct.pack('iii', v.index + totverts, totuvco + uv_face_mapping[f_index][vi], no))
-            else:  # No UV's
-                if f_smooth:  # Smoothed, use vertex normals
-                    for vi, v in f_v:
-                        out.write(struct.pack('iii', v.index + totverts, 0, globalNormals[roundVector(v.normal, 6)]))
-                else:  # No smoothing, face normals
-                    no = globalNormals[roundVector(f.normal, 6)]
-                    for vi, v in f_v:
-                        out.write(struct.pack('iii', v.index + totverts, 0, no))
-    out.close()
-
-
-def exportObj(path, obj):
+def bobjExportOptions():
+    """This function returns the .bobj format options chosen in the export settings of the world.
+
+    :return: dict -- the keyword arguments for exportBobj.
+
+    """
+    world = bpy.data.worlds[0]
+    if not world.useBobjV2:
+        return {'version': 1}
+    return {'version': 2,
+            'compression': None if world.bobjCompression == 'none' else world.bobjCompression,
+            'quantize': world.bobjQuantize,
+            'indexed': world.bobjIndexed,
+            'optimizecache': world.bobjIndexed and world.bobjOptimizeCache}
+
+
+def exportBobj(path, obj, version=1, compression=None, quantize=False, indexed=False, optimizecache=False):
+    """This function exports an object to the specified path as a .bobj
+
+    :param path: The path to export the object to. *without filename!*
+    :type path: str
+    :param obj: The blender object you want to export.
+    :type: bpy.types.Object
+    :param version: The .bobj format version to write, 1 or 2.
+    :type version: int
+    :param compression: The compression of the version 2 sections, None, 'zlib' or 'lzma'.
+    :type compression: str
+    :param quantize: If True, version 2 vertices and normals are stored as 16 bit integers.
+    :type quantize: bool
+    :param indexed: If True, version 2 files store a welded vertex stream with one index per triangle corner.
+    :type indexed: bool
+    :param optimizecache: If True, the triangles of an indexed vertex stream are reordered for the vertex cache.
+    :type optimizecache: bool
+
+    """
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select = True
+    bpy.context.scene.objects.active = obj
+
+    # ignore dupli children
+    if isDupliChild(obj):
+        print(nUtils.getObjectName(obj), 'is a dupli child - ignoring')
+        return
+
+    writeMeshFile(os.path.join(path, obj.data.name + "." + 'bobj'), 'bobj', evaluateMesh(obj),
+                  bobjoptions={'version': version, 'compression': compression, 'quantize': quantize,
+                               'indexed': indexed, 'optimizecache': optimizecache})
+
+
+def exportObj(path, obj, native=True):
     """This function exports a specific object to a chosen path as an .obj
 
+    By default the mesh data without modifiers is written directly, converted to the Y-up axes of Blender's .obj
+    exporter, without touching the selection or object names. With native=False, Blender's exporter is run on a temporary object.
+
     :param path: The path you want the object export to. *without the filename!*
     :type path: str
     :param obj: The blender object you want to export.
     :type obj: bpy.types.Object
+    :param native: If True, the mesh is written directly instead of using the .obj operator.
+    :type native: bool
 
     """
     objname = nUtils.getObjectName(obj)
+    outpath = os.path.join(path, obj.data.name + "." + 'obj')
+    if native:
+        writeMeshFile(outpath, 'obj', evaluateMesh(obj, modifiers=False, polygons=True), objname)
+        return
     tmpobjname = obj.name
     obj.name = 'tmp_export_666'  # surely no one will ever name an object like so
     tmpobject = bUtils.createPrimitive(objname, 'box', (1.0, 1.0, 1.0))
     tmpobject.data = obj.data  # copy the mesh here
-    outpath = os.path.join(path, obj.data.name + "." + 'obj')
     bpy.ops.export_scene.obj(filepath=outpath, use_selection=True, use_normals=True, use_materials=False,
                              use_mesh_modifiers=True)
     bpy.ops.object.select_all(action='DESELECT')
@@ -208,7 +355,10 @@ def exportObj(path, obj):
 
 
 def exportStl(path, obj):
-    """This function exports a specific object to a chosen path as a .stl
+    """This function exports a specific object to a chosen path as a binary .stl
+
+    The triangles of the mesh data without modifiers are written in bulk in object coordinates, without creating
+    temporary objects, calling operators or changing the selection.
 
     :param path: The path you want the object exported to. *without filename!*
     :type path: str
@@ -216,36 +366,32 @@ def exportStl(path, obj):
     :type obj: bpy.types.Object
 
     """
-    objname = nUtils.getObjectName(obj)
-    tmpobjname = obj.name
-    print("OBJNAME: " + objname)
-    obj.name = 'tmp_export_666'  # surely no one will ever name an object like so
-    tmpobject = bUtils.createPrimitive(objname, 'box', (1.0, 1.0, 1.0))
-    tmpobject.data = obj.data  # copy the mesh here
-    outpath = os.path.join(path, obj.data.name + "." + 'stl')
-    bpy.ops.export_mesh.stl(filepath=outpath, use_selection=True, use_mesh_modifiers=True)
-    bpy.ops.object.select_all(action='DESELECT')
-    tmpobject.select = True
-    bpy.ops.object.delete()
-    obj.name = tmpobjname
+    writeMeshFile(os.path.join(path, obj.data.name + "." + 'stl'), 'stl', evaluateMesh(obj, modifiers=False))
 
 
-def exportDae(path, obj):
+def exportDae(path, obj, native=True):
     """This function exports a specific object to a chosen path as a .dae
 
+    By default the mesh data without modifiers is written directly as a minimal COLLADA document with a single
+    geometry, without touching the selection or object names. With native=False, Blender's exporter is run on a temporary object.
+
     :param path: The path you want the object exported to. *without filename!*
     :type path: str
     :param obj: The blender object you want to export.
     :type obj: bpy.types.Object
+    :param native: If True, the mesh is written directly instead of using the COLLADA operator.
+    :type native: bool
 
     """
     objname = nUtils.getObjectName(obj)
+    outpath = os.path.join(path, obj.data.name + "." + 'dae')
+    if native:
+        writeMeshFile(outpath, 'dae', evaluateMesh(obj, modifiers=False, polygons=True), objname)
+        return
     tmpobjname = obj.name
-    print("OBJNAME: " + objname)
     obj.name = 'tmp_export_666'  # surely no one will ever name an object like so
     tmpobject = bUtils.createPrimitive(objname, 'box', (1.0, 1.0, 1.0))
     tmpobject.data = obj.data  # copy the mesh here
-    outpath = os.path.join(path, obj.data.name + "." + 'dae')
     bpy.ops.object.select_all(action='DESELECT')
     tmpobject.select = True
     bpy.ops.wm.collada_export(filepath=outpath, selected=True)
@@ -255,46 +401,137 @@ def exportDae(path, obj):
     obj.name = tmpobjname
 
 
-def bakeModel(objlist, path, modelname):
+# name of the file in the mesh export folder recording the geometry hash of every mesh file
+meshCacheFile = '.phobos_meshcache.json'
+# bump this to invalidate existing caches whenever the output of a mesh writer changes
+meshCacheVersion = 2
+
+
+def hashMeshBuffers(buffers, *extra):
+    """This function computes a content hash of mesh buffers and any additional values determining the exported file.
+
+    :param buffers: The mesh buffers as returned by deriveMeshBuffers.
+    :type buffers: dict
+    :param extra: Further values to include in the hash, e.g. format and export options.
+    :return: str -- the hex digest of the hash.
+
+    """
+    meshhash = hashlib.sha1(repr((meshCacheVersion,) + extra).encode('utf-8'))
+    for key in sorted(buffers):
+        if buffers[key] is not None:
+            meshhash.update(key.encode('utf-8'))
+            meshhash.update(np.ascontiguousarray(buffers[key]).tobytes())
+    return meshhash.hexdigest()
+
+
+def loadMeshCache(path):
+    """This function loads the mesh export cache of a mesh export folder.
+
+    :param path: The mesh export folder.
+    :type path: str
+    :return: dict -- the hash and file size of every mesh file, keyed by file name.
+
+    """
+    try:
+        with open(os.path.join(path, meshCacheFile), 'r') as cachefile:
+            return json.load(cachefile)
+    except (IOError, ValueError):
+        return {}
+
+
+def saveMeshCache(path, cache):
+    """This function saves the mesh export cache of a mesh export folder.
+
+    :param path: The mesh export folder.
+    :type path: str
+    :param cache: The hash and file size of every mesh file, keyed by file name.
+    :type cache: dict
+
+    """
+    with open(os.path.join(path, meshCacheFile), 'w') as cachefile:
+        json.dump(cache, cachefile, indent=0, sort_keys=True)
+
+
+def isCached(cache, path, filename, meshhash):
+    """This function checks whether a mesh file in the export folder is up to date according to the mesh cache.
+
+    :param cache: The mesh export cache.
+    :type cache: dict
+    :param path: The mesh export folder.
+    :type path: str
+    :param filename: The name of the mesh file.
+    :type filename: str
+    :param meshhash: The hash of the mesh to be written to the file.
+    :type meshhash: str
+    :return: bool -- True if the file exists and was written from a mesh with the same hash.
+
+    """
+    entry = cache.get(filename)
+    filepath = os.path.join(path, filename)
+    return (entry is not None and entry['hash'] == meshhash and os.path.isfile(filepath) and
+            os.path.getsize(filepath) == entry['size'])
+
+
+def bakeBuffers(objlist):
+    """This function merges the evaluated meshes of the visual objects in a list into one triangle mesh in world space.
+
+    Only the mesh buffers are read, no objects are created or deleted.
+
+    :param objlist: The list of blender objects whose visuals to merge.
+    :type objlist: list
+    :return: tuple -- the vertices (N, 3) and 0-based triangles (T, 3) of the merged mesh.
+
+    """
+    vertices = []
+    triangles = []
+    offset = 0
+    for obj in objlist:
+        if obj.type != 'MESH' or "phobostype" not in obj or obj.phobostype != "visual":
+            continue
+        buffers = evaluateMesh(obj)
+        facevertices = buffers['facevertices'].reshape(-1, 4)
+        faceindex, slots = meshio.mesh.split_quads(facevertices)
+        objtriangles = facevertices[faceindex, slots]
+        matrix = np.array(obj.matrix_world)
+        coords = buffers['coords'].reshape(-1, 3).dot(matrix[:3, :3].T) + matrix[:3, 3]
+        # mirroring transforms turn the triangles inside out
+        if np.linalg.det(matrix[:3, :3]) < 0:
+            objtriangles = objtriangles[:, ::-1]
+        vertices.append(coords)
+        triangles.append(objtriangles + offset)
+        offset += len(coords)
+    if not vertices:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64)
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+
+def bakeModel(objlist, path, modelname, weld=0.0001, tolerance=0.001):
     """This function gets a list of objects and creates a single, simplified mesh from it and exports it to .stl.
 
+    The visuals are merged in world space, vertices closer than weld are merged and flat regions are decimated, all
+    on the mesh buffers, so the scene is left unchanged.
+
     :param objlist: The list of blender objects to join and export as simplified stl file.
     :type objlist: list
     :param path: The path to export the stl file to *without filename*
     :type path: str
     :param modelname: The new models name and filename.
     :type modelname: str
+    :param weld: The distance below which vertices are merged.
+    :type weld: float
+    :param tolerance: The average distance by which decimation may move the surface.
+    :type tolerance: float
 
     """
-    visuals = [o for o in objlist if ("phobostype" in o and o.phobostype == "visual")]
-    sUtils.selectObjects(visuals, active=0)
-    log("Copying objects for joining...", "INFO")
-    print("Copying objects for joining...")
-    bpy.ops.object.duplicate(linked=False, mode='TRANSLATION')
-    log("joining...", "INFO")
-    print("joining...")
-    bpy.ops.object.join()
-    obj = bpy.context.active_object
-    log("Deleting vertices...", "INFO")
-    print("Deleting vertices...")
-    bpy.ops.object.editmode_toggle()
-    bpy.ops.mesh.select_all(action='TOGGLE')
-    bpy.ops.mesh.select_all(action='TOGGLE')
-    bpy.ops.mesh.remove_doubles()
-    bpy.ops.object.editmode_toggle()
-    log("Adding modifier...", "INFO")
-    print("Adding modifier...")
-    bpy.ops.object.modifier_add(type='DECIMATE')
-    bpy.context.object.modifiers["Decimate"].decimate_type = 'DISSOLVE'
-    log("Applying modifier...", "INFO")
-    print("Applying modifier...")
-    bpy.ops.object.modifier_apply(apply_as='DATA', modifier="Decimate")
-    obj.name = modelname + "_bake.stl"
-    bpy.ops.export_mesh.stl(filepath=os.path.join(path, obj.name))
-    obj.select = True
-    bpy.ops.object.delete()
-    log("Done baking...", "INFO")
-    print("Done baking...")
+    log("Merging visuals...", "INFO", "bakeModel")
+    vertices, triangles = bakeBuffers(objlist)
+    log("Welding " + str(len(vertices)) + " vertices...", "INFO", "bakeModel")
+    triangles = meshio.mesh.weld(vertices, weld)[triangles]
+    log("Decimating " + str(len(triangles)) + " triangles...", "INFO", "bakeModel")
+    vertices, triangles = meshio.decimate.decimate(vertices, triangles, ratio=0.0, tolerance=tolerance)
+    with open(os.path.join(path, modelname + "_bake.stl"), 'wb') as outputfile:
+        outputfile.write(meshio.stl.encode(vertices[triangles]))
+    log("Done baking " + str(len(triangles)) + " triangles.", "INFO", "bakeModel")
 
 
 def exportModelToYAML(model, filepath):
@@ -1125,16 +1362,16 @@ def deriveHeightmapEntity(heightmap, outpath):
         heightmapMesh.modifiers["displace_heightmap"].show_render = False
         heightmapMesh.modifiers["displace_heightmap"].show_viewport = False
         if bpy.data.worlds[0].useObj:
-            exportObj(outpath, heightmapMesh)
+            exportObj(outpath, heightmapMesh, not bpy.data.worlds[0].useMeshOperators)
             filename = os.path.join("heightmaps", exMesh.name + ".obj")
         elif bpy.data.worlds[0].useBobj:
-            exportBobj(outpath, heightmapMesh)
+            exportBobj(outpath, heightmapMesh, **bobjExportOptions())
             filename = os.path.join("heightmaps", exMesh.name + ".bobj")
         elif bpy.data.worlds[0].useStl:
             exportStl(outpath, heightmapMesh)
             filename = os.path.join("heightmaps", exMesh.name + ".stl")
         elif bpy.data.worlds[0].useDae:
-            exportDae(outpath, heightmapMesh)
+            exportDae(outpath, heightmapMesh, not bpy.data.worlds[0].useMeshOperators)
             filename = os.path.join("heightmaps", exMesh.name + ".dae")
         else:
             log("No mesh export type checked! Aborting heightmap export.", "ERROR", __name__+".handleScene_heightmap")
@@ -1244,8 +1481,11 @@ def export(model, objectlist, path=None):
     texexp = bpy.data.worlds[0].exportTextures
     objexp = bpy.data.worlds[0].useObj
     bobjexp = bpy.data.worlds[0].useBobj
+    bobjoptions = bobjExportOptions()
     stlexp = bpy.data.worlds[0].useStl
     daeexp = bpy.data.worlds[0].useDae
+    nativemeshexp = not bpy.data.worlds[0].useMeshOperators
+    meshcache = bpy.data.worlds[0].useMeshCache
 
     # export data
     if yaml or urdf or smurf:
@@ -1283,26 +1523,79 @@ def export(model, objectlist, path=None):
                 log("Undefined geometry type in object " + obj.name + ", skipping mesh export", "ERROR", "export")
 
         if exportobjects:  # if there are meshes to export
+            # the export options of each format, which are part of the mesh hash
+            formats = [(fmt, options) for fmt, used, options in (('obj', objexp, nativemeshexp),
+                                                                 ('bobj', bobjexp, sorted(bobjoptions.items())),
+                                                                 ('stl', stlexp, None),
+                                                                 ('dae', daeexp, nativemeshexp)) if used]
             show_progress = bpy.app.version[0] * 100 + bpy.app.version[1] >= 269
             if show_progress:
                 wm = bpy.context.window_manager
-                wm.progress_begin(0, float(len(exportobjects)))
+                wm.progress_begin(0, float(len(exportobjects) * len(formats)))
                 i = 1
             log("Exporting " + str(len(exportobjects)) + " meshes to " + meshoutpath + "...", "INFO", "export")
-            for expobj in exportobjects:
-                if objexp:
-                    exportObj(meshoutpath, expobj)
-                if bobjexp:
-                    exportBobj(meshoutpath, expobj)
-                if stlexp:
-                    exportStl(meshoutpath, expobj)
-                if daeexp:
-                    exportDae(meshoutpath, expobj)
-                if show_progress:
-                    wm.progress_update(i)
-                    i += 1
+            cache = loadMeshCache(meshoutpath) if meshcache else {}
+            hits = []
+            written = []
+            jobs = {}
+            workers = bpy.data.worlds[0].meshExportWorkers or multiprocessing.cpu_count()
+            # threads rather than processes, as Blender can not run worker processes; the encoders spend most of their
+            # time in numpy and compression, which release the GIL (see doc/importexport.md)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for expobj in exportobjects:
+                    # only evaluating the mesh needs Blender, encoding and writing the files is left to the pool
+                    objname = nUtils.getObjectName(expobj)
+                    # the buffers with and without modifiers, see evaluateMesh
+                    sources = {}
+                    # all formats of a mesh sharing buffers are written by one job sharing the converted mesh
+                    files = {}
+                    for fmt, options in formats:
+                        filename = expobj.data.name + "." + fmt
+                        modifiers = fmt == 'bobj'
+                        if modifiers not in sources:
+                            sources[modifiers] = evaluateMesh(expobj, modifiers, polygons=not modifiers)
+                        buffers = sources[modifiers]
+                        meshhash = hashMeshBuffers(buffers, fmt, options, objname) if meshcache else None
+                        if fmt == 'bobj' and isDupliChild(expobj):
+                            log(objname + " is a dupli child - ignoring", "DEBUG", "export")
+                        elif meshcache and isCached(cache, meshoutpath, filename, meshhash):
+                            hits.append(filename)
+                        elif fmt in ('obj', 'dae') and not nativemeshexp:
+                            # Blender's exporters have to run on the main thread
+                            (exportObj if fmt == 'obj' else exportDae)(meshoutpath, expobj, False)
+                            written.append((filename, meshhash))
+                        else:
+                            files.setdefault(modifiers, []).append((fmt, filename, meshhash))
+                            continue
+                        if show_progress:
+                            wm.progress_update(i)
+                            i += 1
+                    for modifiers, group in files.items():
+                        filepaths = [(fmt, os.path.join(meshoutpath, filename)) for fmt, filename, meshhash in group]
+                        future = pool.submit(writeMeshFiles, filepaths, sources[modifiers], objname, bobjoptions)
+                        jobs[future] = [(filename, meshhash) for fmt, filename, meshhash in group]
+                for future in as_completed(jobs):
+                    try:
+                        future.result()
+                        written.extend(jobs[future])
+                    except Exception as error:
+                        log("Could not export " + ", ".join(filename for filename, meshhash in jobs[future]) + ": " +
+                            str(error), "ERROR", "export")
+                    if show_progress:
+                        i += len(jobs[future])
+                        wm.progress_update(i - 1)
+            for filename, meshhash in written:
+                if meshcache and os.path.isfile(os.path.join(meshoutpath, filename)):
+                    cache[filename] = {'hash': meshhash, 'size': os.path.getsize(os.path.join(meshoutpath, filename))}
             if show_progress:
                 wm.progress_end()
+            if meshcache:
+                saveMeshCache(meshoutpath, cache)
+                log("Mesh cache: " + str(len(hits)) + " unchanged meshes skipped, " + str(len(written)) +
+                    " meshes written", "INFO", "export")
+                if written:
+                    log("Meshes written: " + ", ".join(sorted(filename for filename, meshhash in written)), "DEBUG",
+                        "export")
 
     if texexp:
         log("Exporting textures to " + os.path.join(outpath, 'textures') + "...", "INFO", "export")
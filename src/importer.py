@@ -31,16 +31,20 @@ import mathutils
 import os
 import yaml
 import math
-from collections import namedtuple
+from collections import namedtuple, deque
 import xml.etree.ElementTree as ET
 import zipfile
-import shutil
 import re
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 import phobos.defs as defs
 import phobos.materials as materials
 
 import phobos.bobj_import as bobj_import
+import phobos.meshio as meshio
 import phobos.joints as joints
 import phobos.sensors as sensors
 import phobos.controllers as controllers
@@ -60,7 +64,10 @@ defaults = Defaults(0.001, #mass
 MARScolordict = {'diffuseFront': 'diffuseColor',
                  'specularFront': 'specularColor'}
 
-tmp_dir_name = 'phobos_magic_zip_tmp_dir'
+# content hashes of mesh files keyed on (path, size, mtime) and the mesh datablocks created from them
+meshFileHashes = {}
+importedMeshes = {}
+meshArraysVersion = 1
 
 def register():
     """This function is called when this module is registered to blender.
@@ -336,13 +343,526 @@ def handle_missing_geometry(no_visual_geo, no_collision_geo, link_dict):
 #     return mathutils.Matrix(rotation_matrix).to_4x4()
 
 def import_bobj(filepath):
-    """This function calls the bobj import function with the given filepath and no other parameters.
+    """This function calls the bobj import function with the given filepath. Files larger than
+    meshio.bobj.mmap_threshold are memory-mapped to keep the memory footprint close to the file size.
 
     :param filepath: The path to the bobj file.
     :type filepath: str
+    :return: list -- the imported objects.
 
     """
-    bobj_import.load(filepath)
+    return bobj_import.load(filepath, use_mmap=os.path.getsize(filepath) > meshio.bobj.mmap_threshold)
+
+def hashMeshFile(filepath, data=None):
+    """This function returns the sha1 hash of the content of a mesh file. Hashes are remembered for the
+    absolute path, size and modification time of the file, so an unchanged file is only read once per session.
+
+    :param filepath: The path to the mesh file.
+    :type filepath: str
+    :param data: The content of the file if it was already read.
+    :type data: bytes
+    :return: str
+
+    """
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    key = (filepath, stat.st_size, stat.st_mtime)
+    if key not in meshFileHashes:
+        if data is not None:
+            meshFileHashes[key] = hashlib.sha1(data).hexdigest()
+        else:
+            sha = hashlib.sha1()
+            with open(filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(chunk)
+            meshFileHashes[key] = sha.hexdigest()
+    return meshFileHashes[key]
+
+def meshArrays(mesh):
+    """This function reads the vertices, polygons, smooth flags and active uv layer of a mesh into numpy arrays.
+
+    :param mesh: The mesh to read.
+    :type mesh: bpy.types.Mesh
+    :return: dict
+
+    """
+    arrays = {'vertices': np.empty(len(mesh.vertices) * 3, dtype=np.float32),
+              'loops': np.empty(len(mesh.loops), dtype=np.int32),
+              'loopstart': np.empty(len(mesh.polygons), dtype=np.int32),
+              'looptotal': np.empty(len(mesh.polygons), dtype=np.int32)}
+    mesh.vertices.foreach_get('co', arrays['vertices'])
+    mesh.loops.foreach_get('vertex_index', arrays['loops'])
+    mesh.polygons.foreach_get('loop_start', arrays['loopstart'])
+    mesh.polygons.foreach_get('loop_total', arrays['looptotal'])
+    smooth = [False] * len(mesh.polygons)
+    mesh.polygons.foreach_get('use_smooth', smooth)
+    arrays['smooth'] = np.array(smooth, dtype=bool)
+    if mesh.uv_layers.active is not None:
+        arrays['uvs'] = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get('uv', arrays['uvs'])
+    return arrays
+
+def meshFromArrays(name, arrays):
+    """This function creates a new mesh from the arrays returned by meshArrays.
+
+    :param name: The name of the new mesh.
+    :type name: str
+    :param arrays: The arrays to create the mesh from.
+    :type arrays: dict
+    :return: bpy.types.Mesh
+
+    """
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays['vertices']) // 3)
+    mesh.vertices.foreach_set('co', arrays['vertices'])
+    mesh.loops.add(len(arrays['loops']))
+    mesh.loops.foreach_set('vertex_index', arrays['loops'])
+    mesh.polygons.add(len(arrays['loopstart']))
+    mesh.polygons.foreach_set('loop_start', arrays['loopstart'])
+    mesh.polygons.foreach_set('loop_total', arrays['looptotal'])
+    mesh.polygons.foreach_set('use_smooth', arrays['smooth'].tolist())
+    if 'uvs' in arrays:
+        mesh.uv_textures.new()
+        mesh.uv_layers[-1].data.foreach_set('uv', arrays['uvs'])
+    mesh.validate()
+    mesh.update(calc_edges=True)
+    return mesh
+
+def loadMeshArrays(cachedir, meshkey):
+    """This function loads the arrays of a mesh saved by saveMeshArrays.
+
+    :param cachedir: The directory of the mesh cache.
+    :type cachedir: str
+    :param meshkey: The key of the mesh.
+    :type meshkey: str
+    :return: dict -- or None if the mesh is not in the cache.
+
+    """
+    cachefile = os.path.join(cachedir, meshkey + '.npz')
+    if not os.path.isfile(cachefile):
+        return None
+    try:
+        with np.load(cachefile) as data:
+            if int(data['version']) != meshArraysVersion:
+                return None
+            return {name: data[name] for name in data.files if name != 'version'}
+    except (IOError, ValueError, KeyError) as e:
+        log("Could not read cached mesh " + cachefile + ": " + str(e), "WARNING", "importer:loadMeshArrays")
+        return None
+
+def saveMeshArrays(cachedir, meshkey, arrays):
+    """This function saves the arrays of a mesh to the mesh cache.
+
+    :param cachedir: The directory of the mesh cache.
+    :type cachedir: str
+    :param meshkey: The key of the mesh.
+    :type meshkey: str
+    :param arrays: The arrays returned by meshArrays.
+    :type arrays: dict
+
+    """
+    cachefile = os.path.join(cachedir, meshkey + '.npz')
+    try:
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+        with open(cachefile + '.tmp', 'wb') as f:
+            np.savez(f, version=meshArraysVersion, **arrays)
+        os.replace(cachefile + '.tmp', cachefile)
+    except (IOError, OSError) as e:
+        log("Could not write cached mesh " + cachefile + ": " + str(e), "WARNING", "importer:saveMeshArrays")
+
+def meshImportCache():
+    """This function returns the absolute path of the persistent mesh cache set in the world, or None if it is disabled.
+
+    :return: str
+
+    """
+    cachedir = bpy.data.worlds[0].meshImportCache
+    return bpy.path.abspath(cachedir) if cachedir else None
+
+def decodeMeshFile(filepath, filetype):
+    """This function imports a mesh file with the importer of its type and returns the mesh of the
+    imported object with the object's transformation applied. The object itself is removed.
+
+    :param filepath: The path to the mesh file.
+    :type filepath: str
+    :param filetype: The lower case extension of the mesh file.
+    :type filetype: str
+    :return: bpy.types.Mesh -- or None if nothing was imported.
+
+    """
+    # the importers select the objects they create
+    bpy.ops.object.select_all(action='DESELECT')
+    if filetype == 'obj':
+        bpy.ops.import_scene.obj(filepath=filepath)
+        newobjs = bpy.context.selected_objects
+    elif filetype == 'stl':
+        bpy.ops.import_mesh.stl(filepath=filepath)
+        newobjs = bpy.context.selected_objects
+    elif filetype == 'bobj':
+        try:
+            newobjs = import_bobj(filepath)
+        except ValueError as e:
+            log("Could not read " + filepath + ": " + str(e), "ERROR", "importer:decodeMeshFile")
+            newobjs = []
+    else:
+        log("Unknown mesh file type " + filetype + " of " + filepath, "ERROR", "importer:decodeMeshFile")
+        newobjs = []
+    if not newobjs:
+        return None
+    newobj = newobjs[-1]
+    #with obj file import, blender only turns the object, not the vertices,
+    #leaving a rotation in the matrix_basis, which we here get rid of
+    mesh = newobj.data
+    mesh.transform(newobj.matrix_basis)
+    bpy.context.scene.objects.unlink(newobj)
+    bpy.data.objects.remove(newobj)
+    return mesh
+
+def cachedMesh(meshkey, meshname, cachedir=None):
+    """This function returns the mesh of a mesh key if it was already imported in this session or, if
+    cachedir is given, creates it from the arrays kept in the persistent mesh cache.
+
+    :param meshkey: The content hash and lower case extension of the mesh file.
+    :type meshkey: str
+    :param meshname: The name given to a newly created mesh.
+    :type meshname: str
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: bpy.types.Mesh -- or None if the mesh is in neither cache.
+
+    """
+    if meshkey in importedMeshes:
+        mesh = bpy.data.meshes.get(importedMeshes[meshkey])
+        if mesh is not None and mesh.get('phobosMeshKey') == meshkey:
+            return mesh
+    arrays = loadMeshArrays(cachedir, meshkey) if cachedir else None
+    if arrays is not None:
+        return addImportedMesh(meshkey, meshFromArrays(meshname, arrays))
+    return None
+
+def addImportedMesh(meshkey, mesh, cachedir=None, arrays=None):
+    """This function remembers a newly imported mesh for its mesh key and, if cachedir is given, saves
+    its arrays to the persistent mesh cache.
+
+    :param meshkey: The content hash and lower case extension of the mesh file.
+    :type meshkey: str
+    :param mesh: The imported mesh.
+    :type mesh: bpy.types.Mesh
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :param arrays: The arrays the mesh was created from, read from the mesh if None.
+    :type arrays: dict
+    :return: bpy.types.Mesh -- the mesh.
+
+    """
+    if cachedir:
+        saveMeshArrays(cachedir, meshkey, arrays if arrays is not None else meshArrays(mesh))
+    mesh['phobosMeshKey'] = meshkey
+    importedMeshes[meshkey] = mesh.name
+    return mesh
+
+def importMesh(filepath, meshname, cachedir=None):
+    """This function returns a mesh with the geometry of a mesh file. Files with the same content share
+    one mesh per session, no matter their names. If cachedir is given, the decoded arrays of the mesh
+    are kept there, so that later sessions do not have to decode the file again.
+
+    :param filepath: The path to the mesh file.
+    :type filepath: str
+    :param meshname: The name given to a newly created mesh.
+    :type meshname: str
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: bpy.types.Mesh -- or None if the file could not be imported.
+
+    """
+    filetype = os.path.splitext(filepath)[1][1:].lower()
+    meshkey = hashMeshFile(filepath) + '.' + filetype
+    mesh = cachedMesh(meshkey, meshname, cachedir)
+    if mesh is None:
+        mesh = decodeMeshFile(filepath, filetype)
+        if mesh is not None:
+            mesh.name = meshname
+            addImportedMesh(meshkey, mesh, cachedir)
+    return mesh
+
+def decodeMeshData(data, filename):
+    """This function decodes the content of a mesh file into the arrays meshFromArrays creates a mesh from.
+    It does not use bpy, so several meshes can be decoded in worker threads.
+
+    :param data: The content of the mesh file.
+    :type data: bytes
+    :param filename: The name of the mesh file, whose extension determines the format.
+    :type filename: str
+    :return: dict
+    :raises ValueError: If the format is not supported or the data can not be decoded.
+
+    """
+    arrays = meshio.mesh.to_polygons(meshio.decode(data, filename))
+    if filename.lower().endswith('.obj'):
+        # .obj files are y-up, see exporter.writeMeshFile
+        vertices = arrays['vertices'].reshape(-1, 3)[:, [0, 2, 1]] * np.array((1, -1, 1), dtype=np.float32)
+        arrays['vertices'] = np.ascontiguousarray(vertices).ravel()
+    return arrays
+
+def decodeBobjFile(filepath):
+    """This function decodes a .bobj file into the arrays meshFromArrays creates a mesh from. Files larger than
+    meshio.bobj.mmap_threshold are memory-mapped, so their content is never held in memory as a whole.
+    It does not use bpy.
+
+    :param filepath: The path to the .bobj file.
+    :type filepath: str
+    :return: dict
+    :raises ValueError: If the file can not be decoded.
+
+    """
+    return meshio.mesh.to_polygons(meshio.bobj.read(filepath,
+                                                    use_mmap=os.path.getsize(filepath) > meshio.bobj.mmap_threshold))
+
+def isMeshCached(meshkey, cachedir=None):
+    """This function returns whether the mesh of a mesh key was already imported in this session or is kept in
+    the persistent mesh cache. It does not use bpy.
+
+    :param meshkey: The content hash and lower case extension of the mesh file.
+    :type meshkey: str
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: bool
+
+    """
+    return meshkey in importedMeshes or bool(cachedir and os.path.isfile(os.path.join(cachedir, meshkey + '.npz')))
+
+def decodeMeshMember(meshkey, data, filename, cachedir=None):
+    """This function returns the mesh key of a mesh file and its decoded arrays, which are None if the mesh
+    was already imported in this session or is kept in the persistent mesh cache. It does not use bpy.
+
+    :param meshkey: The content hash and lower case extension of the mesh file.
+    :type meshkey: str
+    :param data: The content of the mesh file.
+    :type data: bytes
+    :param filename: The name of the mesh file.
+    :type filename: str
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: tuple
+
+    """
+    if isMeshCached(meshkey, cachedir):
+        return meshkey, None
+    return meshkey, decodeMeshData(data, filename)
+
+# number of meshes per worker thread which are decoded ahead of createGeometry
+meshDecodingWindow = 2
+
+def startMeshDecoding(filenames, decode, read=None, workers=0):
+    """This function starts decoding mesh files in a pool of worker threads, in the order decodedMesh is
+    expected to ask for them. Only meshDecodingWindow meshes per worker are decoded ahead, so the arrays
+    of all meshes of a model are never held at once.
+
+    :param filenames: The file names of the meshes as given in the model.
+    :type filenames: list
+    :param decode: The function run in the pool, which returns the mesh key and decoded arrays of a file name
+        (see decodeMeshMember) or, if read is given, of a file name and the content read by read.
+    :type decode: function
+    :param read: The function reading the content of a file name on the main thread or None.
+    :type read: function
+    :param workers: The number of worker threads, 0 for one per CPU core.
+    :type workers: int
+    :return: dict -- the state of the decoding, to be passed on to decodedMesh and stopMeshDecoding.
+
+    """
+    workers = workers or multiprocessing.cpu_count()
+    decoding = {'decode': decode,
+                'read': read,
+                'pool': ThreadPoolExecutor(max_workers=workers),
+                'window': meshDecodingWindow * workers,
+                'queue': deque(),
+                'jobs': {},
+                'results': {}
+                }
+    queued = set()
+    for filename in filenames:
+        if filename not in queued:
+            queued.add(filename)
+            decoding['queue'].append(filename)
+    fillMeshDecoding(decoding)
+    return decoding
+
+def submitMeshDecoding(decoding, filename):
+    """This function submits the decoding of a mesh file to the pool of a mesh decoding.
+
+    :param decoding: The mesh decoding as returned by startMeshDecoding.
+    :type decoding: dict
+    :param filename: The file name of the mesh as given in the model.
+    :type filename: str
+    :return: concurrent.futures.Future
+
+    """
+    if decoding['read'] is None:
+        return decoding['pool'].submit(decoding['decode'], filename)
+    # the content is read on the main thread, e.g. as members of a zipfile can not be read concurrently
+    return decoding['pool'].submit(decoding['decode'], filename, decoding['read'](filename))
+
+def fillMeshDecoding(decoding):
+    """This function submits queued mesh files to the pool of a mesh decoding until its window is full.
+
+    :param decoding: The mesh decoding as returned by startMeshDecoding.
+    :type decoding: dict
+
+    """
+    while decoding['queue'] and len(decoding['jobs']) < decoding['window']:
+        filename = decoding['queue'].popleft()
+        try:
+            decoding['jobs'][filename] = submitMeshDecoding(decoding, filename)
+        except (KeyError, IOError, OSError) as e:
+            log("Could not read " + filename + ": " + str(e), "WARNING", "importer:fillMeshDecoding")
+            decoding['results'][filename] = (None, None)
+
+def decodedMesh(decoding, filename):
+    """This function returns the mesh key and decoded arrays of a mesh file. It waits for the worker decoding
+    the file or, if the file is not queued, submits it right away. The arrays are only returned once, as they
+    are not needed anymore when the mesh exists; later calls return None instead.
+
+    :param decoding: The mesh decoding as returned by startMeshDecoding.
+    :type decoding: dict
+    :param filename: The file name of the mesh as given in the model.
+    :type filename: str
+    :return: tuple -- (None, None) if the file could not be read or decoded.
+
+    """
+    results = decoding['results']
+    if filename not in results:
+        job = decoding['jobs'].pop(filename, None)
+        try:
+            if job is None:
+                if filename in decoding['queue']:
+                    decoding['queue'].remove(filename)
+                job = submitMeshDecoding(decoding, filename)
+            results[filename] = job.result()
+        except (KeyError, IOError, OSError, ValueError) as e:
+            log("Could not decode " + filename + ": " + str(e), "WARNING", "importer:decodedMesh")
+            results[filename] = (None, None)
+        fillMeshDecoding(decoding)
+    meshkey, arrays = results[filename]
+    results[filename] = (meshkey, None)
+    return meshkey, arrays
+
+def stopMeshDecoding(decoding):
+    """This function cancels the pending jobs of a mesh decoding and stops its pool.
+
+    :param decoding: The mesh decoding as returned by startMeshDecoding.
+    :type decoding: dict
+
+    """
+    for job in decoding['jobs'].values():
+        job.cancel()
+    decoding['pool'].shutdown()
+    decoding['jobs'].clear()
+    decoding['queue'].clear()
+
+def decodeArchiveMesh(filename, data, cachedir=None):
+    """This function returns the mesh key and decoded arrays of a mesh file read from the archive of a zipped
+    model, see decodeMeshMember. It does not use bpy.
+
+    :param filename: The file name of the mesh in the archive.
+    :type filename: str
+    :param data: The content of the file.
+    :type data: bytes
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: tuple
+
+    """
+    meshkey = hashlib.sha1(data).hexdigest() + os.path.splitext(filename)[1].lower()
+    return decodeMeshMember(meshkey, data, filename, cachedir)
+
+def decodeMeshArrays(filepath):
+    """This function returns the decoded arrays of a mesh file, no matter whether it is cached.
+    .bobj files are decoded from the file rather than from its content read whole. It does not use bpy.
+
+    :param filepath: The path to the mesh file.
+    :type filepath: str
+    :return: dict
+    :raises ValueError: If the format is not supported or the file can not be decoded.
+
+    """
+    if filepath.lower().endswith('.bobj'):
+        return decodeBobjFile(filepath)
+    with open(filepath, 'rb') as f:
+        return decodeMeshData(f.read(), filepath)
+
+def decodeLooseMesh(filepath, cachedir=None):
+    """This function returns the mesh key and decoded arrays of a mesh file on the file system, see
+    decodeMeshMember. .obj files with materials or normals are left to Blender's importer, as meshFromArrays
+    keeps neither, and give (None, None). It does not use bpy.
+
+    :param filepath: The path to the mesh file.
+    :type filepath: str
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: tuple
+
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == '.bobj':
+        # .bobj files are hashed in chunks and only read if they are not cached
+        meshkey = hashMeshFile(filepath) + extension
+        if isMeshCached(meshkey, cachedir):
+            return meshkey, None
+        return meshkey, decodeBobjFile(filepath)
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if extension == '.obj' and (meshio.obj.material_libraries(data) or meshio.obj.has_normals(data)):
+        return None, None
+    return decodeMeshMember(hashMeshFile(filepath, data) + extension, data, filepath, cachedir)
+
+def importDecodedMesh(meshkey, arrays, meshname, decode, cachedir=None):
+    """This function returns a mesh with the geometry of a decoded mesh file, see importMesh.
+
+    :param meshkey: The content hash and lower case extension of the mesh file.
+    :type meshkey: str
+    :param arrays: The decoded arrays of the mesh file or None if it is cached.
+    :type arrays: dict
+    :param meshname: The name given to a newly created mesh.
+    :type meshname: str
+    :param decode: The function returning the decoded arrays if the mesh is not in the caches after all.
+    :type decode: function
+    :param cachedir: The directory of the persistent mesh cache or None.
+    :type cachedir: str
+    :return: bpy.types.Mesh -- or None if the mesh could not be decoded.
+
+    """
+    mesh = cachedMesh(meshkey, meshname, cachedir)
+    if mesh is None:
+        if arrays is None:
+            try:
+                arrays = decode()
+            except (KeyError, IOError, OSError, ValueError) as e:
+                log("Could not decode mesh " + meshname + ": " + str(e), "WARNING", "importer:importDecodedMesh")
+                return None
+        mesh = addImportedMesh(meshkey, meshFromArrays(meshname, arrays), cachedir, arrays)
+    return mesh
+
+def meshFilepath(path, filename):
+    """This function returns the path of a mesh file of a model.
+
+    :param path: The directory mesh file names are relative to.
+    :type path: str
+    :param filename: The file name of the mesh as given in the model.
+    :type filename: str
+    :return: str
+
+    """
+    filepath = os.path.join(path, filename)
+    # Remove 'urdf/package://{package_name}' to workaround the lack
+    # of rospack here. This supposes that the urdf file is in the
+    # urdf folder and that the meshes are in the meshes folder at
+    # the same level as the urdf folder.
+    if 'package://' in filepath:
+       filepath = re.sub(r'(.*)urdf/package://([^/]+)/(.*)',
+                         '\\1\\3',
+                         filepath)
+    return filepath
 
 def get_phobos_joint_name(mars_name, has_limits):
     """This function gets a mars joint name and returns the corresponding urdf joint type.
@@ -386,12 +906,79 @@ class RobotModelParser():
                       'groups': {},
                       'chains': {}
                       }
-        if os.access(self.path, os.W_OK):
-            self.tmp_path = self.path
-        elif os.access(os.path.expanduser('.'), os.W_OK):
-            self.tmp_path = os.path.expanduser('.')
-        else:
-            raise Exception('WTF? No write permission for home dir.')
+        self.archive = None
+        self.meshdecoding = None
+
+    def meshArchive(self):
+        """This function returns the archive of a zipped model, which is opened only once.
+
+        :return: zipfile.ZipFile
+
+        """
+        if self.archive is None:
+            self.archive = zipfile.ZipFile(self.filepath)
+        return self.archive
+
+    def meshDecoding(self):
+        """This function returns the decoding of the mesh files of the model, which is started on first use.
+        Meshes of zipped models are decoded in memory, without extracting them to disk.
+
+        :return: dict -- see startMeshDecoding.
+
+        """
+        if self.meshdecoding is None:
+            cachedir = meshImportCache()
+            if getattr(self, 'zipped', False):
+                self.meshdecoding = startMeshDecoding(self.meshFilenames(),
+                                                      lambda filename, data: decodeArchiveMesh(filename, data, cachedir),
+                                                      read=self.meshArchive().read)
+            else:
+                self.meshdecoding = startMeshDecoding(self.meshFilenames(),
+                                                      lambda filename: decodeLooseMesh(meshFilepath(self.path, filename),
+                                                                                       cachedir))
+        return self.meshdecoding
+
+    def importModelMesh(self, filename, meshname):
+        """This function returns a mesh with the geometry of a mesh file of the model, see importMesh.
+        Files which are not decoded by the add-on are left to Blender's importers.
+
+        :param filename: The file name of the mesh as given in the model.
+        :type filename: str
+        :param meshname: The name given to a newly created mesh.
+        :type meshname: str
+        :return: bpy.types.Mesh -- or None if the file could not be imported.
+
+        """
+        cachedir = meshImportCache()
+        meshkey, arrays = decodedMesh(self.meshDecoding(), filename)
+        if getattr(self, 'zipped', False):
+            if meshkey is None:
+                return None
+            return importDecodedMesh(meshkey, arrays, meshname,
+                                     lambda: decodeMeshData(self.meshArchive().read(filename), filename), cachedir)
+        filepath = meshFilepath(self.path, filename)
+        mesh = None
+        if meshkey is not None:
+            mesh = importDecodedMesh(meshkey, arrays, meshname, lambda: decodeMeshArrays(filepath), cachedir)
+        if mesh is None and os.path.isfile(filepath):
+            # the persistent mesh cache holds neither materials nor normals, so it is not used for .obj files
+            mesh = importMesh(filepath, meshname, None if filename.lower().endswith('.obj') else cachedir)
+        return mesh
+
+    def meshFilenames(self):
+        """This function returns the file names of all meshes referenced by the visuals and collisions of the model.
+
+        :return: list
+
+        """
+        filenames = []
+        for link in self.robot['links'].values():
+            for geomsrc in ('visual', 'collision'):
+                for viscol in link.get(geomsrc, {}).values():
+                    geom = viscol.get('geometry', {})
+                    if geom.get('type') == 'mesh' and 'filename' in geom:
+                        filenames.append(geom['filename'])
+        return filenames
 
     def praefixNames(self, name, praefix):
         """This function takes a name and a praefix and praefixes the name with it if its not already praefixed with it.
@@ -575,70 +1162,21 @@ class RobotModelParser():
             geom = viscol['geometry']
             geomtype = geom['type']
             # create the Blender object
-            # tag all objects
-            for obj in bpy.data.objects:
-                obj['phobosTag'] = True
             if geomtype == 'mesh':
-                if hasattr(self, 'zipped') and self.zipped:
-                    if not os.path.isdir(os.path.join(self.tmp_path, tmp_dir_name)):
-                        os.mkdir(os.path.join(self.tmp_path, tmp_dir_name))
-                    archive = zipfile.ZipFile(self.filepath)
-                    archive.extract(geom['filename'], path=os.path.join(self.tmp_path, tmp_dir_name))
-                    geom_path = os.path.join(os.path.abspath(os.path.join(self.tmp_path, tmp_dir_name)), geom['filename'])
-                else:
-                    geom_path = os.path.join(self.path, geom['filename'])
-                # Remove 'urdf/package://{package_name}' to workaround the lack
-                # of rospack here. This supposes that the urdf file is in the
-                # urdf folder and that the meshes are in the meshes folder at
-                # the same level as the urdf folder.
-                if 'package://' in geom_path:
-                   geom_path = re.sub(r'(.*)urdf/package://([^/]+)/(.*)',
-                                      '\\1\\3',
-                                      geom_path)
-
                 bpy.context.scene.layers = blenderUtils.defLayers(defs.layerTypes[geomsrc])
                 meshname = "".join(os.path.basename(geom["filename"]).split(".")[:-1])
-                if not os.path.isfile(geom_path):
-                    log(geom_path + " is no file. Object " + self.praefixNames(viscol['name'], geomsrc) + " will have empty mesh!", "ERROR", "importer:createGeometry")
-                    bpy.data.meshes.new(meshname)
-                if meshname in bpy.data.meshes:
-                    bpy.ops.object.add(type='MESH')
-                    newgeom = bpy.context.object
-                    newgeom.data = bpy.data.meshes[meshname]
-                else:
-                    filetype = geom['filename'].split('.')[-1]
-                    if filetype == 'obj' or filetype == 'OBJ':
-                        bpy.ops.import_scene.obj(filepath=geom_path)
-                    elif filetype == 'stl' or filetype == 'STL':
-                        bpy.ops.import_mesh.stl(filepath=geom_path)
-                    # hack for test:
-                    elif filetype == 'bobj' or filetype == 'BOBJ':
-                        import_bobj(geom_path)
-                        #filename = geom['filename'].split('.')[0] + '.obj'
-                        #try:
-                        #    bpy.ops.import_scene.obj(filepath=os.path.join(self.path, filename))
-                        #except:
-                        #    print('ERROR: Missing object.')
-                        #    return
-                    # find the newly imported obj
-                    for obj in bpy.data.objects:
-                        if 'phobosTag' not in obj:
-                            newgeom = obj
-                            #with obj file import, blender only turns the object, not the vertices,
-                            #leaving a rotation in the matrix_basis, which we here get rid of
-                            if filetype == 'obj':
-                                bpy.ops.object.select_all(action='DESELECT')
-                                newgeom.select = True
-                                bpy.ops.object.transform_apply(rotation=True)
-                #print(viscol)
-                            newgeom['filename'] = geom['filename']
+                mesh = self.importModelMesh(geom['filename'], meshname)
+                if mesh is None:
+                    log(geom['filename'] + " could not be imported. Object " + self.praefixNames(viscol['name'], geomsrc) + " will have empty mesh!", "ERROR", "importer:createGeometry")
+                    mesh = bpy.data.meshes.new(meshname)
+                bpy.ops.object.add(type='MESH')
+                newgeom = bpy.context.object
+                newgeom.data = mesh
+                newgeom['filename'] = geom['filename']
                 #newgeom.select = True
                 #if 'scale' in geom:
                 #    newgeom.scale = geom['scale']
                 #bpy.ops.object.transform_apply(scale=True)
-                    for obj in bpy.data.objects:
-                        if 'phobosTag' in obj:
-                            del obj['phobosTag']
             elif geomtype == 'box':
                 dimensions = geom['size']
             elif geomtype == 'cylinder':
@@ -916,6 +1454,8 @@ class RobotModelParser():
 
         """
         print("\n\nCreating Blender model...")
+        print("Decoding meshes...")
+        self.meshDecoding()
         print("Creating links...")
         for l in self.robot['links']:
             #print(l + ', ', end='')
@@ -980,9 +1520,12 @@ class RobotModelParser():
 
         #self._apply_joint_angle_offsets()
 
-        # remove tmp dir containing extracted object files
-        if os.path.isdir(os.path.join(self.tmp_path, tmp_dir_name)):
-            shutil.rmtree(os.path.join(self.tmp_path, tmp_dir_name))
+        if self.meshdecoding is not None:
+            stopMeshDecoding(self.meshdecoding)
+            self.meshdecoding = None
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
 
         print('Done!')
 
@@ -1067,7 +1610,7 @@ class MARSModelParser(RobotModelParser):
 
         if self.zipped:
             filename = os.path.basename(self.filepath).split('.')[0] + '.scene'
-            archive = zipfile.ZipFile(self.filepath)
+            archive = self.meshArchive()
             zipfiles = archive.namelist()
             if filename not in zipfiles:
                 for zf in zipfiles:
@@ -29,14 +29,20 @@ File inertia.py
 Created on 13 Feb 2014
 """
 
-import math
+import json
+import hashlib
+from collections import OrderedDict
+import numpy as np
 import bpy
 import mathutils
 import phobos.defs as defs
+import phobos.meshio as meshio
+import phobos.inertiamath as inertiamath
 import phobos.utils.general as gUtils
 import phobos.utils.selection as sUtils
 import phobos.utils.blender as bUtils
 import phobos.utils.naming as nUtils
+import phobos.materials as materials
 from phobos.logging import log
 
 
@@ -104,14 +110,7 @@ def calculateBoxInertia(mass, size):
     :type size: double
     :return: tuple(6)
     """
-    i = mass / 12
-    ixx = i*(size[1]**2 + size[2]**2)
-    ixy = 0
-    ixz = 0
-    iyy = i*(size[0]**2 + size[2]**2)
-    iyz = 0
-    izz = i*(size[0]**2 + size[1]**2)
-    return ixx, ixy, ixz, iyy, iyz, izz
+    return tuple(inertiamath.to_list(inertiamath.box(mass, size)).tolist())
 
 
 def calculateCylinderInertia(mass, r, h):
@@ -125,14 +124,7 @@ def calculateCylinderInertia(mass, r, h):
     :type h: double
     :return: tuple(6)
     """
-    i = mass / 12 * (3 * r**2 + h**2)
-    ixx = i
-    ixy = 0
-    ixz = 0
-    iyy = i
-    iyz = 0
-    izz = 0.5 * mass * r**2
-    return ixx, ixy, ixz, iyy, iyz, izz
+    return tuple(inertiamath.to_list(inertiamath.cylinder(mass, r, h)).tolist())
 
 
 def calculateSphereInertia(mass, r):
@@ -144,14 +136,7 @@ def calculateSphereInertia(mass, r):
     :type r: double
     :return: tuple(6)
     """
-    i = 0.4 * mass * r**2
-    ixx = i
-    ixy = 0
-    ixz = 0
-    iyy = i
-    iyz = 0
-    izz = i
-    return ixx, ixy, ixz, iyy, iyz, izz
+    return tuple(inertiamath.to_list(inertiamath.sphere(mass, r)).tolist())
 
 
 def calculateCapsuleInertia(mass, r, h):
@@ -166,27 +151,7 @@ def calculateCapsuleInertia(mass, r, h):
     :param h: float.
     :return: tuple(6).
     """
-
-    cylinder_volume = math.pi * r**2 * h
-    hemisphere_volume = ((4/3) * math.pi * r**3) / 2
-    volume = cylinder_volume + 2*hemisphere_volume
-
-    cylinder_mass = mass / (volume / cylinder_volume)
-    hemisphere_mass = mass / (volume / hemisphere_volume)
-    cylinder_height = h - 2*r
-
-    temp0 = hemisphere_mass * 2.0 * r**2 / 5.0
-    temp1 = cylinder_height * 0.5
-    temp2 = temp0 + hemisphere_mass * (temp1**2 + 0.375 * cylinder_height * r)
-
-    ixx = (r**2 * cylinder_mass / 2.0) / 2.0 + cylinder_mass * cylinder_height**2 / 12.0 + temp2 * 2.0
-    ixy = 0
-    ixz = 0
-    iyy = ixx
-    iyz = 0
-    izz = r**2 * cylinder_mass / 2.0 + temp0 * 2.0
-
-    return ixx, ixy, ixz, iyy, iyz, izz
+    return tuple(inertiamath.to_list(inertiamath.capsule(mass, r, h)).tolist())
 
 
 def calculateEllipsoidInertia(mass, size):
@@ -198,17 +163,73 @@ def calculateEllipsoidInertia(mass, size):
     :type r: double
     :return: tuple(6)
     """
-    i = mass / 5
-    ixx = i*(size[1]**2 + size[2]**2)
-    ixy = 0
-    ixz = 0
-    iyy = i*(size[0]**2 + size[2]**2)
-    iyz = 0
-    izz = i*(size[0]**2 + size[1]**2)
-    return ixx, ixy, ixz, iyy, iyz, izz
+    return tuple(inertiamath.to_list(inertiamath.ellipsoid(mass, size)).tolist())
+
+
+# name of the text block in the .blend file recording the inertia of the meshes computed so far
+inertiaCacheText = 'phobos_inertia_cache'
+# number of meshes kept in the cache, the least recently used ones are dropped first
+inertiaCacheSize = 1000
+# bump this to invalidate existing caches whenever the inertia calculation changes
+inertiaCacheVersion = 2
 
 
-def calculateMeshInertia(data, mass):
+class InertiaCache(OrderedDict):
+    """The mesh inertia cache, an OrderedDict which remembers whether entries were added since it was loaded.
+
+    """
+
+    def __init__(self):
+        OrderedDict.__init__(self)
+        self.modified = False
+
+    def __setitem__(self, key, value):
+        OrderedDict.__setitem__(self, key, value)
+        self.modified = True
+
+
+def loadInertiaCache():
+    """Loads the mesh inertia cache from its text block in the .blend file.
+
+    :return: InertiaCache -- volume, center of mass and inertia for unit mass of every mesh, keyed by
+        geometry hash and ordered from least to most recently used.
+    """
+    cache = InertiaCache()
+    if inertiaCacheText in bpy.data.texts:
+        try:
+            data = json.loads(bpy.data.texts[inertiaCacheText].as_string())
+            if data['version'] == inertiaCacheVersion:
+                for key, volume, com, inertia in data['entries']:
+                    cache[key] = (volume, com, inertia)
+        except (ValueError, KeyError, TypeError):
+            log("Ignoring invalid inertia cache.", "WARNING", "loadInertiaCache")
+    cache.modified = False
+    return cache
+
+
+def saveInertiaCache(cache):
+    """Saves the mesh inertia cache to its text block in the .blend file, dropping the least recently used meshes
+    beyond inertiaCacheSize. The text block is only written if meshes were added or dropped, so the order of use
+    of meshes which were only looked up is saved with the next change.
+
+    :param cache: The mesh inertia cache as returned by loadInertiaCache.
+    :type cache: InertiaCache
+    """
+    dropped = len(cache) > inertiaCacheSize
+    while len(cache) > inertiaCacheSize:
+        cache.popitem(last=False)
+    if not (cache.modified or dropped):
+        return
+    text = bpy.data.texts.get(inertiaCacheText)
+    if text is None:
+        text = bpy.data.texts.new(inertiaCacheText)
+    text.clear()
+    text.write(json.dumps({'version': inertiaCacheVersion,
+                           'entries': [[key] + list(entry) for key, entry in cache.items()]}))
+    cache.modified = False
+
+
+def calculateMeshInertia(data, mass, cache=None):
     """
     Calculate the inertia tensor of arbitrary mesh objects.
 
@@ -220,102 +241,54 @@ def calculateMeshInertia(data, mass):
     Links: (1) http://number-none.com/blow/inertia/body_i.html
            (2) http://docsdrive.com/pdfs/sciencepublications/jmssp/2005/8-11.pdf
 
+    If a cache is given, meshes with the same geometry are only calculated once. The inertia is that of the mesh
+    coordinates, so neither the mass nor the scale of the object is part of the key.
+
     :param data: The mesh object's data.
     :type data: bpy.types.BlendData.
     :param mass: The object's mass.
     :type mass: float.
-    :return: tuple(6)
+    :param cache: The mesh inertia cache as returned by loadInertiaCache, or None.
+    :type cache: InertiaCache
+    :return: tuple(6) -- or None if the mesh encloses no volume.
     """
-    tetrahedra = []
-    mesh_volume = 0
-    origin = mathutils.Vector((0.0, 0.0, 0.0))
-
-    vertices = data.vertices
-    prev_mode = bpy.context.mode
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.quads_convert_to_tris(quad_method='FIXED')
-    bpy.ops.object.mode_set(mode=prev_mode)
-    polygons = data.polygons
-
-    for triangle in polygons:
-        verts = [vertices[index].co for index in triangle.vertices]
-
-        tri_normal = triangle.normal
-        tri_centre = triangle.center
-        ref_tri_vector = tri_centre - origin
-        normal_angle = ref_tri_vector.angle(tri_normal, 90)
-        if normal_angle > 90:
-            sign = -1
-        elif normal_angle == 90:
-            sign = 0
-        else:
-            sign = 1
-
-        J = mathutils.Matrix(((verts[0][0], verts[0][1], verts[0][2], 1),
-                              (verts[1][0], verts[1][1], verts[1][2], 1),
-                              (verts[2][0], verts[2][1], verts[2][2], 1),
-                              (origin[0], origin[1], origin[2], 1)))
-
-        abs_det_J = J.determinant()
-
-        volume = sign * abs_det_J / 6
-
-        centre_of_mass = mathutils.Vector(((verts[0][0] + verts[1][0] + verts[2][0] + origin[0]) / 4,
-                                           (verts[0][1] + verts[1][1] + verts[2][1] + origin[1]) / 4,
-                                           (verts[0][2] + verts[1][2] + verts[2][2] + origin[2]) / 4))
-
-        tetrahedra.append({'sign': sign, 'abs(det(J))': abs_det_J, 'J': J, 'centre_of_mass': centre_of_mass})
-        mesh_volume += volume
-
-    d = mass / mesh_volume
-    i = mathutils.Matrix().to_3x3()
-    i.zero()
-    for tetrahedron in tetrahedra:
-
-        J = tetrahedron['J']
-        x1 = J[0][0]
-        y1 = J[0][1]
-        z1 = J[0][2]
-        x2 = J[1][0]
-        y2 = J[1][1]
-        z2 = J[1][2]
-        x3 = J[2][0]
-        y3 = J[2][1]
-        z3 = J[2][2]
-        x4 = J[3][0]
-        y4 = J[3][1]
-        z4 = J[3][2]
-
-        abs_det_J = tetrahedron['abs(det(J))']
-        sign = tetrahedron['sign']
-
-        a = sign * d * abs_det_J * (y1**2 + y1*y2 + y2**2 + y1*y3 + y2*y3 + y3**2
-            + y1*y4 + y2*y4 + y3*y4 + y4**2 + z1**2 + z1*z2 + z2**2 + z1*z3
-            + z2*z3 + z3**2 + z1*z4 + z2*z4 + z3*z4 + z4**2) / 60
-
-        b = sign * d * abs_det_J * (x1**2 + x1*x2 + x2**2 + x1*x3 + x2*x3 + x3**2
-            + x1*x4 + x2*x4 + x3*x4 + x4**2 + z1**2 + z1*z2 + z2**2 + z1*z3
-            + z2*z3 + z3**2 + z1*z4 + z2*z4 + z3*z4 + z4**2) / 60
-
-        c = sign * d * abs_det_J * (x1**2 + x1*x2 + x2**2 + x1*x3 + x2*x3 + x3**2
-            + x1*x4 + x2*x4 + x3*x4 + x4**2 + y1**2 + y1*y2 + y2**2 + y1*y3
-            + y2*y3 + y3**2 + y1*y4 + y2*y4 + y3*y4 + y4**2) / 60
-
-        a_bar = sign * d * abs_det_J * (2*y1*z1 + y2*z1 + y3*z1 + y4*z1 + y1*z2
-                + 2*y2*z2 + y3*z2 + y4*z2 + y1*z3 + y2*z3 + 2*y3*z3
-                + y4*z3 + y1*z4 + y2*z4 + y3*z4 + 2*y4*z4) / 120
-
-        b_bar = sign * d * abs_det_J * (2*x1*z1 + x2*z1 + x3*z1 + x4*z1 + x1*z2
-                + 2*x2*z2 + x3*z2 + x4*z2 + x1*z3 + x2*z3 + 2*x3*z3
-                + x4*z3 + x1*z4 + x2*z4 + x3*z4 + 2*x4*z4) / 120
-
-        c_bar = sign * d * abs_det_J * (2*x1*y1 + x2*y1 + x3*y1 + x4*y1 + x1*y2
-                + 2*x2*y2 + x3*y2 + x4*y2 + x1*y3 + x2*y3 + 2*x3*y3
-                + x4*y3 + x1*y4 + x2*y4 + x3*y4 + 2*x4*y4) / 120
-
-        i += inertiaListToMatrix([a, -b_bar, -c_bar, b, -a_bar, c])
-
-    return i[0][0], i[0][1], i[0][2], i[1][1], i[1][2], i[2][2]
+    triangles = meshTriangles(data)
+    meshhash = hashlib.sha1(triangles.tobytes()).hexdigest() if cache is not None else None
+    if meshhash is not None and meshhash in cache:
+        cache.move_to_end(meshhash)
+        inertia = np.array(cache[meshhash][2])
+    else:
+        try:
+            volume, com, inertia = inertiamath.mesh(triangles, 1.0)
+        except ValueError:
+            log("Mesh " + data.name + " encloses no volume, its inertia can not be calculated.", "WARNING",
+                "calculateMeshInertia")
+            return None
+        if meshhash is not None:
+            cache[meshhash] = (volume, com.tolist(), inertia.tolist())
+    inertia = mass * inertia
+    # the products of inertia of the xy and xz planes have always been stored in swapped order
+    return inertia[0, 0], inertia[0, 2], inertia[0, 1], inertia[1, 1], inertia[1, 2], inertia[2, 2]
+
+
+def meshTriangles(data):
+    """Returns the corners of the triangles of a mesh, splitting its polygons into triangle fans.
+
+    The mesh is only read, so neither its polygons nor the current mode are changed.
+
+    :param data: The mesh to triangulate.
+    :type data: bpy.types.Mesh
+    :return: numpy.ndarray (T, 3, 3)
+    """
+    vertices = np.empty(3 * len(data.vertices), dtype=np.float64)
+    data.vertices.foreach_get('co', vertices)
+    loops = np.empty(len(data.loops), dtype=np.int64)
+    data.loops.foreach_get('vertex_index', loops)
+    loopstart = np.empty(len(data.polygons), dtype=np.int64)
+    data.polygons.foreach_get('loop_start', loopstart)
+    looptotal = np.empty(len(data.polygons), dtype=np.int64)
+    data.polygons.foreach_get('loop_total', looptotal)
+    return vertices.reshape(-1, 3)[meshio.mesh.fan_triangles(loops, loopstart, looptotal)]
 
 
 def inertiaListToMatrix(il):
@@ -424,35 +397,131 @@ def fuseInertiaData(inertials):
         return None, None, None
 
 
-def createInertial(obj):
-    """Creates an empty inertial object with the same world transform as the corresponding
-    object and parents it to the correct link.
+def deriveInertials(links, empty=False, preserve_children=False, cache=None, progress=None):
+    """Derives the inertial objects of the visual and collision objects and of the links of a model.
 
-    :param obj: The object you want to copy the world transform from.
-    :type obj: bpy_types.Object
-    :return: bpy_types.Object -- the newly created inertia.
+    All inertias are calculated and fused without changing the scene, the result is applied by updateInertials.
 
+    :param links: The links you want to create the inertials for.
+    :type links: list
+    :param empty: If set to True the new inertial objects will contain no information.
+    :type empty: bool
+    :param preserve_children: If set to False existing inertial objects will be deleted.
+    :type preserve_children: bool
+    :param cache: The mesh inertia cache as returned by loadInertiaCache, or None to calculate all meshes.
+    :type cache: InertiaCache
+    :param progress: A function called with the number of links derived so far, e.g. to update a progress bar.
+    :type progress: function
+    :return: tuple(2) -- the inertial objects to delete and a list of dicts describing the new inertial objects,
+        with the name, parent link, matrix relative to the link, size and custom properties of each.
     """
-    if obj.phobostype == 'link':
-        parent = obj
-        size = (0.04, 0.04, 0.04)
-    else:
-        parent = obj.parent
-        size = (0.02, 0.02, 0.02)
-    rotation = obj.matrix_world.to_euler()
-    center = obj.matrix_world.to_translation()
-    inertial = bUtils.createPrimitive('inertial_' + nUtils.getObjectName(obj, phobostype="link"), 'box', size,
-                                   defs.layerTypes["inertial"], 'phobos_inertial', center, rotation)
-    bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-    inertial.phobostype = 'inertial'
-    bpy.ops.object.select_all(action="DESELECT")
-
-    sUtils.selectObjects([parent, inertial], True, 0)
-    bpy.ops.object.parent_set(type='BONE_RELATIVE')
-    return inertial
-
-
-def createInertials(link, empty=False, preserve_children=False):
+    obsolete = []
+    inertials = []
+    for index, link in enumerate(links):
+        if progress is not None:
+            progress(index)
+        children = sUtils.getImmediateChildren(link, ['inertial'])
+        if not preserve_children:
+            obsolete.extend(children)
+            children = []
+        elif 'inertial_' + link.name in bpy.data.objects:
+            oldinertial = bpy.data.objects['inertial_' + link.name]
+            obsolete.append(oldinertial)
+            children = [child for child in children if child != oldinertial]
+        # inertials are placed at the origin of their object, relative to the link
+        linkinverse = link.matrix_world.inverted()
+        objects = [{'name': child.name, 'mass': child['mass'] if 'mass' in child else child['inertial/mass'],
+                    'com': child.matrix_local.to_translation(), 'rot': child.matrix_local.to_3x3(),
+                    'inertia': child['inertia'] if 'inertia' in child else child['inertial/inertia']}
+                   for child in children if ('mass' in child or 'inertial/mass' in child) and
+                   ('inertia' in child or 'inertial/inertia' in child)]
+        if not preserve_children:
+            for obj in getInertiaRelevantObjects(link):
+                location, rotation = obj.matrix_world.decompose()[:2]
+                matrix = linkinverse * mathutils.Matrix.Translation(location) * rotation.to_matrix().to_4x4()
+                inertial = {'name': 'inertial_' + nUtils.getObjectName(obj, phobostype="link"), 'parent': link,
+                            'matrix': matrix, 'size': 0.02, 'properties': {}}
+                if not empty:
+                    mass = obj['mass'] if 'mass' in obj else None
+                    if mass is None:
+                        continue
+                    geometry = gUtils.deriveGeometry(obj)
+                    if geometry['type'] == 'mesh':
+                        inert = calculateMeshInertia(obj.data, mass, cache)
+                    else:
+                        inert = calculateInertia(mass, geometry)
+                    if inert is None:
+                        continue
+                    inertial['properties'] = {'mass': mass, 'inertia': inert}
+                    objects.append({'name': inertial['name'], 'mass': mass, 'com': matrix.to_translation(),
+                                    'rot': matrix.to_3x3(), 'inertia': inert})
+                inertials.append(inertial)
+        # compose inertial object for link
+        inertial = {'name': 'inertial_' + nUtils.getObjectName(link, phobostype="link"), 'parent': link,
+                    'matrix': mathutils.Matrix.Identity(4), 'size': 0.04, 'properties': {}}
+        if not empty:
+            if not objects:
+                log("No inertial found to fuse for " + link.name + ".", "DEBUG", "deriveInertials")
+                continue
+            mass, com, inert = compound_inertia_analysis_3x3(objects)
+            if not mass:
+                continue
+            inertial['matrix'] = mathutils.Matrix.Translation(com)
+            inertial['properties'] = {'inertial/mass': mass, 'inertial/inertia': inertiaMatrixToList(inert)}
+        inertials.append(inertial)
+    if progress is not None:
+        progress(len(links))
+    return obsolete, inertials
+
+
+def updateInertials(obsolete, inertials):
+    """Deletes and creates inertial objects as derived by deriveInertials.
+
+    Objects are created, parented and placed with the data API, so no operators are run per object.
+
+    :param obsolete: The inertial objects to delete.
+    :type obsolete: list
+    :param inertials: The descriptions of the new inertial objects.
+    :type inertials: list
+    """
+    for obj in obsolete:
+        mesh = obj.data
+        for scene in obj.users_scene:
+            scene.objects.unlink(obj)
+        bpy.data.objects.remove(obj)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+    layer = defs.layerTypes["inertial"]
+    bpy.context.scene.layers[layer] = True
+    if 'phobos_inertial' not in bpy.data.materials:
+        materials.createPhobosMaterials()
+    material = bpy.data.materials['phobos_inertial']
+    corners = [(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)]
+    sides = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    for inertial in inertials:
+        link = inertial['parent']
+        mesh = bpy.data.meshes.new(inertial['name'])
+        mesh.from_pydata([tuple(inertial['size'] * c for c in corner) for corner in corners], [], sides)
+        mesh.materials.append(material)
+        obj = bpy.data.objects.new(inertial['name'], mesh)
+        bpy.context.scene.objects.link(obj)
+        obj.layers = bUtils.defLayers([layer])
+        obj.show_transparent = material.use_transparency
+        obj.phobostype = 'inertial'
+        for key, value in inertial['properties'].items():
+            obj[key] = value
+        # the same parenting as parent_set(type='BONE_RELATIVE'), which keeps the world transform
+        obj.parent = link
+        obj.parent_type = 'BONE'
+        obj.parent_bone = link.data.bones[0].name
+        link.data.bones[0].use_relative_parent = True
+        obj.matrix_parent_inverse = link.matrix_world.inverted()
+        obj.matrix_world = link.matrix_world * inertial['matrix']
+    bpy.context.scene.update()
+
+
+def createInertials(link, empty=False, preserve_children=False, cache=None):
     """Creates inertial representations for visual and collision objects in link.
 
     :param link: The link you want to create the inertial for.
@@ -461,77 +530,17 @@ def createInertials(link, empty=False, preserve_children=False):
     :type empty: bool
     :param preserve_children: If set to False existing inertial objects will be deleted.
     :type preserve_children: bool
+    :param cache: The mesh inertia cache as returned by loadInertiaCache, or None to calculate all meshes.
+    :type cache: InertiaCache
 
     """
-    viscols = getInertiaRelevantObjects(link)
-    # clean existing data
-    if not preserve_children:
-        oldinertials = sUtils.getImmediateChildren(link, ['inertial'])
-    else:
-        try:
-            oldinertials = [bpy.data.objects['inertial_'+link.name]]
-        except KeyError:
-            oldinertials = None
-    if oldinertials:
-        sUtils.selectObjects(oldinertials, clear=True, active=0)
-        bpy.ops.object.delete()
-    if not preserve_children:
-        for obj in viscols:
-            if not empty:
-                mass = obj['mass'] if 'mass' in obj else None
-                geometry = gUtils.deriveGeometry(obj)
-                if mass is not None:
-                    if geometry['type'] == 'mesh':
-                        sUtils.selectObjects([obj])
-                        bpy.context.scene.objects.active = obj
-                        inert = calculateMeshInertia(obj.data, mass)
-                    else:
-                        inert = calculateInertia(mass, geometry)
-                    if inert is not None:
-                        inertial = createInertial(obj)
-                        inertial['mass'] = mass
-                        inertial['inertia'] = inert
-            else:
-                createInertial(obj)
-    # compose inertial object for link
-    if not empty:
-        mass, com, inert = fuseInertiaData(sUtils.getImmediateChildren(link, ['inertial']))
-        if mass and com and inert:
-            inertial = createInertial(link)
-            com_translate = mathutils.Matrix.Translation(com)
-            inertial.matrix_local = com_translate
-            bpy.ops.transform.translate(value=(0, 0, 0))  # FIXME: this is a trick to force Blender to apply matrix_local
-            inertial['inertial/mass'] = mass
-            inertial['inertial/inertia'] = inertiaMatrixToList(inert)
-    else:
-        createInertial(link)
+    updateInertials(*deriveInertials([link], empty, preserve_children, cache))
 
 
 ################################################################################
 # From here on we have code modified from Berti's implementation
 
 
-def combine_com_3x3(objects):
-    """Combines center of mass (COM) of a list of bodies given their masses and COMs.
-    This code was adapted from an implementation generously provided by Bertold Bongardt.
-
-    :param objects: The list of objects you want to combine the COG.
-    :type objects: list containing phobos dicts
-    """
-    if not objects:
-        log("No Proper object list...", "DEBUG", "combine_com_3x3")
-        return 0.0, mathutils.Vector((0.0,)*3)
-    combined_com = mathutils.Vector((0.0,)*3)
-    combined_mass = 0
-    for obj in objects:
-        combined_com = combined_com + obj['com'] * obj['mass']
-        combined_mass += obj['mass']
-    combined_com = combined_com / combined_mass
-    log("Combined center of mass: " + str(combined_com) + ", combined mass: " + str(combined_mass),
-        "DEBUG", "combine_com_3x3")
-    return combined_mass, combined_com
-
-
 def shift_com_inertia_3x3(mass, com, inertia_com, ref_point=mathutils.Vector((0.0,)*3)):
     """Shifts the center
     This code was adapted from an implementation generously provided by Bertold Bongardt.
@@ -550,11 +559,8 @@ def shift_com_inertia_3x3(mass, com, inertia_com, ref_point=mathutils.Vector((0.
 
         This was necessary as previous calculations founded on math libraries of cad2sim.
     """
-    c = com - ref_point  # difference vector
-    c_outer = gUtils.outerProduct(c, c)
-    inertia_ref = inertia_com + mass * (c.dot(c) * mathutils.Matrix.Identity(3) - c_outer)
-
-    return inertia_ref
+    inertia_ref = inertiamath.shift(mass, list(com), [list(row) for row in inertia_com], list(ref_point))
+    return mathutils.Matrix(inertia_ref.tolist())
 
 
 def spin_inertia_3x3(inertia_3x3, rotmat, passive=True):
@@ -573,39 +579,22 @@ def spin_inertia_3x3(inertia_3x3, rotmat, passive=True):
 
     WHERE IS a COMBINED METHOD of shifted and rotated inertia ? does it exist ?
     """
-    R   = rotmat
-    R_T = rotmat.transposed() #unlike .transpose(), this yields a new matrix and does not reset the original
-    I   = inertia_3x3
-
-    if passive :
-        # the object stands still but the inertia is expressed with respect to a rotated reference frame
-        rotated_inertia = R_T * I * R
-
-    else:
-        # the object moves and therefore its inertia
-        rotated_inertia = R * I * R_T
-
-    return rotated_inertia
+    rotated_inertia = inertiamath.rotate([list(row) for row in inertia_3x3], [list(row) for row in rotmat], passive)
+    return mathutils.Matrix(rotated_inertia.tolist())
 
 
 def compound_inertia_analysis_3x3(objects):
     """
     Computes total mass, common center of mass and inertia matrix at CCOM
     """
-    total_mass, common_com = combine_com_3x3(objects)
-
-    shifted_inertias = list()
-    for obj in objects:
-        if 'rot' in obj and not obj['rot'] == mathutils.Matrix.Identity(3):  # if object is rotated in local space
-            objinertia = spin_inertia_3x3(inertiaListToMatrix(obj['inertia']), obj['rot'])  # transform inertia to link space
-        else:
-            objinertia = inertiaListToMatrix(obj['inertia'])  # keep inertia
-        inert_i_at_common_com = shift_com_inertia_3x3(obj['mass'], obj['com'], objinertia, common_com)
-        shifted_inertias.append(inert_i_at_common_com)
-
-    total_inertia_at_common_com = mathutils.Matrix.Identity(3)
-    total_inertia_at_common_com.zero()
-    for inertia in shifted_inertias:
-        total_inertia_at_common_com = total_inertia_at_common_com + inertia
-
-    return total_mass, common_com, total_inertia_at_common_com
+    masses = np.array([obj['mass'] for obj in objects], dtype=np.float64)
+    coms = np.array([list(obj['com']) for obj in objects], dtype=np.float64).reshape(-1, 3)
+    rotations = np.array([[list(row) for row in obj['rot']] if 'rot' in obj else np.identity(3) for obj in objects],
+                         dtype=np.float64).reshape(-1, 3, 3)
+    inertias = inertiamath.from_list(np.array([list(obj['inertia']) for obj in objects],
+                                              dtype=np.float64).reshape(-1, 6))
+    total_mass, common_com, total_inertia_at_common_com = inertiamath.fuse(masses, coms, rotations, inertias)
+    log("Combined center of mass: " + str(common_com) + ", combined mass: " + str(total_mass),
+        "DEBUG", "compound_inertia_analysis_3x3")
+    return total_mass, mathutils.Vector(common_com), mathutils.Matrix(total_inertia_at_common_com.tolist())
+
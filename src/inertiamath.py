@@ -0,0 +1,216 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.inertiamath
+    :platform: Unix, Windows, Mac
+    :synopsis: Inertia formulas of primitives and meshes, fusion and transformation of inertias on numpy arrays
+
+.. moduleauthor:: Kai von Szadowski
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+
+This module imports neither bpy nor other Phobos modules. All functions take
+scalars or arrays of many bodies and return inertia tensors as arrays of
+shape (..., 3, 3).
+"""
+
+import math
+
+import numpy as np
+
+
+def diagonal(ixx, iyy, izz):
+    """
+    Returns the inertia tensors with the given principal moments as an
+    array of shape (..., 3, 3).
+    """
+    return np.stack(np.broadcast_arrays(ixx, iyy, izz), axis=-1)[..., np.newaxis] * np.identity(3)
+
+
+def box(mass, size):
+    """
+    Inertia of boxes of the given masses and sizes (..., 3).
+    """
+    mass = np.asarray(mass, dtype=np.float64)
+    size = np.asarray(size, dtype=np.float64)
+    i = mass / 12
+    return diagonal(i * (size[..., 1]**2 + size[..., 2]**2), i * (size[..., 0]**2 + size[..., 2]**2),
+                    i * (size[..., 0]**2 + size[..., 1]**2))
+
+
+def cylinder(mass, radius, length):
+    """
+    Inertia of cylinders along the z axis.
+    """
+    mass = np.asarray(mass, dtype=np.float64)
+    radius = np.asarray(radius, dtype=np.float64)
+    i = mass / 12 * (3 * radius**2 + np.asarray(length, dtype=np.float64)**2)
+    return diagonal(i, i, 0.5 * mass * radius**2)
+
+
+def sphere(mass, radius):
+    """
+    Inertia of solid spheres.
+    """
+    i = 0.4 * np.asarray(mass, dtype=np.float64) * np.asarray(radius, dtype=np.float64)**2
+    return diagonal(i, i, i)
+
+
+def capsule(mass, radius, length):
+    """
+    Inertia of capsules along the z axis, made of a cylinder of the given
+    length and two hemispheres, of which the inner parts of the length are
+    used as the cylinder height.
+
+    Adapted from http://www.gamedev.net/page/resources/_/technical/math-and-physics/capsule-inertia-tensor-r3856
+    """
+    mass = np.asarray(mass, dtype=np.float64)
+    r = np.asarray(radius, dtype=np.float64)
+    h = np.asarray(length, dtype=np.float64)
+    cylinder_volume = math.pi * r**2 * h
+    hemisphere_volume = ((4 / 3) * math.pi * r**3) / 2
+    volume = cylinder_volume + 2 * hemisphere_volume
+    cylinder_mass = mass / (volume / cylinder_volume)
+    hemisphere_mass = mass / (volume / hemisphere_volume)
+    cylinder_height = h - 2 * r
+    temp0 = hemisphere_mass * 2.0 * r**2 / 5.0
+    temp1 = cylinder_height * 0.5
+    temp2 = temp0 + hemisphere_mass * (temp1**2 + 0.375 * cylinder_height * r)
+    ixx = (r**2 * cylinder_mass / 2.0) / 2.0 + cylinder_mass * cylinder_height**2 / 12.0 + temp2 * 2.0
+    return diagonal(ixx, ixx, r**2 * cylinder_mass / 2.0 + temp0 * 2.0)
+
+
+def ellipsoid(mass, size):
+    """
+    Inertia of ellipsoids with the semi-axes size (..., 3).
+    """
+    size = np.asarray(size, dtype=np.float64)
+    i = np.asarray(mass, dtype=np.float64) / 5
+    return diagonal(i * (size[..., 1]**2 + size[..., 2]**2), i * (size[..., 0]**2 + size[..., 2]**2),
+                    i * (size[..., 0]**2 + size[..., 1]**2))
+
+
+# meshes enclosing less than this share of the cube of their extent are treated as flat
+min_relative_volume = 1e-9
+
+
+def mesh(triangles, mass):
+    """
+    Computes volume, center of mass and inertia tensor of a closed triangle
+    mesh of uniform density, given as (T, 3, 3) corner positions of its
+    outward facing triangles.
+
+    Every triangle spans a tetrahedron with the origin, whose signed volume
+    and second moments have closed forms (F. Tonon, 'Explicit Exact Formulas
+    for the 3-D Tetrahedron Inertia Tensor in Terms of its Vertex
+    Coordinates', 2004). The inertia tensor refers to the origin, not to the
+    center of mass.
+
+    Raises a ValueError if the mesh encloses no volume, e.g. a plane.
+    """
+    triangles = np.asarray(triangles, dtype=np.float64).reshape(-1, 3, 3)
+    dets = np.einsum('ij,ij->i', triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2]))
+    volume = dets.sum() / 6
+    extent = np.ptp(triangles.reshape(-1, 3), axis=0).max() if len(triangles) else 0.0
+    if not abs(volume) > min_relative_volume * extent**3:
+        raise ValueError('mesh encloses no volume')
+    sums = triangles.sum(axis=1)
+    com = np.einsum('i,ij->j', dets, sums) / (4 * dets.sum())
+    # second moment of every tetrahedron: det/120 * (sum of v v^T over its corners + s s^T with s the corner sum)
+    moments = (np.einsum('i,icj,ick->jk', dets, triangles, triangles) +
+               np.einsum('i,ij,ik->jk', dets, sums, sums)) / 120
+    inertia = mass / volume * (np.trace(moments) * np.identity(3) - moments)
+    return volume, com, inertia
+
+
+def shift(mass, com, inertia, point=(0.0, 0.0, 0.0)):
+    """
+    Moves inertias from the centers of mass com (..., 3) of bodies to point,
+    by the parallel axis theorem I + m * ((c . c) E - c c^T) with c = com - point.
+    """
+    c = np.asarray(com, dtype=np.float64) - np.asarray(point, dtype=np.float64)
+    mass = np.asarray(mass, dtype=np.float64)[..., np.newaxis, np.newaxis]
+    return np.asarray(inertia, dtype=np.float64) + mass * (
+        np.einsum('...i,...i->...', c, c)[..., np.newaxis, np.newaxis] * np.identity(3) -
+        c[..., :, np.newaxis] * c[..., np.newaxis, :])
+
+
+def rotate(inertia, rotation, passive=True):
+    """
+    Rotates inertias by rotation matrices (..., 3, 3). Passive rotations
+    express the inertia in a rotated frame as R^T I R, active ones rotate the
+    body as R I R^T.
+    """
+    rotation = np.asarray(rotation, dtype=np.float64)
+    if passive:
+        return np.einsum('...ji,...jk,...kl->...il', rotation, inertia, rotation)
+    return np.einsum('...ij,...jk,...lk->...il', rotation, inertia, rotation)
+
+
+def fuse(masses, coms, rotations, inertias, groups=None):
+    """
+    Fuses bodies given by (N,) masses, (N, 3) centers of mass, (N, 3, 3)
+    rotations and (N, 3, 3) inertias at their centers of mass into their
+    compound. The rotations map the frames of the bodies into the common
+    frame, so the inertias are rotated as R I R^T and shifted to the common
+    center of mass before they are summed.
+
+    With groups, the index of the compound of every body, all compounds are
+    fused at once, e.g. the parts of every link of a robot. Returns mass,
+    center of mass and inertia, or arrays of them with one entry per group.
+    """
+    masses = np.asarray(masses, dtype=np.float64).reshape(-1)
+    coms = np.asarray(coms, dtype=np.float64).reshape(-1, 3)
+    rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+    inertias = np.asarray(inertias, dtype=np.float64).reshape(-1, 3, 3)
+    single = groups is None
+    groups = np.zeros(len(masses), dtype=np.int64) if single else np.asarray(groups, dtype=np.int64)
+    ngroups = groups.max() + 1 if len(groups) else int(single)
+    total_masses = np.bincount(groups, masses, minlength=ngroups).astype(np.float64)
+    moments = np.stack([np.bincount(groups, masses * coms[:, axis], minlength=ngroups)
+                        for axis in range(3)], axis=1).astype(np.float64)
+    common_coms = np.divide(moments, total_masses[:, np.newaxis], out=np.zeros_like(moments),
+                            where=total_masses[:, np.newaxis] != 0)
+    shifted = shift(masses, coms, rotate(inertias, rotations, passive=False), common_coms[groups])
+    total_inertias = np.zeros((ngroups, 3, 3))
+    np.add.at(total_inertias, groups, shifted)
+    if single:
+        return total_masses[0], common_coms[0], total_inertias[0]
+    return total_masses, common_coms, total_inertias
+
+
+def to_list(inertia):
+    """
+    Returns the upper diagonal (ixx, ixy, ixz, iyy, iyz, izz) of inertia
+    tensors as an array of shape (..., 6).
+    """
+    inertia = np.asarray(inertia, dtype=np.float64)
+    return inertia[..., [0, 0, 0, 1, 1, 2], [0, 1, 2, 1, 2, 2]]
+
+
+def from_list(values):
+    """
+    Returns the symmetric inertia tensors of upper diagonals
+    (ixx, ixy, ixz, iyy, iyz, izz) given as an array of shape (..., 6).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    inertia = np.empty(values.shape[:-1] + (3, 3))
+    inertia[..., [0, 0, 0, 1, 1, 2], [0, 1, 2, 1, 2, 2]] = values
+    inertia[..., [1, 2, 2], [0, 0, 1]] = values[..., [1, 2, 4]]
+    return inertia
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.lod
+    :platform: Unix, Windows, Mac
+    :synopsis: Generation of decimated level of detail meshes for visual objects
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+import numpy as np
+
+import phobos.meshio as meshio
+import phobos.exporter as exporter
+import phobos.importer as importer
+import phobos.utils.selection as selectionUtils
+from phobos.logging import log
+
+# bumped whenever the decimation changes its results, which invalidates generated levels
+lodVersion = 1
+
+
+def meshTriangles(buffers):
+    """This function returns the vertices and triangles of mesh buffers.
+
+    :param buffers: The mesh buffers as returned by exporter.evaluateMesh.
+    :type buffers: dict
+    :return: tuple -- the vertices (N, 3) and 0-based triangles (T, 3).
+
+    """
+    facevertices = buffers['facevertices'].reshape(-1, 4)
+    faceindex, slots = meshio.mesh.split_quads(facevertices)
+    return buffers['coords'].reshape(-1, 3), facevertices[faceindex, slots]
+
+
+def lodKey(vertices, triangles, ratio):
+    """This function returns the hash identifying a level of detail by the geometry it is generated from and its ratio.
+
+    :param vertices: The vertices of the full mesh.
+    :type vertices: numpy.ndarray
+    :param triangles: The triangles of the full mesh.
+    :type triangles: numpy.ndarray
+    :param ratio: The fraction of triangles kept.
+    :type ratio: float
+    :return: str
+
+    """
+    sha = hashlib.sha1()
+    sha.update(repr((lodVersion, round(ratio, 6))).encode())
+    sha.update(np.ascontiguousarray(vertices, dtype=np.float32).tobytes())
+    sha.update(np.ascontiguousarray(triangles, dtype=np.int32).tobytes())
+    return sha.hexdigest()
+
+
+def decimateArrays(vertices, triangles, ratio, smooth):
+    """This function decimates a mesh and returns the arrays importer.meshFromArrays creates the level from.
+
+    :param vertices: The vertices of the full mesh.
+    :type vertices: numpy.ndarray
+    :param triangles: The triangles of the full mesh.
+    :type triangles: numpy.ndarray
+    :param ratio: The fraction of triangles kept.
+    :type ratio: float
+    :param smooth: Whether the faces of the level are shaded smooth.
+    :type smooth: bool
+    :return: dict
+
+    """
+    vertices, triangles = meshio.decimate.decimate(vertices, triangles, ratio)
+    faces = np.zeros((len(triangles), 3, 3), dtype=np.int32)
+    faces[:, :, 0] = triangles + 1
+    arrays = meshio.mesh.to_polygons({'vertices': vertices, 'uvs': np.empty((0, 2), dtype=np.float32),
+                                      'normals': np.empty((0, 3), dtype=np.float32), 'faces': faces})
+    arrays['smooth'][:] = smooth
+    return arrays
+
+
+def createLevelsOfDetail(objects, levels=3, ratio=0.5, distance=5.0, workers=0):
+    """This function generates decimated levels of detail for visual objects and assigns them to their lod_levels.
+
+    Level i keeps ratio**i of the triangles of the evaluated mesh and starts at i * distance. The levels are
+    decimated with quadric error metrics in a pool of worker threads. Levels whose mesh, ratio and decimation
+    have not changed are found again by their key and reused. Every level is a hidden object named after the
+    visual with the suffix '_lod<i>', whose mesh is exported as a separate file along with the visual.
+
+    :param objects: The visual objects to generate levels of detail for.
+    :type objects: list
+    :param levels: The number of decimated levels.
+    :type levels: int
+    :param ratio: The fraction of triangles kept from one level to the next.
+    :type ratio: float
+    :param distance: The distance between the start distances of the levels.
+    :type distance: float
+    :param workers: The number of worker threads, 0 for one per CPU core.
+    :type workers: int
+
+    """
+    visuals = [obj for obj in objects if obj.phobostype == 'visual' and obj.type == 'MESH']
+    existing = {mesh['phobosLodKey']: mesh for mesh in bpy.data.meshes if 'phobosLodKey' in mesh}
+    lodkeys = {}
+    jobs = {}
+    lodmeshes = {}
+    with ThreadPoolExecutor(max_workers=workers or multiprocessing.cpu_count()) as pool:
+        for obj in visuals:
+            # only evaluating the mesh needs Blender, decimation is left to the pool
+            buffers = exporter.evaluateMesh(obj)
+            vertices, triangles = meshTriangles(buffers)
+            smooth = bool(buffers['facesmooth'].any())
+            lodkeys[obj.name] = [lodKey(vertices, triangles, ratio ** level) for level in range(1, levels + 1)]
+            for level, lodkey in enumerate(lodkeys[obj.name], start=1):
+                if lodkey in existing:
+                    lodmeshes[lodkey] = existing[lodkey]
+                elif lodkey not in jobs:
+                    jobs[lodkey] = pool.submit(decimateArrays, vertices, triangles, ratio ** level, smooth)
+        log("Decimating " + str(len(jobs)) + " levels of detail, reusing " + str(len(lodmeshes)) + "...",
+            "INFO", "createLevelsOfDetail")
+        arrays = {lodkey: job.result() for lodkey, job in jobs.items()}
+
+    for obj in visuals:
+        lodobjects = []
+        for level, lodkey in enumerate(lodkeys[obj.name], start=1):
+            name = obj.data.name + '_lod' + str(level)
+            if lodkey not in lodmeshes:
+                lodmeshes[lodkey] = importer.meshFromArrays(name, arrays[lodkey])
+                lodmeshes[lodkey]['phobosLodKey'] = lodkey
+                for material in obj.data.materials:
+                    lodmeshes[lodkey].materials.append(material)
+            lodname = obj.name + '_lod' + str(level)
+            lodobj = bpy.data.objects.get(lodname)
+            if lodobj is None or lodobj.type != 'MESH':
+                lodobj = bpy.data.objects.new(lodname, lodmeshes[lodkey])
+                bpy.context.scene.objects.link(lodobj)
+            else:
+                oldmesh = lodobj.data
+                lodobj.data = lodmeshes[lodkey]
+                if oldmesh != lodobj.data and oldmesh.users == 0:
+                    bpy.data.meshes.remove(oldmesh)
+            # a mesh created while an outdated one still held the name got a numbered name
+            if lodobj.data.name != name and name not in bpy.data.meshes:
+                lodobj.data.name = name
+            lodobj.layers = obj.layers
+            lodobj.matrix_world = obj.matrix_world
+            lodobj.hide = True
+            lodobjects.append(lodobj)
+
+        selectionUtils.selectObjects([obj], clear=True, active=0)
+        bpy.ops.object.lod_clear_all()
+        for level, lodobj in enumerate(lodobjects, start=1):
+            bpy.ops.object.lod_add()
+            obj.lod_levels[level].object = lodobj
+            obj.lod_levels[level].distance = level * distance
+        if 'lodmaxdistances' in obj:
+            del obj['lodmaxdistances']
+    selectionUtils.selectObjects(visuals, clear=True, active=0 if visuals else -1)
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio
+    :platform: Unix, Windows, Mac
+    :synopsis: Blender-independent reading and writing of mesh files
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# meshio deliberately uses neither bpy nor other phobos modules and imports its
+# own modules relatively, so that it also works outside of Blender as a
+# top-level package, e.g. with the phobos directory on sys.path:
+#
+#     python -m meshio robot/meshes/base.bobj base.stl
+#
+# Meshes are passed around as dicts of numpy arrays, the layout bobj files are
+# decoded into:
+#
+#     'vertices'  float32 (N, 3)    vertex positions
+#     'uvs'       float32 (M, 2)    texture coordinates
+#     'normals'   float32 (K, 3)    normals
+#     'faces'     int32 (T, 3, 3)   1-based (vertex, uv, normal) indices of
+#                                   every triangle corner, uv 0 for none
+#
+# Readers of formats with polygons may add 'polygons', int32 (P,), the number
+# of triangles every polygon was split into, in face order.
+
+import os
+
+from . import bobj
+from . import obj
+from . import stl
+from . import dae
+from . import mesh
+from . import decimate
+
+formats = {'.bobj': bobj, '.obj': obj, '.stl': stl, '.dae': dae}
+
+
+def module_for(filepath):
+    """
+    Returns the meshio module handling the format of a file by its extension.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in formats:
+        raise ValueError('Unsupported mesh format ' + extension)
+    return formats[extension]
+
+
+def read(filepath):
+    """
+    Reads a mesh file of any supported format into a mesh dict. COLLADA
+    files can only be written.
+    """
+    module = module_for(filepath)
+    if not hasattr(module, 'read'):
+        raise ValueError('Reading ' + os.path.splitext(filepath)[1] + ' files is not supported')
+    return module.read(filepath)
+
+
+def decode(data, filename):
+    """
+    Decodes the content of a mesh file, e.g. a member of an archive, into a
+    mesh dict. The format is chosen by the extension of filename.
+    """
+    module = module_for(filename)
+    if not hasattr(module, 'decode'):
+        raise ValueError('Reading ' + os.path.splitext(filename)[1] + ' files is not supported')
+    return module.decode(data)
+
+
+def write(filepath, mesh, **options):
+    """
+    Writes a mesh dict to a file, choosing the format by its extension.
+    options are passed on to the writer, e.g. version and compression for .bobj.
+    """
+    module_for(filepath).write(filepath, mesh, **options)
+
+
+def convert(inpath, outpath, **options):
+    """
+    Converts a mesh file into another supported format.
+    """
+    write(outpath, read(inpath), **options)
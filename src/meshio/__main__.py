@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.__main__
+    :platform: Unix, Windows, Mac
+    :synopsis: Command line conversion of mesh files without Blender
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+
+from . import read, write, bobj, decimate
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='meshio', description='Converts mesh files between .bobj, .obj and .stl.')
+    parser.add_argument('input', help='mesh file to read')
+    parser.add_argument('output', nargs='?', help='mesh file to write, the format is chosen by its extension')
+    parser.add_argument('--bobj-version', type=int, default=1, choices=(1, 2), help='.bobj format version')
+    parser.add_argument('--compression', choices=sorted(bobj.v2_compressors), help='.bobj version 2 compression')
+    parser.add_argument('--quantize', action='store_true', help='quantize .bobj version 2 vertices and normals')
+    parser.add_argument('--indexed', action='store_true', help='write an indexed .bobj version 2 vertex stream')
+    parser.add_argument('--optimize-cache', action='store_true', help='reorder indexed triangles for the vertex cache')
+    parser.add_argument('--decimate', type=float, metavar='RATIO',
+                        help='keep this fraction of the triangles, using quadric error metrics')
+    parser.add_argument('--benchmark', action='store_true', help='compare all .bobj variants of the input file')
+    args = parser.parse_args(args)
+    if args.benchmark:
+        bobj.benchmark(args.input)
+    if args.output:
+        options = {}
+        if args.output.lower().endswith('.bobj'):
+            options = {'version': args.bobj_version, 'compression': args.compression, 'quantize': args.quantize,
+                       'indexed': args.indexed, 'optimize_cache': args.optimize_cache}
+        mesh = read(args.input)
+        if args.decimate is not None:
+            mesh = decimate.decimate_mesh(mesh, args.decimate)
+        write(args.output, mesh, **options)
+    elif not args.benchmark:
+        parser.error('no output file given')
+
+
+if __name__ == '__main__':
+    main()
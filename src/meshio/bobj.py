@@ -0,0 +1,559 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.bobj
+    :platform: Unix, Windows, Mac
+    :synopsis: Reading and writing of the .bobj mesh format (see doc/bobj.md)
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import struct
+import os
+import mmap
+import time
+import zlib
+import lzma
+
+import numpy as np
+
+
+# record layouts of the bobj stream, keyed by their marker
+record_dtypes = {1: np.dtype([('marker', '=i4'), ('co', '=f4', (3,))]),
+                 2: np.dtype([('marker', '=i4'), ('uv', '=f4', (2,))]),
+                 3: np.dtype([('marker', '=i4'), ('no', '=f4', (3,))]),
+                 4: np.dtype([('marker', '=i4'), ('corners', '=i4', (3, 3))])}
+
+# header of the version 2 container: magic, version, flags, vertex, normal, uv and face counts,
+# reserved word and the byte offsets of the vertex, normal, uv and face sections (see doc/bobj.md)
+v2_magic = b'BOBJ'
+v2_header = struct.Struct('<4s7I4Q')
+v2_sections = (('vertices', np.dtype('<f4'), (3,)),
+               ('normals', np.dtype('<f4'), (3,)),
+               ('uvs', np.dtype('<f4'), (2,)),
+               ('faces', np.dtype('<i4'), (3, 3)))
+
+# version 2 flags, per-section compression and 16 bit quantization of vertices and normals
+v2_compressors = {'zlib': (1, zlib.compress, zlib.decompress),
+                  'lzma': (2, lzma.compress, lzma.decompress)}
+v2_quantized = 4
+v2_quantized_dtypes = {'vertices': np.dtype('<u2'), 'normals': np.dtype('<i2')}
+v2_bounds = struct.Struct('<6f')
+
+# version 2 flag for a welded vertex stream, triangles are then stored as single 0-based vertex indices
+v2_indexed = 8
+v2_indexed_shapes = {'faces': (3,)}
+
+
+def quantize_arrays(vertices, normals):
+    """
+    Quantizes vertices to 16 bit relative to their bounding box and normals
+    to signed 16 bit. Returns the quantized arrays and the bounding box.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+    lower = vertices.min(axis=0) if len(vertices) else np.zeros(3, dtype=np.float32)
+    upper = vertices.max(axis=0) if len(vertices) else np.zeros(3, dtype=np.float32)
+    extent = (upper - lower).astype(np.float64)
+    scale = np.divide(65535.0, extent, out=np.zeros(3), where=extent > 0)
+    qvertices = np.rint((vertices - lower) * scale).astype('<u2')
+    qnormals = np.rint(np.clip(np.asarray(normals, dtype=np.float32), -1, 1) * 32767).astype('<i2')
+    return qvertices, qnormals, lower, upper
+
+
+def dequantize_arrays(qvertices, qnormals, lower, upper):
+    """
+    Restores float vertices and normals from their quantized representation.
+    """
+    lower = np.asarray(lower, dtype=np.float64)
+    extent = np.asarray(upper, dtype=np.float64) - lower
+    vertices = (lower + qvertices * (extent / 65535.0)).astype(np.float32)
+    normals = (qnormals / 32767.0).astype(np.float32)
+    return vertices, normals
+
+
+def first_use_order(indices):
+    """
+    Returns the distinct values of an index array in order of their first
+    occurrence and the indices renumbered to positions in that order.
+    """
+    used, first, inverse = np.unique(indices.ravel(), return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return used[order], rank[inverse.ravel()].reshape(indices.shape)
+
+
+def weld(vertices, uvs, normals, faces):
+    """
+    Welds triangle corners with the same (vertex, uv, normal) indices into a
+    single indexed vertex stream. Returns position, uv and normal of every
+    welded vertex, numbered in order of first use, and the (T, 3) 0-based
+    index buffer. The uvs are empty if no corner has texture coordinates,
+    otherwise corners without uv get (0, 0).
+    """
+    faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3, 3)
+    loc, tex = face_indices(faces, len(vertices), len(uvs))
+    nor = faces[:, :, 2] - 1
+    nor[nor < 0] += len(normals) + 1
+    hasuv = faces[:, :, 1] != 0
+    keys = np.ascontiguousarray(np.stack((loc, np.where(hasuv, tex, -1), nor), axis=-1).reshape(-1, 3))
+    # hash the packed index triples as a whole instead of comparing them element by element
+    unique, inverse = np.unique(keys.view(np.dtype((np.void, keys.itemsize * 3))).ravel(), return_inverse=True)
+    used, indices = first_use_order(inverse.reshape(-1, 3))
+    corners = unique[used].view(keys.dtype).reshape(-1, 3)
+    wuvs = np.empty((0, 2), dtype=np.float32)
+    if hasuv.any():
+        wuvs = np.asarray(uvs, dtype=np.float32).reshape(-1, 2)[corners[:, 1]]
+        wuvs[corners[:, 1] < 0] = 0
+    return (np.asarray(vertices, dtype=np.float32).reshape(-1, 3)[corners[:, 0]], wuvs,
+            np.asarray(normals, dtype=np.float32).reshape(-1, 3)[corners[:, 2]], indices)
+
+
+def unweld(vertices, uvs, normals, indices):
+    """
+    Expands an indexed vertex stream into the (T, 3, 3) 1-based (vertex, uv,
+    normal) index triples of the other layouts. Welded vertices sharing a
+    position are merged again, so meshes keep their topology on import.
+    """
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+    unique, inverse = np.unique(vertices.view(np.dtype((np.void, 12))).ravel(), return_inverse=True)
+    used, positions = first_use_order(inverse.ravel())
+    faces = np.empty((len(indices), 3, 3), dtype=np.int32)
+    faces[:, :, 0] = positions[indices] + 1
+    faces[:, :, 1] = indices + 1 if len(uvs) else 0
+    faces[:, :, 2] = indices + 1
+    return {'vertices': unique[used].view(np.float32).reshape(-1, 3), 'uvs': uvs, 'normals': normals,
+            'faces': faces}
+
+
+def optimize_vertex_cache(indices, nvertices, cache_size=32):
+    """
+    Computes a triangle order for an index buffer which makes good use of a
+    post-transform vertex cache, following Tom Forsyth's linear-speed vertex
+    cache optimisation. Returns the order as an array of triangle indices.
+
+    The algorithm emits one triangle at a time and rescores the triangles
+    around the cache after each, which is inherently sequential. It takes
+    about 25 microseconds per triangle, e.g. 4.5 seconds for 180000 triangles,
+    so it is only run on request.
+    """
+    indices = np.asarray(indices).reshape(-1, 3)
+    ntris = len(indices)
+    # triangles adjacent to each vertex, as slices of one flat array
+    corners = indices.ravel()
+    adjacency = (np.argsort(corners, kind='stable') // 3).tolist()
+    starts = np.concatenate(([0], np.cumsum(np.bincount(corners, minlength=nvertices)))).tolist()
+    remaining = np.diff(starts).tolist()
+    tris = indices.tolist()
+    cachescore = [0.75] * 3 + [(1.0 - (i - 3) / (cache_size - 3)) ** 1.5 for i in range(3, cache_size)]
+    # vertex scores by number of triangles left and cache position, the last column for vertices not cached
+    scores = [[-1.0] * (cache_size + 1)] + [[score + 2.0 * n ** -0.5 for score in cachescore + [0.0]]
+                                            for n in range(1, max(remaining + [0]) + 1)]
+    vertexscore = [scores[n][-1] for n in remaining]
+    triscore = [vertexscore[a] + vertexscore[b] + vertexscore[c] for a, b, c in tris]
+    emitted = [False] * ntris
+    order = []
+    cache = []
+    best = max(range(ntris), key=triscore.__getitem__) if ntris else -1
+    cursor = 0
+    while best >= 0:
+        emitted[best] = True
+        order.append(best)
+        tri = tris[best]
+        for v in tri:
+            remaining[v] -= 1
+            # keep the adjacency slice of each vertex limited to the triangles not emitted yet
+            begin = starts[v]
+            last = begin + remaining[v]
+            slot = adjacency.index(best, begin, last + 1)
+            adjacency[slot], adjacency[last] = adjacency[last], adjacency[slot]
+        cache = tri + [v for v in cache if v not in tri]
+        changed = []
+        for v in cache[cache_size:]:
+            vertexscore[v] = scores[remaining[v]][-1]
+            changed += adjacency[starts[v]:starts[v] + remaining[v]]
+        del cache[cache_size:]
+        for position, v in enumerate(cache):
+            vertexscore[v] = scores[remaining[v]][position]
+            changed += adjacency[starts[v]:starts[v] + remaining[v]]
+        best, bestscore = -1, -1.0
+        for t in changed:
+            a, b, c = tris[t]
+            score = vertexscore[a] + vertexscore[b] + vertexscore[c]
+            if score > bestscore:
+                best, bestscore = t, score
+        if best < 0:
+            # no triangle left around the cache, continue with the next one not emitted yet
+            while cursor < ntris and emitted[cursor]:
+                cursor += 1
+            best = cursor if cursor < ntris else -1
+    return np.array(order, dtype=np.int64)
+
+
+def pack(vertices, uvs, normals, faces, version=1, compression=None, quantize=False, indexed=False,
+         optimize_cache=False):
+    """
+    Packs bobj arrays into the byte sections of a file of the given version.
+    faces holds the 1-based (vertex, uv, normal) index triples of every
+    triangle corner, with uv index 0 for corners without texture coordinates.
+    Version 2 files can additionally be compressed per section with 'zlib'
+    or 'lzma', have their vertices and normals quantized to 16 bit and store
+    a welded, indexed vertex stream, optionally with the triangles reordered
+    for the vertex cache of a renderer.
+    """
+    if version == 2:
+        if indexed:
+            return pack_indexed(*weld(vertices, uvs, normals, faces), compression=compression, quantize=quantize,
+                                optimize_cache=optimize_cache)
+        elif optimize_cache:
+            raise ValueError('Vertex cache optimization requires an indexed vertex stream')
+        return pack_v2({'vertices': vertices, 'uvs': uvs, 'normals': normals, 'faces': faces}, 0, compression,
+                       quantize)
+    elif compression or quantize or indexed or optimize_cache:
+        raise ValueError('Compression, quantization and indexing require bobj version 2')
+    elif version == 1:
+        arrays = {'vertices': vertices, 'uvs': uvs, 'normals': normals, 'faces': faces}
+        sections = []
+        for marker, name in ((1, 'vertices'), (2, 'uvs'), (3, 'normals'), (4, 'faces')):
+            dtype = record_dtypes[marker]
+            records = np.empty(len(arrays[name]), dtype=dtype)
+            records['marker'] = marker
+            records[dtype.names[1]] = arrays[name]
+            sections.append(records.tobytes())
+        return sections
+    raise ValueError('Unknown bobj version ' + str(version))
+
+
+def pack_indexed(vertices, uvs, normals, indices, compression=None, quantize=False, optimize_cache=False):
+    """
+    Packs a welded vertex stream, as returned by weld, and its (T, 3) 0-based
+    index buffer into the byte sections of an indexed version 2 file.
+    """
+    if optimize_cache:
+        used, indices = first_use_order(indices[optimize_vertex_cache(indices, len(vertices))])
+        vertices, normals = vertices[used], normals[used]
+        uvs = uvs[used] if len(uvs) else uvs
+    return pack_v2({'vertices': vertices, 'uvs': uvs, 'normals': normals, 'faces': indices}, v2_indexed,
+                   compression, quantize)
+
+
+def pack_v2(arrays, flags, compression=None, quantize=False):
+    """
+    Packs the sections of a version 2 file with the given layout flags,
+    adding the flags of compression and quantization.
+    """
+    sections = []
+    if quantize:
+        flags |= v2_quantized
+        arrays = dict(arrays)
+        arrays['vertices'], arrays['normals'], lower, upper = quantize_arrays(arrays['vertices'], arrays['normals'])
+        sections.append(v2_bounds.pack(*np.concatenate((lower, upper))))
+    compress = None
+    if compression:
+        flag, compress, decompress = v2_compressors[compression]
+        flags |= flag
+    offsets = []
+    offset = v2_header.size + sum(len(section) for section in sections)
+    counts = []
+    for name, dtype, shape in v2_sections:
+        dtype, shape = section_layout(flags, name, dtype, shape)
+        data = np.ascontiguousarray(arrays[name], dtype=dtype).reshape((-1,) + shape)
+        counts.append(len(data))
+        sections.append(compress(data.tobytes()) if compress else data.tobytes())
+        offsets.append(offset)
+        offset += len(sections[-1])
+    header = v2_header.pack(*([v2_magic, 2, flags] + counts + [0] + offsets))
+    return [header] + sections
+
+
+def scan_records(buffer):
+    """
+    Scans the marker stream of a bobj buffer once and returns the runs of
+    equally tagged records as a list of (marker, offset, count) tuples.
+    Runs are checked in exponentially growing blocks, so a file written in
+    sections is scanned with a handful of array operations.
+    Raises a ValueError at a record of unknown marker or truncated data.
+    """
+    size = len(buffer)
+    runs = []
+    offset = 0
+    while offset < size:
+        marker = int(np.frombuffer(buffer, '=i4', 1, offset)[0]) if size - offset >= 4 else None
+        if marker not in record_dtypes or size - offset < record_dtypes[marker].itemsize:
+            raise ValueError('bobj record at offset %d can not be read' % offset)
+        recsize = record_dtypes[marker].itemsize
+        stride = recsize // 4
+        available = (size - offset) // recsize
+        count = 0
+        probe = 64
+        while count < available:
+            n = min(probe, available - count)
+            markers = np.frombuffer(buffer, '=i4', n * stride, offset + count * recsize)[::stride]
+            mismatch = np.flatnonzero(markers != marker)
+            if len(mismatch):
+                count += int(mismatch[0])
+                break
+            count += n
+            probe *= 2
+        runs.append((marker, offset, count))
+        offset += count * recsize
+    return runs
+
+
+def read_v2_header(header):
+    """
+    Unpacks a version 2 header and returns (flags, counts, offsets), the
+    latter as dicts keyed by section name.
+    Raises a ValueError if the version or compression is not supported.
+    """
+    magic, version, flags, nvertices, nnormals, nuvs, nfaces, reserved, *offsets = v2_header.unpack(header)
+    compression = flags & ~(v2_quantized | v2_indexed)
+    if version != 2 or compression not in [0] + [flag for flag, compress, decompress in v2_compressors.values()]:
+        raise ValueError('unsupported bobj version %d (flags %d)' % (version, flags))
+    names = [name for name, dtype, shape in v2_sections]
+    return flags, dict(zip(names, (nvertices, nnormals, nuvs, nfaces))), dict(zip(names, offsets))
+
+
+def section_layout(flags, name, dtype, shape):
+    """
+    Returns dtype and shape of the elements of a version 2 section as
+    stored with the given flags.
+    """
+    if flags & v2_quantized and name in v2_quantized_dtypes:
+        dtype = v2_quantized_dtypes[name]
+    if flags & v2_indexed:
+        shape = v2_indexed_shapes.get(name, shape)
+    return dtype, shape
+
+
+def check_sections(size, flags, counts, offsets):
+    """
+    Checks the section offsets and counts of a version 2 header against the
+    size of the file and raises a ValueError if a section lies outside of
+    it or, uncompressed, is too short for its count.
+    """
+    compressed = flags & ~(v2_quantized | v2_indexed)
+    start = v2_header.size + (v2_bounds.size if flags & v2_quantized else 0)
+    if start > size:
+        raise ValueError('bobj file of %d bytes is truncated in its header' % size)
+    ends = list(offsets.values())[1:] + [size]
+    for (name, dtype, shape), end in zip(v2_sections, ends):
+        offset = offsets[name]
+        if not start <= offset <= min(end, size):
+            raise ValueError('bobj %s section at offset %d is out of range' % (name, offset))
+        dtype, shape = section_layout(flags, name, dtype, shape)
+        if not compressed and offset + counts[name] * dtype.itemsize * int(np.prod(shape)) > end:
+            raise ValueError('bobj %s section of %d elements is truncated' % (name, counts[name]))
+        start = offset
+
+
+def decode_v2(buffer, flags, counts, offsets):
+    """
+    Decodes the sections of a version 2 buffer. Uncompressed sections are
+    returned as views into the buffer, compressed ones are inflated.
+    Raises a ValueError if the buffer is too short for its header.
+    """
+    check_sections(len(buffer), flags, counts, offsets)
+    decompress = None
+    for flag, compress, decompressor in v2_compressors.values():
+        if flags & flag:
+            decompress = decompressor
+    # sections are stored in order, so each one ends where the next one starts
+    ends = list(offsets.values())[1:] + [len(buffer)]
+    records = {}
+    for (name, dtype, shape), end in zip(v2_sections, ends):
+        dtype, shape = section_layout(flags, name, dtype, shape)
+        count = counts[name] * int(np.prod(shape))
+        if decompress:
+            try:
+                data = decompress(bytes(buffer[offsets[name]:end])) if count else b''
+            except (zlib.error, lzma.LZMAError) as error:
+                raise ValueError('bobj %s section can not be decompressed: %s' % (name, error))
+            if len(data) != count * dtype.itemsize:
+                raise ValueError('bobj %s section of %d elements is truncated' % (name, counts[name]))
+            records[name] = np.frombuffer(data, dtype, count).reshape((-1,) + shape)
+        else:
+            records[name] = np.frombuffer(buffer, dtype, count, offsets[name]).reshape((-1,) + shape)
+    if flags & v2_quantized:
+        bounds = v2_bounds.unpack(bytes(buffer[v2_header.size:v2_header.size + v2_bounds.size]))
+        records['vertices'], records['normals'] = dequantize_arrays(records['vertices'], records['normals'],
+                                                                    bounds[:3], bounds[3:])
+    if flags & v2_indexed:
+        return unweld(records['vertices'], records['uvs'], records['normals'], records['faces'])
+    return records
+
+
+def decode(buffer):
+    """
+    Decodes a bobj buffer of either version into arrays.
+    Returns a dict with 'vertices' (N, 3), 'uvs' (M, 2), 'normals' (K, 3) and
+    'faces' (T, 3, 3) holding the raw 1-based (vertex, uv, normal) indices,
+    into which an indexed vertex stream is expanded.
+    Sections stored contiguously are returned as views into the buffer.
+    """
+    if len(buffer) >= v2_header.size and bytes(buffer[:4]) == v2_magic:
+        return decode_v2(buffer, *read_v2_header(bytes(buffer[:v2_header.size])))
+    blocks = {marker: [] for marker in record_dtypes}
+    for marker, offset, count in scan_records(buffer):
+        blocks[marker].append(np.frombuffer(buffer, record_dtypes[marker], count, offset))
+    records = {}
+    for marker, blocklist in blocks.items():
+        if len(blocklist) == 1:
+            records[marker] = blocklist[0]
+        elif blocklist:
+            records[marker] = np.concatenate(blocklist)
+        else:
+            records[marker] = np.empty(0, dtype=record_dtypes[marker])
+    return {'vertices': records[1]['co'],
+            'uvs': records[2]['uv'],
+            'normals': records[3]['no'],
+            'faces': records[4]['corners']}
+
+
+def read(filepath, use_mmap=False):
+    """
+    Reads a bobj file of either version and returns the decoded arrays.
+    Plain version 2 files are read in a single pass into preallocated arrays.
+    With use_mmap other files are decoded from a memory map of the file
+    instead of its content read into memory, see read_arrays.
+    Raises a ValueError if a version 2 file is not supported or shorter than
+    its header says.
+    """
+    if use_mmap and os.path.getsize(filepath) > 0:
+        with open(filepath, 'rb') as stream:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                # copy, as the arrays may be views into the mapping
+                return {name: np.array(array) for name, array in decode(buffer).items()}
+    with open(filepath, 'rb') as stream:
+        start = stream.read(v2_header.size)
+        if len(start) < v2_header.size or start[:4] != v2_magic:
+            return decode(start + stream.read())
+        flags, counts, offsets = read_v2_header(start)
+        if flags:
+            return decode_v2(start + stream.read(), flags, counts, offsets)
+        check_sections(os.fstat(stream.fileno()).st_size, flags, counts, offsets)
+        records = {}
+        for name, dtype, shape in v2_sections:
+            records[name] = np.empty((counts[name],) + shape, dtype=dtype)
+            if counts[name]:
+                stream.seek(offsets[name])
+                # the file may still have been truncated since its size was checked
+                if stream.readinto(records[name]) != records[name].nbytes:
+                    raise ValueError('bobj %s section of %d elements is truncated' % (name, counts[name]))
+        return records
+
+
+def write(filepath, mesh, version=1, compression=None, quantize=False, indexed=False, optimize_cache=False):
+    """
+    Writes a meshio mesh as a bobj file, see pack for the options.
+    """
+    with open(filepath, 'wb') as out:
+        for section in pack(mesh['vertices'], mesh['uvs'], mesh['normals'], mesh['faces'],
+                            version, compression, quantize, indexed, optimize_cache):
+            out.write(section)
+
+
+def convert(inpath, outpath, version=2, compression=None, quantize=False, indexed=False, optimize_cache=False):
+    """
+    Converts a bobj file between format versions 1 and 2, optionally
+    compressing, quantizing and indexing version 2 output. Apart from
+    quantization, the conversion keeps the geometry in both directions.
+    """
+    write(outpath, read(inpath), version, compression, quantize, indexed, optimize_cache)
+
+
+def benchmark(filepath, repeat=3):
+    """
+    Encodes the mesh of a bobj file in all variants of the format and prints
+    size, encode and decode time of each relative to plain version 1.
+    Returns the measurements as a list of dicts.
+    """
+    records = read(filepath)
+    arrays = (records['vertices'], records['uvs'], records['normals'], records['faces'])
+    variants = [('v1', {'version': 1}), ('v2', {'version': 2}), ('v2 indexed', {'version': 2, 'indexed': True})]
+    for compression in sorted(v2_compressors):
+        variants.append(('v2 ' + compression, {'version': 2, 'compression': compression}))
+        variants.append(('v2 ' + compression + ' quantized', {'version': 2, 'compression': compression,
+                                                             'quantize': True}))
+        variants.append(('v2 ' + compression + ' indexed', {'version': 2, 'compression': compression,
+                                                           'indexed': True}))
+    results = []
+    for name, options in variants:
+        start = time.perf_counter()
+        for i in range(repeat):
+            data = b''.join(pack(*arrays, **options))
+        encodetime = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for i in range(repeat):
+            for value in decode(data).values():
+                np.array(value)
+        decodetime = (time.perf_counter() - start) / repeat
+        results.append({'variant': name, 'size': len(data), 'encode': encodetime, 'decode': decodetime})
+    reference = results[0]
+    print('%-22s %12s %7s %10s %10s' % ('variant', 'bytes', 'size', 'encode ms', 'decode ms'))
+    for result in results:
+        print('%-22s %12d %6.1f%% %10.2f %10.2f' % (result['variant'], result['size'],
+                                                   100.0 * result['size'] / max(reference['size'], 1),
+                                                   1000 * result['encode'], 1000 * result['decode']))
+    return results
+
+
+def face_indices(faces, nverts, nuvs):
+    """
+    Converts the raw face corners of a bobj to 0-based vertex and uv index
+    arrays of shape (T, 3), resolving relative indices the way obj does.
+    Corners without uv get the dummy index 0.
+    """
+    loc = faces[:, :, 0] - 1
+    loc[loc < 0] += nverts + 1
+    tex = faces[:, :, 1] - 1
+    tex[tex < 0] += nuvs + 1
+    tex[faces[:, :, 1] == 0] = 0
+    return loc, tex
+
+
+# files larger than this are memory-mapped by the importer instead of read into memory
+mmap_threshold = 64 * 1024 * 1024
+
+
+def read_arrays(filepath, use_mmap=False):
+    """
+    Reads a bobj file and returns only the contiguous arrays needed to build
+    the mesh: vertex coordinates (N, 3), vertex indices (T, 3) and the uv of
+    every triangle corner (T, 3, 2), which is None if the file has no uvs.
+    With use_mmap the file is mapped and decoded as zero-copy views, so the
+    raw file content is never held in memory as a whole.
+    """
+    if use_mmap and os.path.getsize(filepath) > 0:
+        with open(filepath, 'rb') as stream:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return _materialize(decode(buffer))
+    return _materialize(read(filepath))
+
+
+def _materialize(records):
+    # copy, as the records may be views into a mapping which is closed afterwards
+    vertices = np.array(records['vertices'], dtype=np.float32)
+    loc, tex = face_indices(records['faces'], len(vertices), len(records['uvs']))
+    cornertex = None
+    if len(records['uvs']):
+        cornertex = np.array(records['uvs'][tex], dtype=np.float32)
+    return vertices, loc, cornertex
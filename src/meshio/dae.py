@@ -0,0 +1,137 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.dae
+    :platform: Unix, Windows, Mac
+    :synopsis: Writing of meshes as minimal COLLADA (.dae) documents
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import re
+from datetime import datetime
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+from .mesh import join_fans
+
+template = """<?xml version="1.0" encoding="utf-8"?>
+<COLLADA xmlns="http://www.collada.org/2005/11/COLLADASchema" version="1.4.1">
+  <asset>
+    <contributor>
+      <authoring_tool>Phobos</authoring_tool>
+    </contributor>
+    <created>{date}</created>
+    <modified>{date}</modified>
+    <unit name="meter" meter="1"/>
+    <up_axis>Z_UP</up_axis>
+  </asset>
+  <library_geometries>
+    <geometry id="{id}-mesh" name={name}>
+      <mesh>
+{sources}        <vertices id="{id}-mesh-vertices">
+          <input semantic="POSITION" source="#{id}-mesh-positions"/>
+        </vertices>
+        <{primitive} count="{count}">
+{inputs}{vcount}          <p>{indices}</p>
+        </{primitive}>
+      </mesh>
+    </geometry>
+  </library_geometries>
+  <library_visual_scenes>
+    <visual_scene id="Scene" name="Scene">
+      <node id="{id}" name={name} type="NODE">
+        <instance_geometry url="#{id}-mesh"/>
+      </node>
+    </visual_scene>
+  </library_visual_scenes>
+  <scene>
+    <instance_visual_scene url="#Scene"/>
+  </scene>
+</COLLADA>
+"""
+
+source_template = """        <source id="{id}">
+          <float_array id="{id}-array" count="{size}">{values}</float_array>
+          <technique_common>
+            <accessor source="#{id}-array" count="{count}" stride="{stride}">
+{params}            </accessor>
+          </technique_common>
+        </source>
+"""
+
+
+def source(sourceid, values, params):
+    """
+    Formats a float source of a COLLADA mesh.
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(params))
+    return source_template.format(id=sourceid, size=values.size, count=len(values), stride=len(params),
+                                  values=('%.6f ' * values.size % tuple(values.ravel())).rstrip(),
+                                  params=''.join('              <param name="%s" type="float"/>\n' % param
+                                                 for param in params))
+
+
+def write(filepath, mesh, name='mesh'):
+    """
+    Writes a meshio mesh as a COLLADA document holding a single geometry
+    instanced by one node, without materials. The triangle fans of the
+    optional 'polygons' array are written as polygons of a polylist, like
+    Blender's exporter does. Corners without uv or normal index refer to an
+    added zero element if other corners have one.
+    """
+    faces = np.asarray(mesh['faces'], dtype=np.int64).reshape(-1, 3, 3)
+    vertices = np.asarray(mesh['vertices'], dtype=np.float32).reshape(-1, 3)
+    # the index triples of all triangle or polygon corners
+    corners = faces
+    vcount = ''
+    if mesh.get('polygons') is not None:
+        corners, looptotal = join_fans(faces, mesh['polygons'])
+        vcount = '          <vcount>%s</vcount>\n' % ('%d ' * len(looptotal) % tuple(looptotal)).rstrip()
+    loc = corners[..., 0] - 1
+    loc[loc < 0] += len(vertices) + 1
+    meshid = re.sub(r'[^A-Za-z0-9_.-]', '_', name) or 'mesh'
+    sources = [source(meshid + '-mesh-positions', vertices, 'XYZ')]
+    inputs = ['          <input semantic="VERTEX" source="#%s-mesh-vertices" offset="0"/>\n' % meshid]
+    columns = [loc]
+    for column, key, semantic, params in ((2, 'normals', 'NORMAL', 'XYZ'), (1, 'uvs', 'TEXCOORD', 'ST')):
+        table = np.asarray(mesh[key], dtype=np.float32).reshape(-1, len(params))
+        present = corners[..., column] != 0
+        if not present.any():
+            continue
+        index = corners[..., column] - 1
+        index[index < 0] += len(table) + 1
+        if not present.all():
+            index[~present] = len(table)
+            table = np.concatenate((table, np.zeros((1, len(params)), dtype=np.float32)))
+        sourceid = '%s-mesh-%s' % (meshid, key)
+        sources.append(source(sourceid, table, params))
+        inputs.append('          <input semantic="%s" source="#%s" offset="%d"%s/>\n'
+                      % (semantic, sourceid, len(columns), ' set="0"' if semantic == 'TEXCOORD' else ''))
+        columns.append(index)
+    indices = np.stack(columns, axis=-1).ravel()
+    with open(filepath, 'w') as out:
+        out.write(template.format(date=datetime.now().strftime('%Y-%m-%dT%H:%M:%S'), id=meshid, name=quoteattr(name),
+                                  sources=''.join(sources), inputs=''.join(inputs), vcount=vcount,
+                                  primitive='polylist' if vcount else 'triangles',
+                                  count=len(looptotal) if vcount else len(faces),
+                                  indices=('%d ' * indices.size % tuple(indices)).rstrip()))
@@ -0,0 +1,314 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.decimate
+    :platform: Unix, Windows, Mac
+    :synopsis: Decimation of triangle meshes with quadric error metrics
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from .stl import facet_normals
+
+# quadrics of the planes perpendicular to open borders are weighted by this factor, which keeps borders in place
+boundary_weight = 1000.0
+
+# number of times the edges of a pass are matched again after collapses were rejected
+match_attempts = 4
+
+
+def triangle_planes(vertices, triangles):
+    """
+    Returns the planes (a, b, c, d) of triangles with unit normal (a, b, c)
+    as a (T, 4) array, and the area of every triangle.
+    """
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals = np.divide(normals, lengths[:, np.newaxis], out=np.zeros_like(normals), where=lengths[:, np.newaxis] > 0)
+    planes = np.concatenate((normals, -np.einsum('ij,ij->i', normals, corners[:, 0])[:, np.newaxis]), axis=1)
+    return planes, lengths / 2
+
+
+def edge_keys(edges, nvertices):
+    """
+    Encodes edges given as (E, 2) vertex pairs with the smaller index first
+    as single integers.
+    """
+    return edges[:, 0].astype(np.int64) * nvertices + edges[:, 1]
+
+
+def unique_edges(triangles, nvertices):
+    """
+    Returns the distinct edges of triangles as a sorted (E, 2) array of
+    vertex pairs with the smaller index first, together with their keys and
+    the number of triangles sharing every edge.
+    """
+    edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))
+    edges.sort(axis=1)
+    keys, counts = np.unique(edge_keys(edges, nvertices), return_counts=True)
+    return np.stack((keys // nvertices, keys % nvertices), axis=1), keys, counts
+
+
+def tie_breaks(keys):
+    """
+    Scrambles edge keys into pseudo-random but reproducible integers.
+    """
+    return (keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+
+
+def quadrics(vertices, triangles):
+    """
+    Computes the error quadric of every vertex as an (N, 4, 4) array: the
+    area-weighted sum of the fundamental quadrics of its triangles' planes
+    and of the planes perpendicular to the open borders it lies on.
+    """
+    planes, areas = triangle_planes(vertices, triangles)
+    facequadrics = areas[:, np.newaxis, np.newaxis] * planes[:, :, np.newaxis] * planes[:, np.newaxis, :]
+    result = np.zeros((len(vertices), 4, 4))
+    for corner in range(3):
+        np.add.at(result, triangles[:, corner], facequadrics)
+
+    # a border edge belongs to a single triangle, whose plane holds the edge
+    edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]))
+    faceindex = np.tile(np.arange(len(triangles)), 3)
+    sortededges = np.sort(edges, axis=1)
+    keys, inverse, counts = np.unique(edge_keys(sortededges, len(vertices)), return_inverse=True,
+                                      return_counts=True)
+    border = counts[inverse.ravel()] == 1
+    edges, faceindex = edges[border], faceindex[border]
+    start, end = vertices[edges[:, 0]], vertices[edges[:, 1]]
+    normals = np.cross(end - start, planes[faceindex, :3])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals = np.divide(normals, lengths[:, np.newaxis], out=np.zeros_like(normals), where=lengths[:, np.newaxis] > 0)
+    borderplanes = np.concatenate((normals, -np.einsum('ij,ij->i', normals, start)[:, np.newaxis]), axis=1)
+    weights = boundary_weight * np.einsum('ij,ij->i', end - start, end - start)
+    borderquadrics = weights[:, np.newaxis, np.newaxis] * borderplanes[:, :, np.newaxis] * borderplanes[:, np.newaxis, :]
+    for corner in range(2):
+        np.add.at(result, edges[:, corner], borderquadrics)
+    return result
+
+
+def collapse_targets(vertices, quadrics, edges):
+    """
+    Returns the position every edge is collapsed to and the quadric error of
+    the collapse. The position minimizing the summed quadric of the edge is
+    used if it is well defined, otherwise the best of the end points and the
+    midpoint.
+    """
+    q = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    start, end = vertices[edges[:, 0]], vertices[edges[:, 1]]
+    candidates = [start, end, (start + end) / 2]
+    a = q[:, :3, :3]
+    scale = np.abs(np.trace(a, axis1=1, axis2=2)) / 3
+    solvable = np.abs(np.linalg.det(a)) > 1e-6 * scale ** 3
+    optimum = (start + end) / 2
+    if solvable.any():
+        optimum[solvable] = np.linalg.solve(a[solvable], -q[solvable, :3, 3:])[:, :, 0]
+    candidates.append(optimum)
+    positions = np.stack(candidates, axis=1)
+    homogeneous = np.concatenate((positions, np.ones(positions.shape[:2] + (1,))), axis=2)
+    errors = np.einsum('eci,eij,ecj->ec', homogeneous, q, homogeneous)
+    errors[~solvable, 3] = np.inf
+    best = np.argmin(errors, axis=1)
+    rows = np.arange(len(edges))
+    return positions[rows, best], np.maximum(errors[rows, best], 0.0)
+
+
+def match_edges(edges, rank, valid, nvertices, rounds=2):
+    """
+    Selects valid edges which share no vertices, each being the edge of
+    lowest rank at both of its end points among the edges left. After every
+    round the edges touching selected ones are left out and the remaining
+    edges are matched again, so that a pass is not limited to the local
+    minima of the ranks.
+    """
+    free = valid.copy()
+    matched = np.zeros(nvertices, dtype=bool)
+    selected = []
+    for _ in range(rounds):
+        if not free.any():
+            break
+        best = np.full(nvertices, len(edges), dtype=np.int64)
+        np.minimum.at(best, edges[free, 0], rank[free])
+        np.minimum.at(best, edges[free, 1], rank[free])
+        found = np.flatnonzero(free & (best[edges[:, 0]] == rank) & (best[edges[:, 1]] == rank))
+        selected.append(found)
+        matched[edges[found].ravel()] = True
+        free &= ~(matched[edges[:, 0]] | matched[edges[:, 1]])
+    return np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+
+
+def link_condition(edges, keys, counts, candidates, nvertices):
+    """
+    Checks which of the candidate edges can be collapsed without making the
+    mesh non-manifold: the end points of a candidate may only share the
+    neighbours opposite to the edge in its triangles, which need more than
+    three neighbours themselves.
+    """
+    # neighbours of every vertex in compressed sparse row layout
+    pairs = np.concatenate((edges, edges[:, ::-1]))
+    pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(pairs[:, 0], minlength=nvertices))))
+    first, second = edges[candidates, 0], edges[candidates, 1]
+    degree = offsets[first + 1] - offsets[first]
+    owner = np.repeat(np.arange(len(candidates)), degree)
+    neighbours = pairs[offsets[np.repeat(first, degree)] + np.arange(degree.sum()) -
+                       np.repeat(np.cumsum(degree) - degree, degree), 1]
+    other = second[owner]
+    lookup = np.stack((np.minimum(neighbours, other), np.maximum(neighbours, other)), axis=1)
+    lookupkeys = edge_keys(lookup, nvertices)
+    position = np.minimum(np.searchsorted(keys, lookupkeys), len(keys) - 1)
+    shared = (keys[position] == lookupkeys) & (neighbours != other)
+    common = np.bincount(owner[shared], minlength=len(candidates))
+    # an opposite vertex with three neighbours would be left with two, e.g. when collapsing a tetrahedron
+    pinched = np.bincount(owner[shared & (np.diff(offsets)[neighbours] <= 3)], minlength=len(candidates))
+    return (common == counts[candidates]) & (pinched == 0)
+
+
+def flipped_edges(vertices, triangles, edges, selected, positions):
+    """
+    Returns the selected edges whose simultaneous collapse would flip or
+    degenerate a triangle which is kept.
+    """
+    owner = np.full(len(vertices), -1, dtype=np.int64)
+    owner[edges[selected, 0]] = selected
+    owner[edges[selected, 1]] = selected
+    moved = vertices.copy()
+    moved[edges[selected, 0]] = positions[selected]
+    moved[edges[selected, 1]] = positions[selected]
+    faceowners = owner[triangles]
+    touched = (faceowners >= 0).any(axis=1)
+    # triangles holding a collapsed edge vanish
+    vanishing = ((faceowners[:, 0] >= 0) & (faceowners[:, 0] == faceowners[:, 1])) | \
+                ((faceowners[:, 1] >= 0) & (faceowners[:, 1] == faceowners[:, 2])) | \
+                ((faceowners[:, 2] >= 0) & (faceowners[:, 2] == faceowners[:, 0]))
+    check = np.flatnonzero(touched & ~vanishing)
+    before = vertices[triangles[check]]
+    after = moved[triangles[check]]
+    normalsbefore = np.cross(before[:, 1] - before[:, 0], before[:, 2] - before[:, 0])
+    normalsafter = np.cross(after[:, 1] - after[:, 0], after[:, 2] - after[:, 0])
+    bad = np.einsum('ij,ij->i', normalsbefore, normalsafter) <= 1e-3 * np.einsum('ij,ij->i', normalsbefore, normalsbefore)
+    badowners = faceowners[check[bad]].ravel()
+    return np.unique(badowners[badowners >= 0])
+
+
+def decimate(vertices, triangles, ratio=0.5, target=None, tolerance=None):
+    """
+    Reduces a triangle mesh to ratio times its number of triangles, or to
+    target triangles, by collapsing the edges with the least quadric error.
+    With a tolerance, only collapses moving the surface by less than about
+    tolerance on average are done, so ratio=0 removes the vertices of flat
+    and nearly flat regions only.
+
+    Every pass collapses a set of edges which share no vertices, each being
+    the cheapest edge at both of its end points, so the passes are done with
+    a handful of array operations. Collapses which would make the mesh
+    non-manifold or flip triangles are skipped and the edges they blocked are
+    matched again, up to match_attempts times per pass. Meshes may stay above
+    the target. Returns the vertices (N, 3) and 0-based triangles (T, 3) of the
+    decimated mesh, without unused vertices.
+    """
+    vertices = np.array(vertices, dtype=np.float64).reshape(-1, 3)
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+    triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) &
+                          (triangles[:, 2] != triangles[:, 0])]
+    if target is None:
+        target = int(round(len(triangles) * ratio))
+    nvertices = len(vertices)
+    vertexquadrics = quadrics(vertices, triangles)
+    if tolerance is not None:
+        # the quadric error is the area weighted sum of squared distances to the planes of the triangles
+        areas = triangle_planes(vertices, triangles)[1]
+        vertexareas = np.zeros(nvertices)
+        for corner in range(3):
+            np.add.at(vertexareas, triangles[:, corner], areas)
+    while len(triangles) > target:
+        edges, keys, counts = unique_edges(triangles, nvertices)
+        positions, errors = collapse_targets(vertices, vertexquadrics, edges)
+        # rank the edges by error, ties broken by a hash of the edge, so that neighbouring edges of equal error,
+        # e.g. in flat regions, do not block each other and every pass collapses a share of all edges
+        rank = np.empty(len(edges), dtype=np.int64)
+        rank[np.lexsort((tie_breaks(keys), errors))] = np.arange(len(edges))
+        valid = counts <= 2
+        if tolerance is not None:
+            valid &= errors <= tolerance * tolerance * (vertexareas[edges[:, 0]] + vertexareas[edges[:, 1]])
+        border = np.zeros(nvertices, dtype=bool)
+        border[edges[counts == 1].ravel()] = True
+        valid &= ~(border[edges[:, 0]] & border[edges[:, 1]] & (counts == 2))
+        # edges whose collapse is rejected are left out and the edges they blocked are matched again, so that
+        # rejected collapses, which stay local minima of the error, do not limit every later pass to a few edges
+        selected = np.zeros(0, dtype=np.int64)
+        attempts = 0
+        while valid.any() and (attempts < match_attempts or not len(selected)):
+            attempts += 1
+            candidates = match_edges(edges, rank, valid, nvertices)
+            valid[candidates] = False
+            added = candidates[link_condition(edges, keys, counts, candidates, nvertices)]
+            if not len(added) and len(selected):
+                break
+            # every collapse removes the triangles of its edge, stop at the target
+            selected = np.concatenate((selected, added))
+            selected = selected[np.argsort(rank[selected])]
+            selected = selected[np.cumsum(counts[selected]) - counts[selected] < len(triangles) - target]
+            # rejected collapses leave their vertices in place, so the others are checked again
+            rejected = flipped_edges(vertices, triangles, edges, selected, positions)
+            while len(rejected):
+                selected = np.setdiff1d(selected, rejected)
+                rejected = flipped_edges(vertices, triangles, edges, selected, positions)
+            if np.cumsum(counts[selected])[-1:].sum() >= len(triangles) - target:
+                break
+            # edges touching the selected ones can not be collapsed in the same pass
+            used = np.zeros(nvertices, dtype=bool)
+            used[edges[selected].ravel()] = True
+            valid &= ~(used[edges[:, 0]] | used[edges[:, 1]])
+        if not len(selected):
+            break
+        keep, drop = edges[selected, 0], edges[selected, 1]
+        vertices[keep] = positions[selected]
+        vertexquadrics[keep] += vertexquadrics[drop]
+        if tolerance is not None:
+            vertexareas[keep] += vertexareas[drop]
+        remap = np.arange(nvertices)
+        remap[drop] = keep
+        triangles = remap[triangles]
+        triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) &
+                              (triangles[:, 2] != triangles[:, 0])]
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return vertices[used].astype(np.float32), triangles.reshape(-1, 3).astype(np.int32)
+
+
+def decimate_mesh(mesh, ratio=0.5):
+    """
+    Decimates a meshio mesh, see decimate. Texture coordinates are dropped
+    and every triangle gets its facet normal.
+    """
+    vertices = np.asarray(mesh['vertices'], dtype=np.float32).reshape(-1, 3)
+    loc = np.asarray(mesh['faces'], dtype=np.int64).reshape(-1, 3, 3)[:, :, 0] - 1
+    loc[loc < 0] += len(vertices) + 1
+    vertices, triangles = decimate(vertices, loc, ratio)
+    faces = np.zeros((len(triangles), 3, 3), dtype=np.int32)
+    faces[:, :, 0] = triangles + 1
+    faces[:, :, 2] = np.arange(1, len(triangles) + 1, dtype=np.int32)[:, np.newaxis]
+    return {'vertices': vertices, 'uvs': np.empty((0, 2), dtype=np.float32),
+            'normals': facet_normals(vertices[triangles]).astype(np.float32), 'faces': faces}
@@ -0,0 +1,323 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.mesh
+    :platform: Unix, Windows, Mac
+    :synopsis: Conversion of mesh buffers into the triangle representation used by meshio
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from .bobj import first_use_order
+
+
+def index_rounded_rows(rows, n=6):
+    """
+    Assigns an index to every row of an array, identifying rows which are
+    equal after rounding their components to n digits. Indices are given in
+    order of first occurrence.
+
+    Rounding matches python's round(), which is applied only to the distinct
+    rows whose scaled components lie next to a tie, all others are rounded in
+    bulk. Returns the index of every row and the rounded rows in order of
+    their index.
+    """
+    rows = np.ascontiguousarray(rows)
+    if not len(rows):
+        return np.zeros(0, dtype=np.int32), np.empty((0,) + rows.shape[1:])
+    raw = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    distinct, first, inverse = np.unique(raw, return_index=True, return_inverse=True)
+    values = rows[first].astype(np.float64)
+    scaled = values * 10.0 ** n
+    rounded = np.rint(scaled) / 10.0 ** n
+    ties = (np.abs(np.abs(scaled - np.rint(scaled)) - 0.5) <= 4 * np.spacing(np.abs(scaled))).any(axis=1)
+    for d in np.flatnonzero(ties):
+        rounded[d] = [round(float(c), n) for c in values[d]]
+    # adding 0 turns -0.0 into 0.0, which round() considers equal
+    keys = np.ascontiguousarray(rounded + 0.0)
+    order = np.argsort(first, kind='stable')
+    keyraw = keys.view(np.dtype((np.void, keys.itemsize * keys.shape[1]))).ravel()[order]
+    unique, keyfirst, keyinverse = np.unique(keyraw, return_index=True, return_inverse=True)
+    rank = np.empty(len(unique), dtype=np.int32)
+    rank[np.argsort(keyfirst, kind='stable')] = np.arange(len(unique), dtype=np.int32)
+    keyindex = np.empty(len(distinct), dtype=np.int32)
+    keyindex[order] = rank[keyinverse.ravel()]
+    return keyindex[inverse.ravel()], rounded[order[np.sort(keyfirst)]]
+
+
+def split_quads(facevertices):
+    """
+    Splits quads into the triangles (0, 1, 2) and (0, 2, 3), keeping the
+    triangles in face order. facevertices holds the four vertex indices of
+    each face, the last being 0 for triangles. Returns the face and the
+    corner slots of every triangle, as (T, 1) and (T, 3) arrays, so that
+    facevertices[faceindex, slots] are the vertices of the triangles.
+    """
+    facevertices = np.asarray(facevertices).reshape(-1, 4)
+    nfaces = len(facevertices)
+    quads = np.flatnonzero(facevertices[:, 3] != 0)
+    faceindex = np.concatenate((np.arange(nfaces), quads))
+    slots = np.concatenate((np.tile((0, 1, 2), (nfaces, 1)), np.tile((0, 2, 3), (len(quads), 1))))
+    order = np.argsort(faceindex, kind='stable')
+    return faceindex[order, np.newaxis], slots[order]
+
+
+def fan_triangles(loops, loopstart, looptotal):
+    """
+    Splits polygons given by the vertex of every corner (loops) and the
+    start and corner count of every polygon into triangle fans around their
+    first corner, keeping the triangles in polygon order. Returns the vertex
+    indices of the triangles as a (T, 3) array.
+    """
+    loops = np.asarray(loops)
+    loopstart = np.asarray(loopstart, dtype=np.int64)
+    fans = np.maximum(np.asarray(looptotal, dtype=np.int64) - 2, 0)
+    first = np.repeat(loopstart, fans)
+    # the k-th triangle of a fan uses the corners 0, k + 1 and k + 2
+    k = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans)
+    return np.stack((loops[first], loops[first + k + 1], loops[first + k + 2]), axis=1)
+
+
+def triangle_corners(coords, facevertices):
+    """
+    Returns the corner positions of the triangles of a mesh with triangle and
+    quad faces as a (T, 3, 3) array.
+    """
+    facevertices = np.asarray(facevertices, dtype=np.int32).reshape(-1, 4)
+    faceindex, slots = split_quads(facevertices)
+    return np.asarray(coords, dtype=np.float32).reshape(-1, 3)[facevertices[faceindex, slots]]
+
+
+def from_tessfaces(coords, vertexnormals, facevertices, facesmooth, facenormals, faceuvs=None):
+    """
+    Converts the flat buffers of a mesh with triangle and quad faces into a
+    meshio mesh. Vertices are kept as they are, texture coordinates and
+    normals are deduplicated after rounding to 6 digits and quads are split
+    into two triangles. Smooth faces use the normals of their vertices, flat
+    faces their face normal.
+
+    facevertices holds the four vertex indices of each face, the last being
+    0 for triangles, faceuvs the four uv coordinates of each face or None if
+    the mesh has no texture coordinates.
+    """
+    coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    vertexnormals = np.asarray(vertexnormals, dtype=np.float32).reshape(-1, 3)
+    facevertices = np.asarray(facevertices, dtype=np.int32).reshape(-1, 4)
+    facesmooth = np.asarray(facesmooth, dtype=bool)
+    facenormals = np.asarray(facenormals, dtype=np.float32).reshape(-1, 3)
+    nfaces = len(facevertices)
+    isquad = facevertices[:, 3] != 0
+    corners = np.ones((nfaces, 4), dtype=bool)
+    corners[:, 3] = isquad
+
+    # texture coordinates are shared by all corners with the same rounded uv, the first occurrence is written
+    uvids = np.full((nfaces, 4), -1, dtype=np.int32)
+    uvs = np.empty((0, 2), dtype=np.float32)
+    if faceuvs is not None:
+        cornerrows = np.asarray(faceuvs, dtype=np.float32).reshape(nfaces, 4, 2)[corners]
+        cornerids, keys = index_rounded_rows(cornerrows)
+        uvids[corners] = cornerids
+        uvs = cornerrows[np.unique(cornerids, return_index=True)[1]]
+
+    # smooth faces use the normals of their vertices, flat faces a single face normal
+    normalslots = corners & facesmooth[:, np.newaxis]
+    normalslots[:, 0] = True
+    normalrows = np.where(facesmooth[:, np.newaxis, np.newaxis],
+                          vertexnormals[facevertices], facenormals[:, np.newaxis, :])[normalslots]
+    normalids = np.zeros((nfaces, 4), dtype=np.int32)
+    slotids, keys = index_rounded_rows(normalrows)
+    normalids[normalslots] = slotids
+    normalids[~facesmooth] = normalids[~facesmooth, :1]
+    normals = np.array(keys, dtype=np.float32).reshape(-1, 3)
+
+    faceindex, slots = split_quads(facevertices)
+    faces = np.empty((len(faceindex), 3, 3), dtype=np.int32)
+    faces[:, :, 0] = facevertices[faceindex, slots] + 1
+    faces[:, :, 1] = uvids[faceindex, slots] + 1
+    faces[:, :, 2] = normalids[faceindex, slots] + 1
+    return {'vertices': coords, 'uvs': uvs, 'normals': normals, 'faces': faces}
+
+
+def from_polygons(coords, vertexnormals, loops, loopstart, looptotal, polysmooth, polynormals, loopuvs=None):
+    """
+    Converts the flat buffers of a mesh with polygons of any size into a
+    meshio mesh. As in from_tessfaces, texture coordinates and normals are
+    deduplicated after rounding to 6 digits and smooth polygons use the
+    normals of their vertices. Polygons are split into triangle fans, whose
+    number of triangles is kept in the additional array 'polygons', so that
+    writers can join them again.
+
+    loops holds the vertex of every polygon corner, loopstart and looptotal
+    the first corner and the number of corners of every polygon, loopuvs
+    the uv coordinates of every corner or None if the mesh has none.
+    """
+    coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    vertexnormals = np.asarray(vertexnormals, dtype=np.float32).reshape(-1, 3)
+    loops = np.asarray(loops, dtype=np.int32)
+    looptotal = np.asarray(looptotal, dtype=np.int64)
+    polysmooth = np.asarray(polysmooth, dtype=bool)
+    polynormals = np.asarray(polynormals, dtype=np.float32).reshape(-1, 3)
+    # polygon of every corner
+    polyindex = np.repeat(np.arange(len(looptotal)), looptotal)
+
+    uvids = np.full(len(loops), -1, dtype=np.int32)
+    uvs = np.empty((0, 2), dtype=np.float32)
+    if loopuvs is not None:
+        cornerrows = np.asarray(loopuvs, dtype=np.float32).reshape(-1, 2)
+        uvids, keys = index_rounded_rows(cornerrows)
+        uvs = cornerrows[np.unique(uvids, return_index=True)[1]]
+
+    normalrows = np.where(polysmooth[polyindex, np.newaxis], vertexnormals[loops], polynormals[polyindex])
+    normalids, keys = index_rounded_rows(normalrows)
+    normals = np.array(keys, dtype=np.float32).reshape(-1, 3)
+
+    corners = fan_triangles(np.arange(len(loops)), loopstart, looptotal)
+    faces = np.empty((len(corners), 3, 3), dtype=np.int32)
+    faces[:, :, 0] = loops[corners] + 1
+    faces[:, :, 1] = uvids[corners] + 1
+    faces[:, :, 2] = normalids[corners] + 1
+    fans = np.maximum(looptotal - 2, 0)
+    return {'vertices': coords, 'uvs': uvs, 'normals': normals, 'faces': faces,
+            'polygons': fans[fans > 0].astype(np.int32)}
+
+
+def weld_tessfaces(coords, vertexnormals, facevertices, facesmooth, facenormals, faceuvs=None):
+    """
+    Converts the flat buffers of a mesh with triangle and quad faces, see
+    from_tessfaces, directly into a welded vertex stream, without building
+    the 1-based index triples first. Corners share a vertex if they have the
+    same vertex and the same uv and normal after rounding to 6 digits.
+    Returns vertices, uvs, normals and the (T, 3) 0-based index buffer like
+    bobj.weld.
+    """
+    coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    vertexnormals = np.asarray(vertexnormals, dtype=np.float32).reshape(-1, 3)
+    facevertices = np.asarray(facevertices, dtype=np.int32).reshape(-1, 4)
+    facesmooth = np.asarray(facesmooth, dtype=bool)
+    facenormals = np.asarray(facenormals, dtype=np.float32).reshape(-1, 3)
+    faceindex, slots = split_quads(facevertices)
+    loc = facevertices[faceindex, slots].ravel()
+    smooth = np.repeat(facesmooth[faceindex.ravel()], 3)
+    normals = np.where(smooth[:, np.newaxis], vertexnormals[loc], np.repeat(facenormals[faceindex.ravel()], 3, axis=0))
+    # adding 0 turns -0.0 into 0.0, so both get the same key
+    normals = np.round(normals.astype(np.float64), 6) + 0.0
+    columns = [loc[:, np.newaxis].astype(np.float64), normals]
+    uvs = np.empty((0, 2), dtype=np.float32)
+    if faceuvs is not None:
+        uvs = np.asarray(faceuvs, dtype=np.float32).reshape(-1, 4, 2)[faceindex, slots].reshape(-1, 2)
+        columns.append(np.round(uvs.astype(np.float64), 6) + 0.0)
+    keys = np.ascontiguousarray(np.concatenate(columns, axis=1))
+    # hash every corner as a whole, which is what bobj.weld does with the index triples
+    unique, first, inverse = np.unique(keys.view(np.dtype((np.void, keys.itemsize * keys.shape[1]))).ravel(),
+                                       return_index=True, return_inverse=True)
+    used, indices = first_use_order(inverse.reshape(-1, 3))
+    corners = first[used]
+    return (coords[loc[corners]], uvs[corners] if len(uvs) else uvs, normals[corners].astype(np.float32),
+            indices)
+
+
+def to_polygons(mesh):
+    """
+    Converts a meshio mesh into the flat arrays Blender builds meshes from:
+    'vertices' (3N,), 'loops' holding the vertex of every polygon corner,
+    'loopstart' and 'looptotal' of every polygon, 'smooth' flags and, if the
+    mesh has texture coordinates, 'uvs' (2L,) of every corner.
+
+    Triangle fans counted in the optional 'polygons' array of the mesh are
+    joined into their polygons again. Polygons whose corners use different
+    normals are smooth.
+    """
+    vertices = np.asarray(mesh['vertices'], dtype=np.float32).reshape(-1, 3)
+    uvs = np.asarray(mesh['uvs'], dtype=np.float32).reshape(-1, 2)
+    faces = np.asarray(mesh['faces'], dtype=np.int64).reshape(-1, 3, 3)
+    loc = faces[:, :, 0] - 1
+    loc[loc < 0] += len(vertices) + 1
+    triangles = np.asarray(mesh.get('polygons', np.ones(len(faces))), dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(triangles)[:-1])).astype(np.int64)
+    loops, looptotal = join_fans(loc, triangles)
+    normals = faces[:, :, 2]
+    smooth = (normals[:, 0] != normals[:, 1]) | (normals[:, 0] != normals[:, 2])
+    arrays = {'vertices': np.ascontiguousarray(vertices).ravel(),
+              'loops': loops.astype(np.int32),
+              'loopstart': np.concatenate(([0], np.cumsum(looptotal)[:-1])).astype(np.int32),
+              'looptotal': looptotal.astype(np.int32),
+              'smooth': np.logical_or.reduceat(smooth, starts) if len(faces) else np.zeros(0, dtype=bool)}
+    if len(uvs):
+        tex = faces[:, :, 1] - 1
+        tex[tex < 0] += len(uvs) + 1
+        tex[faces[:, :, 1] == 0] = 0
+        arrays['uvs'] = np.ascontiguousarray(uvs[join_fans(tex, triangles)[0]]).ravel()
+    return arrays
+
+
+def join_fans(corners, polygons=None):
+    """
+    Joins triangle fans into their polygons again. corners holds (T, 3, ...)
+    values of the triangle corners, polygons the number of triangles of each
+    fan like the optional 'polygons' array of a meshio mesh, by default one.
+    Returns the values of all polygon corners in order and the number of
+    corners of every polygon.
+    """
+    corners = np.asarray(corners)
+    triangles = np.ones(len(corners), dtype=np.int64) if polygons is None else np.asarray(polygons, dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(triangles)[:-1])).astype(np.int64)
+    # the first triangle of a fan contributes all corners, the others only their last one
+    emit = np.zeros(corners.shape[:2], dtype=bool)
+    emit[:, 2] = True
+    emit[starts[:len(triangles)], :2] = True
+    return corners[emit], triangles + 2
+
+
+def weld(vertices, distance=0.0001):
+    """
+    Merges vertices closer than distance, like Blender's remove doubles.
+    Vertices are sorted into a grid of cells of that size, so only the
+    vertices of neighbouring cells are compared. Every vertex is merged into
+    the first vertex within distance, chains are followed to their end.
+    Returns the index of the vertex every vertex is merged into.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    nvertices = len(vertices)
+    if not nvertices or distance <= 0:
+        return np.arange(nvertices)
+    cells = np.floor((vertices - vertices.min(axis=0)) / distance).astype(np.int64)
+    size = cells.max(axis=0) + 3
+    keys = ((cells[:, 0] + 1) * size[1] + cells[:, 1] + 1) * size[2] + cells[:, 2] + 1
+    order = np.argsort(keys, kind='stable')
+    sortedkeys = keys[order]
+    target = np.arange(nvertices)
+    for offset in np.stack(np.meshgrid((-1, 0, 1), (-1, 0, 1), (-1, 0, 1), indexing='ij'), axis=-1).reshape(-1, 3):
+        neighbourkeys = keys + (offset[0] * size[1] + offset[1]) * size[2] + offset[2]
+        start = np.searchsorted(sortedkeys, neighbourkeys, side='left')
+        count = np.searchsorted(sortedkeys, neighbourkeys, side='right') - start
+        # pair every vertex with all vertices in the neighbouring cell
+        owner = np.repeat(np.arange(nvertices), count)
+        other = order[np.repeat(start, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)]
+        close = np.einsum('ij,ij->i', vertices[owner] - vertices[other], vertices[owner] - vertices[other]) \
+            <= distance * distance
+        np.minimum.at(target, owner[close], other[close])
+    while True:
+        followed = target[target]
+        if np.array_equal(followed, target):
+            return target
+        target = followed
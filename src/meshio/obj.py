@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.obj
+    :platform: Unix, Windows, Mac
+    :synopsis: Reading and writing of Wavefront .obj meshes
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import re
+
+import numpy as np
+
+from .mesh import join_fans
+
+
+def write(filepath, mesh, name=None):
+    """
+    Writes a meshio mesh as a Wavefront .obj file with one object, keeping
+    the (vertex, uv, normal) indices of every triangle corner and joining
+    the triangle fans of the optional 'polygons' array into polygons.
+    """
+    vertices = np.asarray(mesh['vertices'], dtype=np.float64).reshape(-1, 3)
+    uvs = np.asarray(mesh['uvs'], dtype=np.float64).reshape(-1, 2)
+    normals = np.asarray(mesh['normals'], dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(mesh['faces'], dtype=np.int64).reshape(-1, 3, 3)
+    with open(filepath, 'w') as out:
+        out.write('# created with Phobos\n')
+        if name:
+            out.write('o %s\n' % name)
+        # format all elements of a kind at once rather than line by line
+        out.write(('v %.6f %.6f %.6f\n' * len(vertices)) % tuple(vertices.ravel()))
+        out.write(('vt %.6f %.6f\n' * len(uvs)) % tuple(uvs.ravel()))
+        out.write(('vn %.6f %.6f %.6f\n' * len(normals)) % tuple(normals.ravel()))
+        out.write(face_lines(faces, mesh.get('polygons')))
+
+
+def face_lines(faces, polygons=None):
+    """
+    Formats the face lines of an .obj file. Texture coordinates and normals
+    with index 0 are left out of the corner. Triangle fans counted in
+    polygons, like the optional 'polygons' array of a meshio mesh, are
+    written as one polygon each.
+    """
+    if not len(faces):
+        return ''
+    hasuv = faces[:, :, 1] != 0
+    hasnormal = faces[:, :, 2] != 0
+    uniform = hasuv.all() == hasuv.any() and hasnormal.all() == hasnormal.any()
+    if uniform and polygons is None:
+        corner, columns = {(True, True): ('%d/%d/%d', [0, 1, 2]),
+                           (True, False): ('%d/%d', [0, 1]),
+                           (False, True): ('%d//%d', [0, 2]),
+                           (False, False): ('%d', [0])}[(bool(hasuv.any()), bool(hasnormal.any()))]
+        return (('f ' + ' '.join([corner] * 3) + '\n') * len(faces)) % tuple(faces[:, :, columns].ravel())
+    # polygons and corners of different layouts are formatted with a pattern per corner
+    corners, looptotal = join_fans(faces, polygons)
+    present = corners != 0
+    present[:, 0] = True
+    patterns = np.array(['%d', '%d//%d', '%d/%d', '%d/%d/%d'])[present[:, 1] * 2 + present[:, 2]]
+    ends = np.cumsum(looptotal)
+    prefixes = np.full(len(corners), '', dtype='<U2')
+    prefixes[ends - looptotal] = 'f '
+    separators = np.full(len(corners), ' ')
+    separators[ends - 1] = '\n'
+    template = ''.join(np.char.add(np.char.add(prefixes, patterns), separators))
+    return template % tuple(corners[present])
+
+
+def read(filepath):
+    """
+    Reads the geometry of a Wavefront .obj file into a meshio mesh, see decode.
+    """
+    with open(filepath, 'rb') as stream:
+        return decode(stream.read())
+
+
+def material_libraries(data):
+    """
+    Returns the names of the material libraries (.mtl files) the content of a
+    Wavefront .obj file refers to with mtllib statements.
+    """
+    names = []
+    for line in re.findall(rb'^[ \t]*mtllib[ \t]+(.*?)[ \t]*\r?$', data, re.MULTILINE):
+        names.extend(line.decode('utf-8', 'replace').split())
+    return names
+
+
+def has_normals(data):
+    """
+    Returns whether the content of a Wavefront .obj file has vertex normals
+    (vn statements).
+    """
+    return re.search(rb'^[ \t]*vn[ \t]', data, re.MULTILINE) is not None
+
+
+def decode(data):
+    """
+    Decodes the content of a Wavefront .obj file into a meshio mesh. Polygons
+    are split into triangle fans, whose number of triangles is kept in the
+    additional (P,) array 'polygons', and relative indices are resolved.
+    Objects, groups and materials are ignored, so all faces end up in a
+    single mesh.
+    """
+    elements = {'v': [], 'vt': [], 'vn': []}
+    faces = []
+    polygons = []
+    counts = {'v': 0, 'vt': 0, 'vn': 0}
+    for line in data.decode('utf-8', 'replace').splitlines():
+        values = line.split()
+        if not values:
+            continue
+        key = values[0]
+        if key in elements:
+            elements[key].append(values[1:4 if key != 'vt' else 3])
+            counts[key] += 1
+        elif key == 'f':
+            corners = []
+            for corner in values[1:]:
+                indices = (corner.split('/') + ['', ''])[:3]
+                triple = []
+                for index, kind in zip(indices, ('v', 'vt', 'vn')):
+                    index = int(index) if index else 0
+                    # resolve relative indices with the number of elements read so far
+                    triple.append(counts[kind] + index + 1 if index < 0 else index)
+                corners.append(triple)
+            for i in range(1, len(corners) - 1):
+                faces.append((corners[0], corners[i], corners[i + 1]))
+            if len(corners) > 2:
+                polygons.append(len(corners) - 2)
+    return {'vertices': np.array(elements['v'], dtype=np.float32).reshape(-1, 3),
+            'uvs': np.array(elements['vt'], dtype=np.float32).reshape(-1, 2),
+            'normals': np.array(elements['vn'], dtype=np.float32).reshape(-1, 3),
+            'faces': np.array(faces, dtype=np.int32).reshape(-1, 3, 3),
+            'polygons': np.array(polygons, dtype=np.int32)}
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# coding=utf-8
+
+"""
+.. module:: phobos.meshio.stl
+    :platform: Unix, Windows, Mac
+    :synopsis: Reading and writing of binary .stl meshes
+
+.. moduleauthor:: Kai von Szadowski, Ole Schwiegert
+
+Copyright 2014, University of Bremen & DFKI GmbH Robotics Innovation Center
+
+This file is part of Phobos, a Blender Add-On to edit robot models.
+
+Phobos is free software: you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License
+as published by the Free Software Foundation, either version 3
+of the License, or (at your option) any later version.
+
+Phobos is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License
+along with Phobos.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+# 80 byte header and triangle count, followed by one record per triangle
+header_size = 84
+record_dtype = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+
+def triangles(mesh):
+    """
+    Returns the corner positions of all triangles of a meshio mesh as a
+    (T, 3, 3) array.
+    """
+    vertices = np.asarray(mesh['vertices'], dtype=np.float32).reshape(-1, 3)
+    loc = np.asarray(mesh['faces'], dtype=np.int64).reshape(-1, 3, 3)[:, :, 0] - 1
+    loc[loc < 0] += len(vertices) + 1
+    return vertices[loc]
+
+
+def facet_normals(corners):
+    """
+    Computes the unit normals of triangles given as (T, 3, 3) corner positions.
+    Degenerate triangles get a zero normal.
+    """
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def encode(corners, header=b'Binary STL created with Phobos'):
+    """
+    Encodes triangles given as (T, 3, 3) corner positions as a binary .stl.
+    """
+    corners = np.asarray(corners, dtype=np.float32).reshape(-1, 3, 3)
+    records = np.zeros(len(corners), dtype=record_dtype)
+    records['vertices'] = corners
+    records['normal'] = facet_normals(corners)
+    return header[:80].ljust(80, b'\0') + np.uint32(len(corners)).astype('<u4').tobytes() + records.tobytes()
+
+
+def write(filepath, mesh):
+    """
+    Writes the triangles of a meshio mesh as a binary .stl file. Normals are
+    recomputed from the triangles, uvs are not part of the format.
+    """
+    with open(filepath, 'wb') as out:
+        out.write(encode(triangles(mesh)))
+
+
+def read(filepath):
+    """
+    Reads a binary or ASCII .stl file into a meshio mesh, see decode.
+    """
+    with open(filepath, 'rb') as stream:
+        return decode(stream.read())
+
+
+def decode(data):
+    """
+    Decodes the content of a binary or ASCII .stl file into a meshio mesh.
+    Corners with the same position share a vertex and every triangle gets
+    its facet normal.
+    """
+    count = int(np.frombuffer(data, '<u4', 1, 80)[0]) if len(data) >= header_size else -1
+    size = header_size + count * record_dtype.itemsize
+    # ASCII files may be long enough to pass for binary ones, but hardly of the exact size
+    if count >= 0 and (len(data) == size or (len(data) > size and not data.lstrip()[:5] == b'solid')):
+        records = np.frombuffer(data, record_dtype, count, header_size)
+        return from_corners(records['vertices'], records['normal'])
+    if data.lstrip()[:5] == b'solid':
+        return from_corners(*ascii_corners(data))
+    raise ValueError('data is no stl file')
+
+
+def ascii_corners(data):
+    """
+    Returns the (T, 3, 3) corner positions and (T, 3) facet normals of the
+    triangles of an ASCII .stl file.
+    """
+    tokens = data.split()
+    corners = [tokens[i + 1:i + 4] for i, token in enumerate(tokens) if token == b'vertex']
+    normals = [tokens[i + 2:i + 5] for i, token in enumerate(tokens) if token == b'facet']
+    corners = np.array(corners, dtype=np.float32).reshape(-1, 3, 3)
+    normals = np.array(normals, dtype=np.float32).reshape(-1, 3)
+    if len(corners) != len(normals):
+        raise ValueError('data is no valid ascii stl file')
+    return corners, normals
+
+
+def from_corners(corners, normals):
+    """
+    Creates a meshio mesh from (T, 3, 3) triangle corners and (T, 3) facet
+    normals, merging corners with the same position into one vertex.
+    """
+    count = len(corners)
+    corners = np.ascontiguousarray(corners, dtype=np.float32).reshape(-1, 3)
+    unique, first, inverse = np.unique(corners.view(np.dtype((np.void, 12))).ravel(),
+                                       return_index=True, return_inverse=True)
+    # number the vertices in order of their first use
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    faces = np.empty((count, 3, 3), dtype=np.int32)
+    faces[:, :, 0] = rank[inverse.ravel()].reshape(-1, 3) + 1
+    faces[:, :, 1] = 0
+    faces[:, :, 2] = np.arange(1, count + 1, dtype=np.int32)[:, np.newaxis]
+    return {'vertices': corners[first[order]], 'uvs': np.empty((0, 2), dtype=np.float32),
+            'normals': np.array(normals, dtype=np.float32).reshape(-1, 3), 'faces': faces}
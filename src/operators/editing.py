@@ -46,6 +46,7 @@ import phobos.utils.naming as nUtils
 import phobos.joints as joints
 import phobos.sensors as sensors
 import phobos.links as links
+from phobos.lod import createLevelsOfDetail
 from phobos.logging import startLog, endLog, log
 
 
@@ -228,8 +229,11 @@ class SyncMassesOperator(Operator):
                 masssum += obj['mass']
             link['mass'] = masssum
             link['masschanged'] = t.isoformat()
-            if self.updateinertial:
-                inertia.createInertials(link)
+        if self.updateinertial:
+            cache = inertia.loadInertiaCache()
+            inertia.updateInertials(*inertia.deriveInertials([bpy.data.objects[linkname] for linkname in links],
+                                                             cache=cache))
+            inertia.saveInertiaCache(cache)
         return {'FINISHED'}
 
 
@@ -584,18 +588,17 @@ class CreateInertialOperator(Operator):
     def execute(self, context):
         links = [obj for obj in context.selected_objects if obj.phobostype == 'link']
         show_progress = bpy.app.version[0] * 100 + bpy.app.version[1] >= 269
+        progress = None
         if show_progress:
             wm = context.window_manager
-            total = float(len(links))
-            wm.progress_begin(0, total)
-            i = 1
-        for link in links:
-            inertia.createInertials(link, not self.auto_compute, self.preserve_children)
-            if show_progress:
-                wm.progress_update(i)
-                i += 1
+            wm.progress_begin(0, float(len(links)))
+            progress = wm.progress_update
+        cache = inertia.loadInertiaCache()
+        inertials = inertia.deriveInertials(links, not self.auto_compute, self.preserve_children, cache, progress)
         if show_progress:
             wm.progress_end()
+        inertia.updateInertials(*inertials)
+        inertia.saveInertiaCache(cache)
         return {'FINISHED'}
 
 
@@ -1280,6 +1283,46 @@ class RefineLevelOfDetailOperator(Operator):
         return ob is not None and ob.phobostype == 'visual'
 
 
+class GenerateLevelOfDetailOperator(Operator):
+    """Generate decimated levels of detail for the selected visual objects"""
+    bl_idname = "object.phobos_generate_lod"
+    bl_label = "Generate Level of Detail"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    levels = IntProperty(
+        name="Levels",
+        description="Number of decimated levels",
+        default=3,
+        min=1,
+        max=4
+    )
+
+    ratio = FloatProperty(
+        name="Ratio",
+        description="Fraction of triangles kept from one level to the next",
+        default=0.5,
+        min=0.01,
+        max=0.99
+    )
+
+    distance = FloatProperty(
+        name="Distance",
+        description="Distance between the start distances of the levels",
+        default=5.0,
+        min=0.0
+    )
+
+    def execute(self, context):
+        startLog(self)
+        createLevelsOfDetail(context.selected_objects, self.levels, self.ratio, self.distance)
+        endLog()
+        return {'FINISHED'}
+
+    @classmethod
+    def poll(cls, context):
+        return any(obj.phobostype == 'visual' and obj.type == 'MESH' for obj in context.selected_objects)
+
+
 class AddHeightmapOperator(Operator):
     """Add a heightmap object to the 3D-Cursors location"""
     bl_idname = "object.phobos_add_heightmap"
@@ -1411,6 +1454,7 @@ def register():
     bpy.utils.register_class(AddSensorOperator)
     bpy.utils.register_class(CreateMimicJointOperator)
     bpy.utils.register_class(RefineLevelOfDetailOperator)
+    bpy.utils.register_class(GenerateLevelOfDetailOperator)
     bpy.utils.register_class(AddHeightmapOperator)
 
 
@@ -1444,4 +1488,5 @@ def unregister():
     bpy.utils.unregister_class(AddSensorOperator)
     bpy.utils.unregister_class(CreateMimicJointOperator)
     bpy.utils.unregister_class(RefineLevelOfDetailOperator)
+    bpy.utils.unregister_class(GenerateLevelOfDetailOperator)
     bpy.utils.unregister_class(AddHeightmapOperator)
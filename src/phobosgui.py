@@ -62,10 +62,31 @@ def register():
     bpy.types.World.relativePath = BoolProperty(name='relative path', default=True)
     bpy.types.World.heightmapMesh = BoolProperty(name='export heightmap as mesh', default=False)
     bpy.types.World.useBobj = BoolProperty(name="useBobj", update=updateExportOptions)
+    bpy.types.World.useBobjV2 = BoolProperty(name="useBobjV2", default=False,
+                                             description="Write .bobj files in the version 2 container format")
+    bpy.types.World.bobjCompression = EnumProperty(
+        name="bobjCompression",
+        items=(('none',) * 3, ('zlib',) * 3, ('lzma',) * 3),
+        default='none',
+        description="Compression of the sections of version 2 .bobj files")
+    bpy.types.World.bobjQuantize = BoolProperty(name="bobjQuantize", default=False,
+                                                description="Store vertices and normals of version 2 .bobj files as 16 bit integers")
+    bpy.types.World.bobjIndexed = BoolProperty(name="bobjIndexed", default=False,
+                                               description="Weld vertices of version 2 .bobj files into an indexed vertex stream")
+    bpy.types.World.bobjOptimizeCache = BoolProperty(name="bobjOptimizeCache", default=False,
+                                                     description="Reorder the triangles of indexed .bobj files for the vertex cache (slow, about 2.5 seconds per 100k triangles)")
     bpy.types.World.useObj = BoolProperty(name="useObj", update=updateExportOptions)
     bpy.types.World.useStl = BoolProperty(name="useStl", update=updateExportOptions)
     bpy.types.World.useDae = BoolProperty(name="useDae", update=updateExportOptions)
+    bpy.types.World.useMeshOperators = BoolProperty(name="useMeshOperators", default=False,
+                                                    description="Export .obj and .dae meshes with Blender's exporters instead of writing them directly")
     bpy.types.World.exportMeshes = BoolProperty(name="exportMeshes", update=updateExportOptions)
+    bpy.types.World.meshExportWorkers = IntProperty(name="meshExportWorkers", default=0, min=0,
+                                                    description="Number of threads encoding mesh files, 0 uses one per CPU core. Compressed .bobj files profit most, .obj and .dae text formatting runs one at a time")
+    bpy.types.World.useMeshCache = BoolProperty(name="useMeshCache", default=True,
+                                                description="Skip meshes whose geometry has not changed since the last export")
+    bpy.types.World.meshImportCache = StringProperty(name="meshImportCache", default="", subtype='DIR_PATH',
+                                                     description="Folder keeping decoded meshes between sessions, empty to disable")
     bpy.types.World.exportTextures = BoolProperty(name="exportTextures", update=updateExportOptions)
     bpy.types.World.exportCustomData = BoolProperty(name="exportCustomData", update=updateExportOptions)
     bpy.types.World.exportMARSscene = BoolProperty(name="exportMARSscene", update=updateExportOptions)
@@ -305,6 +326,7 @@ class PhobosModelPanel(bpy.types.Panel):
         c1.operator('object.phobos_sort_objects_to_layers', text="Set Objects to Layers", icon='IMGDISPLAY')
         c1.operator('object.phobos_smoothen_surface', text="Smoothen Surface")
         c1.operator('object.phobos_refine_lod', text="Refine LoD")
+        c1.operator('object.phobos_generate_lod', text="Generate LoD")
 
         c2.operator('object.phobos_partial_rename', text="Partial Rename")
         c2.operator('object.phobos_batch_property', text='Edit Custom Property', icon='GREASEPENCIL')
@@ -429,11 +451,24 @@ class PhobosExportPanel(bpy.types.Panel):
         c1 = inlayout.column(align=True)
         c1.label(text="Mesh export")
         c1.prop(bpy.data.worlds[0], "exportMeshes", text="Export Meshes")
+        if bpy.data.worlds[0].exportMeshes:
+            c1.prop(bpy.data.worlds[0], "useMeshCache", text="Skip unchanged meshes")
+            c1.prop(bpy.data.worlds[0], "meshExportWorkers", text="Worker threads")
 
         c1.prop(bpy.data.worlds[0], "useBobj", text="Use .bobj format")
+        if bpy.data.worlds[0].useBobj:
+            c1.prop(bpy.data.worlds[0], "useBobjV2", text="Write .bobj version 2")
+            if bpy.data.worlds[0].useBobjV2:
+                c1.prop(bpy.data.worlds[0], "bobjCompression", text="Compression")
+                c1.prop(bpy.data.worlds[0], "bobjQuantize", text="Quantize to 16 bit")
+                c1.prop(bpy.data.worlds[0], "bobjIndexed", text="Indexed vertices")
+                if bpy.data.worlds[0].bobjIndexed:
+                    c1.prop(bpy.data.worlds[0], "bobjOptimizeCache", text="Optimize for vertex cache")
         c1.prop(bpy.data.worlds[0], "useObj", text="Use .obj format")
         c1.prop(bpy.data.worlds[0], "useStl", text="Use .stl format")
         c1.prop(bpy.data.worlds[0], "useDae", text="Use .dae format")
+        if bpy.data.worlds[0].useObj or bpy.data.worlds[0].useDae:
+            c1.prop(bpy.data.worlds[0], "useMeshOperators", text="Use Blender's exporters")
         if bpy.data.worlds[0].useObj:
             labeltext = ".obj is used"
         elif bpy.data.worlds[0].useBobj:
@@ -459,6 +494,7 @@ class PhobosExportPanel(bpy.types.Panel):
         ec1.operator("object.phobos_export_robot", text="Export Robot Model", icon="PASTEDOWN")
         ec2 = layout.column(align=True)
         ec2.operator("obj.import_robot_model", text="Import Robot Model", icon="COPYDOWN")
+        ec2.prop(bpy.data.worlds[0], "meshImportCache", text="Mesh cache")
 
         layout.separator()
         layout.label(text="Baking")
@@ -0,0 +1,57 @@
+# coding=utf-8
+
+"""
+Makes the Blender-free modules of src importable as top-level modules, e.g.
+meshio and inertiamath. src is appended rather than prepended to the path,
+as its logging module would otherwise shadow the standard library.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+
+def box_mesh(size=(1.0, 1.0, 1.0), center=(0.0, 0.0, 0.0)):
+    """
+    Returns a closed box of the given size as a meshio mesh with outward
+    facing triangles, one uv per corner and one normal per face.
+    """
+    signs = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+    vertices = (signs * 0.5 * np.asarray(size) + np.asarray(center)).astype(np.float32)
+    # quads as 0-based vertex indices, counter-clockwise seen from outside
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    normals = np.array([(-1, 0, 0), (1, 0, 0), (0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1)], dtype=np.float32)
+    uvs = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=np.float32)
+    faces = []
+    for n, (a, b, c, d) in enumerate(quads):
+        faces.append(((a + 1, 1, n + 1), (b + 1, 2, n + 1), (c + 1, 3, n + 1)))
+        faces.append(((a + 1, 1, n + 1), (c + 1, 3, n + 1), (d + 1, 4, n + 1)))
+    return {'vertices': vertices, 'uvs': uvs, 'normals': normals, 'faces': np.array(faces, dtype=np.int32)}
+
+
+def grid_mesh(n, height=None):
+    """
+    Returns an n x n quad grid of the unit square split into triangles, flat
+    or displaced along z by height(x, y).
+    """
+    x, y = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1), indexing='ij')
+    z = np.zeros_like(x) if height is None else height(x, y)
+    vertices = np.stack((x, y, z), axis=-1).reshape(-1, 3).astype(np.float32)
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    a = (i * (n + 1) + j).ravel()
+    b, c, d = a + n + 1, a + n + 2, a + 1
+    loc = np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)))
+    faces = np.zeros((len(loc), 3, 3), dtype=np.int32)
+    faces[:, :, 0] = loc + 1
+    faces[:, :, 2] = 1
+    return {'vertices': vertices, 'uvs': np.empty((0, 2), dtype=np.float32),
+            'normals': np.array([(0, 0, 1)], dtype=np.float32), 'faces': faces}
+
+
+@pytest.fixture
+def box():
+    return box_mesh()
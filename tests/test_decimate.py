@@ -0,0 +1,109 @@
+# coding=utf-8
+
+import time
+
+import numpy as np
+
+from meshio import decimate, mesh
+from conftest import grid_mesh
+
+
+def grid_triangles(n):
+    mesh = grid_mesh(n)
+    return mesh['vertices'], mesh['faces'][:, :, 0] - 1
+
+
+def uv_sphere(rings, segments):
+    """
+    Returns the vertices and outward facing 0-based triangles of a closed
+    unit sphere with the given numbers of rings and segments.
+    """
+    theta = np.linspace(0, np.pi, rings + 1)[1:-1, np.newaxis]
+    phi = np.linspace(0, 2 * np.pi, segments, endpoint=False)[np.newaxis, :]
+    ring = np.stack(np.broadcast_arrays(np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)),
+                    axis=-1).reshape(-1, 3)
+    vertices = np.concatenate(([(0, 0, 1)], ring, [(0, 0, -1)]))
+    south = len(vertices) - 1
+    triangles = []
+    for s in range(segments):
+        t = (s + 1) % segments
+        triangles.append((0, 1 + s, 1 + t))
+        for r in range(rings - 2):
+            a, b = 1 + r * segments + s, 1 + r * segments + t
+            triangles.extend([(a, a + segments, b + segments), (a, b + segments, b)])
+        last = 1 + (rings - 2) * segments
+        triangles.append((south, last + t, last + s))
+    return vertices, np.array(triangles)
+
+
+def edge_counts(triangles):
+    edges = np.sort(np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]]), axis=1)
+    return np.unique(edges, axis=0, return_counts=True)[1]
+
+
+def test_flat_grid_ratio():
+    # flat regions have many edges of equal error, which must not serialize the passes
+    vertices, triangles = grid_triangles(60)
+    start = time.perf_counter()
+    newvertices, newtriangles = decimate.decimate(vertices, triangles, ratio=0.25)
+    assert time.perf_counter() - start < 5
+    assert len(newtriangles) <= 0.3 * len(triangles)
+    np.testing.assert_array_equal(newvertices[:, 2], 0)
+    np.testing.assert_allclose(newvertices.min(axis=0)[:2], (0, 0))
+    np.testing.assert_allclose(newvertices.max(axis=0)[:2], (1, 1))
+
+
+def test_flat_grid_tolerance():
+    vertices, triangles = grid_triangles(60)
+    start = time.perf_counter()
+    newvertices, newtriangles = decimate.decimate(vertices, triangles, ratio=0, tolerance=1e-4)
+    assert time.perf_counter() - start < 10
+    assert len(newtriangles) < 0.05 * len(triangles)
+    corners = newvertices[newtriangles].astype(np.float64)
+    areas = 0.5 * np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])[:, 2]
+    # the square is still covered once, without flipped triangles
+    assert (areas > 0).all()
+    assert abs(areas.sum() - 1) < 1e-6
+
+
+def test_curved_grid_keeps_shape():
+    mesh = grid_mesh(40, height=lambda x, y: 0.2 * np.sin(np.pi * x) * np.sin(np.pi * y))
+    vertices, triangles = decimate.decimate(mesh['vertices'], mesh['faces'][:, :, 0] - 1, tolerance=1e-3, ratio=0)
+    assert len(triangles) < len(mesh['faces'])
+    expected = 0.2 * np.sin(np.pi * vertices[:, 0]) * np.sin(np.pi * vertices[:, 1])
+    assert np.abs(vertices[:, 2] - expected).max() < 0.01
+
+
+def test_sphere_quality():
+    vertices, triangles = uv_sphere(32, 64)
+    newvertices, newtriangles = decimate.decimate(vertices, triangles, ratio=0.25)
+    assert len(newtriangles) <= 0.3 * len(triangles)
+    assert abs(np.linalg.norm(newvertices, axis=1) - 1).max() < 0.05
+    # the mesh stays closed and manifold
+    assert (edge_counts(newtriangles) == 2).all()
+
+
+def test_welded_box_sides():
+    # the sides of a box modelled separately, as merged by bakeModel
+    vertices, triangles = grid_triangles(30)
+    vertices = vertices.astype(np.float64) - (0.5, 0.5, -0.5)
+    rotations = [np.identity(3), np.diag([1, -1, -1]), [[1, 0, 0], [0, 0, -1], [0, 1, 0]],
+                 [[1, 0, 0], [0, 0, 1], [0, -1, 0]], [[0, 0, 1], [0, 1, 0], [-1, 0, 0]],
+                 [[0, 0, -1], [0, 1, 0], [1, 0, 0]]]
+    sides = np.concatenate([vertices.dot(np.transpose(rotation)) for rotation in rotations])
+    sidetriangles = np.concatenate([triangles + side * len(vertices) for side in range(6)])
+    sidetriangles = mesh.weld(sides)[sidetriangles]
+    start = time.perf_counter()
+    newvertices, newtriangles = decimate.decimate(sides, sidetriangles, ratio=0, tolerance=0.001)
+    assert time.perf_counter() - start < 5
+    assert len(newtriangles) < 100
+    assert (edge_counts(newtriangles) == 2).all()
+    # all vertices stay on the surface of the box
+    np.testing.assert_allclose(np.abs(newvertices).max(axis=1), 0.5, atol=1e-6)
+
+
+def test_decimate_mesh():
+    mesh = decimate.decimate_mesh(grid_mesh(20), ratio=0.5)
+    assert len(mesh['faces']) <= 0.55 * 800
+    assert len(mesh['normals']) == len(mesh['faces'])
+    np.testing.assert_allclose(np.abs(mesh['normals'][:, 2]), 1, atol=1e-6)
@@ -0,0 +1,137 @@
+# coding=utf-8
+
+import numpy as np
+import pytest
+
+import inertiamath
+from conftest import box_mesh, grid_mesh
+
+
+def mesh_triangles(mesh):
+    return mesh['vertices'][mesh['faces'][:, :, 0] - 1]
+
+
+def test_mesh_box():
+    size, center = (1.0, 2.0, 3.0), (0.5, -1.0, 2.0)
+    volume, com, inertia = inertiamath.mesh(mesh_triangles(box_mesh(size, center)), 6.0)
+    assert volume == pytest.approx(6.0)
+    np.testing.assert_allclose(com, center, atol=1e-12)
+    # the mesh inertia refers to the origin
+    np.testing.assert_allclose(inertia, inertiamath.shift(6.0, center, inertiamath.box(6.0, size)), atol=1e-9)
+
+
+def test_mesh_without_volume():
+    with pytest.raises(ValueError):
+        inertiamath.mesh(mesh_triangles(grid_mesh(4)), 1.0)
+    with pytest.raises(ValueError):
+        inertiamath.mesh(np.zeros((0, 3, 3)), 1.0)
+
+
+def random_rotations(rng, count):
+    rotations = np.linalg.qr(rng.standard_normal((count, 3, 3)))[0]
+    # proper rotations only
+    rotations[np.linalg.det(rotations) < 0, :, 0] *= -1
+    return rotations
+
+
+def random_inertias(rng, count):
+    # principal moments fulfilling the triangle inequality, rotated arbitrarily
+    moments = rng.uniform(1, 2, (count, 3))
+    return inertiamath.rotate(inertiamath.diagonal(moments[:, 0], moments[:, 1], moments[:, 2]),
+                              random_rotations(rng, count), passive=False)
+
+
+def test_primitives():
+    np.testing.assert_allclose(inertiamath.box(12.0, (1.0, 2.0, 3.0)), np.diag((13.0, 10.0, 5.0)))
+    np.testing.assert_allclose(inertiamath.cylinder(12.0, 1.0, 2.0), np.diag((7.0, 7.0, 6.0)))
+    np.testing.assert_allclose(inertiamath.sphere(5.0, 2.0), np.diag((8.0, 8.0, 8.0)))
+    np.testing.assert_allclose(inertiamath.ellipsoid(5.0, (1.0, 2.0, 3.0)), np.diag((13.0, 10.0, 5.0)))
+    # primitives accept arrays of bodies
+    boxes = inertiamath.box([1.0, 2.0], [(1.0, 1.0, 1.0), (2.0, 2.0, 2.0)])
+    np.testing.assert_allclose(boxes, [np.identity(3) / 6, np.identity(3) * 4 / 3])
+
+
+def test_capsule():
+    # the capsule lies between the cylinder of its length and the one of its inner part
+    mass, radius, length = 2.0, 0.2, 1.0
+    capsule = np.diag(inertiamath.capsule(mass, radius, length))
+    assert capsule[0] < np.diag(inertiamath.cylinder(mass, radius, length))[0]
+    assert capsule[0] > np.diag(inertiamath.cylinder(mass, radius, length - 2 * radius))[0]
+    assert capsule[0] == capsule[1]
+    capsules = inertiamath.capsule([mass, 1.0], [radius, 0.1], [length, 0.5])
+    np.testing.assert_allclose(capsules[0], inertiamath.capsule(mass, radius, length))
+    np.testing.assert_allclose(capsules[1], inertiamath.capsule(1.0, 0.1, 0.5))
+
+
+def test_list_roundtrip():
+    values = np.array([1.0, 0.1, 0.2, 2.0, 0.3, 3.0])
+    inertia = inertiamath.from_list(values)
+    np.testing.assert_array_equal(inertia, inertia.T)
+    np.testing.assert_array_equal(inertiamath.to_list(inertia), values)
+    np.testing.assert_array_equal(inertiamath.from_list(np.stack((values, 2 * values)))[1], 2 * inertia)
+
+
+def test_shift_roundtrip():
+    rng = np.random.default_rng(1)
+    masses, coms, inertias = rng.uniform(1, 2, 5), rng.standard_normal((5, 3)), random_inertias(rng, 5)
+    point = rng.standard_normal(3)
+    shifted = inertiamath.shift(masses, coms, inertias, point)
+    # moving the point back to the center of mass removes the term the shift added
+    np.testing.assert_allclose(shifted - inertiamath.shift(masses, point, np.zeros((5, 3, 3)), coms), inertias)
+    np.testing.assert_allclose(inertiamath.shift(masses, coms, inertias, coms), inertias)
+    # the shift about a point on the axis of a moment adds m d^2 to the other moments
+    np.testing.assert_allclose(inertiamath.shift(2.0, (0, 0, 3), np.zeros((3, 3))), np.diag((18.0, 18.0, 0.0)))
+
+
+def test_rotate_roundtrip():
+    rng = np.random.default_rng(2)
+    inertias, rotations = random_inertias(rng, 5), random_rotations(rng, 5)
+    passive = inertiamath.rotate(inertias, rotations)
+    np.testing.assert_allclose(inertiamath.rotate(passive, rotations, passive=False), inertias, atol=1e-12)
+    # rotations keep the principal moments
+    np.testing.assert_allclose(np.linalg.eigvalsh(passive), np.linalg.eigvalsh(inertias))
+
+
+def test_fuse_two_halves():
+    # two halves of a box fuse into the whole box
+    size = np.array((2.0, 1.0, 1.0))
+    half = inertiamath.box(1.0, (1.0, 1.0, 1.0))
+    mass, com, inertia = inertiamath.fuse([1.0, 1.0], [(-0.5, 0, 0), (0.5, 0, 0)], [np.identity(3)] * 2, [half] * 2)
+    assert mass == 2.0
+    np.testing.assert_allclose(com, (0, 0, 0))
+    np.testing.assert_allclose(inertia, inertiamath.box(2.0, size))
+
+
+def test_fuse_rotated():
+    # a rotation by 30 degrees about z of a body with products of inertia, which R^T I R would not match
+    c, s = np.cos(np.pi / 6), np.sin(np.pi / 6)
+    rotation = np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+    body = np.array([[2.0, 0.3, 0.1], [0.3, 3.0, -0.2], [0.1, -0.2, 4.0]])
+    mass, com, inertia = inertiamath.fuse([3.0], [(1.0, 2.0, 3.0)], [rotation], [body])
+    np.testing.assert_allclose(com, (1.0, 2.0, 3.0))
+    expected = rotation.dot(body).dot(rotation.T)
+    assert not np.allclose(expected, rotation.T.dot(body).dot(rotation))
+    np.testing.assert_allclose(inertia, expected, atol=1e-12)
+
+
+def test_fuse_groups():
+    rng = np.random.default_rng(3)
+    count = 12
+    masses, coms = rng.uniform(1, 2, count), rng.standard_normal((count, 3))
+    rotations, inertias = random_rotations(rng, count), random_inertias(rng, count)
+    groups = np.array([2, 0, 1, 2, 0, 0, 1, 2, 2, 0, 1, 1])
+    total_masses, common_coms, total_inertias = inertiamath.fuse(masses, coms, rotations, inertias, groups)
+    assert total_masses.shape == (3,) and common_coms.shape == (3, 3) and total_inertias.shape == (3, 3, 3)
+    for group in range(3):
+        members = groups == group
+        mass, com, inertia = inertiamath.fuse(masses[members], coms[members], rotations[members], inertias[members])
+        assert total_masses[group] == pytest.approx(mass)
+        np.testing.assert_allclose(common_coms[group], com)
+        np.testing.assert_allclose(total_inertias[group], inertia)
+
+
+def test_fuse_empty():
+    mass, com, inertia = inertiamath.fuse([], np.zeros((0, 3)), np.zeros((0, 3, 3)), np.zeros((0, 3, 3)))
+    assert mass == 0.0
+    np.testing.assert_array_equal(com, np.zeros(3))
+    np.testing.assert_array_equal(inertia, np.zeros((3, 3)))
@@ -0,0 +1,305 @@
+# coding=utf-8
+
+import struct
+
+import numpy as np
+import pytest
+
+import meshio
+from meshio import bobj, obj, stl
+from conftest import box_mesh
+
+
+def triangles(mesh):
+    """
+    Returns position, uv and normal of every triangle corner, which is what
+    survives any change of the indexing.
+    """
+    faces = np.asarray(mesh['faces'], dtype=np.int64)
+    positions = np.asarray(mesh['vertices'])[faces[:, :, 0] - 1]
+    uvs = np.asarray(mesh['uvs'])[faces[:, :, 1] - 1] if len(mesh['uvs']) else None
+    normals = np.asarray(mesh['normals'])[faces[:, :, 2] - 1]
+    return positions, uvs, normals
+
+
+def assert_same_triangles(actual, expected, atol=0.0):
+    for a, e in zip(triangles(actual), triangles(expected)):
+        if e is None:
+            assert a is None
+        else:
+            np.testing.assert_allclose(a, e, atol=atol)
+
+
+@pytest.mark.parametrize('options', [{'version': 1}, {'version': 2}, {'version': 2, 'compression': 'zlib'},
+                                     {'version': 2, 'compression': 'lzma'}, {'version': 2, 'indexed': True},
+                                     {'version': 2, 'indexed': True, 'optimize_cache': True},
+                                     {'version': 2, 'compression': 'zlib', 'indexed': True}])
+def test_bobj_roundtrip(tmp_path, box, options):
+    path = str(tmp_path / 'box.bobj')
+    bobj.write(path, box, **options)
+    assert_same_triangles(bobj.read(path), box)
+    with open(path, 'rb') as stream:
+        assert_same_triangles(bobj.decode(stream.read()), box)
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'lzma'])
+def test_bobj_quantized_roundtrip(tmp_path, compression):
+    mesh = box_mesh((0.2, 0.5, 1.0), (1.0, -2.0, 0.5))
+    path = str(tmp_path / 'box.bobj')
+    bobj.write(path, mesh, version=2, compression=compression, quantize=True)
+    # vertices keep 16 bit of their bounding box, normals 16 bit of [-1, 1]
+    assert_same_triangles(bobj.read(path), mesh, atol=1.0 / 32767)
+
+
+def test_bobj_v1_records(box):
+    # version 1 is the legacy stream of tagged records written by Blender's bobj exporter
+    expected = b''.join([struct.pack('ifff', 1, *v) for v in box['vertices'].tolist()] +
+                        [struct.pack('iff', 2, *uv) for uv in box['uvs'].tolist()] +
+                        [struct.pack('ifff', 3, *n) for n in box['normals'].tolist()] +
+                        [struct.pack('i' * 10, 4, *np.ravel(face).tolist()) for face in box['faces']])
+    assert b''.join(bobj.pack(box['vertices'], box['uvs'], box['normals'], box['faces'])) == expected
+
+
+def test_bobj_v1_interleaved_records(box):
+    # records of older files may come in any order, e.g. vertex by vertex with their normals
+    data = b''.join(struct.pack('ifff', 1, *v) + struct.pack('ifff', 3, 0, 0, 1) for v in box['vertices'].tolist())
+    records = bobj.decode(data)
+    np.testing.assert_array_equal(records['vertices'], box['vertices'])
+    assert len(records['normals']) == len(box['vertices'])
+    assert len(records['faces']) == 0
+
+
+def test_bobj_convert(tmp_path, box):
+    v1, v2, back = (str(tmp_path / name) for name in ('v1.bobj', 'v2.bobj', 'back.bobj'))
+    bobj.write(v1, box)
+    bobj.convert(v1, v2, compression='lzma')
+    bobj.convert(v2, back, version=1)
+    with open(v1, 'rb') as original, open(back, 'rb') as converted:
+        assert original.read() == converted.read()
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_bobj_read_arrays(tmp_path, box, use_mmap):
+    path = str(tmp_path / 'box.bobj')
+    bobj.write(path, box, version=2)
+    vertices, loc, cornertex = bobj.read_arrays(path, use_mmap=use_mmap)
+    np.testing.assert_array_equal(vertices[loc], triangles(box)[0])
+    np.testing.assert_array_equal(cornertex, triangles(box)[1])
+
+
+@pytest.mark.parametrize('options', [{'version': 1}, {'version': 2, 'compression': 'zlib'},
+                                     {'version': 2, 'indexed': True}])
+def test_bobj_read_mmap(tmp_path, box, options):
+    path = str(tmp_path / 'box.bobj')
+    bobj.write(path, box, **options)
+    expected = bobj.read(path)
+    mesh = bobj.read(path, use_mmap=True)
+    for name in expected:
+        np.testing.assert_array_equal(mesh[name], expected[name])
+        # the arrays must not refer to the closed mapping
+        assert mesh[name].flags.owndata
+
+
+def test_obj_roundtrip(tmp_path, box):
+    path = str(tmp_path / 'box.obj')
+    obj.write(path, box, name='box')
+    mesh = obj.read(path)
+    assert_same_triangles(mesh, box, atol=1e-6)
+    assert mesh['polygons'].tolist() == [1] * len(box['faces'])
+
+
+def test_obj_decode_polygons():
+    data = b'\n'.join([b'o quad', b'v 0 0 0', b'v 1 0 0', b'v 1 1 0', b'v 0 1 0', b'vn 0 0 1',
+                       b'usemtl ignored', b'f 1//1 2//1 3//1 4//1', b'f -4 -2 -1'])
+    mesh = obj.decode(data)
+    assert mesh['faces'][:, :, 0].tolist() == [[1, 2, 3], [1, 3, 4], [1, 3, 4]]
+    assert mesh['faces'][:, :, 2].tolist() == [[1, 1, 1], [1, 1, 1], [0, 0, 0]]
+    assert mesh['polygons'].tolist() == [2, 1]
+
+
+def test_obj_material_libraries():
+    assert obj.material_libraries(b'v 0 0 0\nusemtl red\nf 1 1 1\n') == []
+    data = b'# mtllib commented.mtl\r\nmtllib base.mtl  extra.mtl\r\n  mtllib arm.mtl\nv 0 0 0\n'
+    assert obj.material_libraries(data) == ['base.mtl', 'extra.mtl', 'arm.mtl']
+
+
+def test_obj_has_normals():
+    assert not obj.has_normals(b'v 0 0 0\nvt 0 0\n# vn 0 0 1\nf 1 1 1\n')
+    assert obj.has_normals(b'v 0 0 0\r\n  vn 0 0 1\r\nf 1//1 1//1 1//1\r\n')
+
+
+def test_obj_face_lines():
+    faces = np.array([[[1, 0, 1], [2, 0, 1], [3, 0, 1]], [[1, 1, 0], [2, 2, 0], [3, 3, 0]]])
+    assert obj.face_lines(faces[:1]) == 'f 1//1 2//1 3//1\n'
+    assert obj.face_lines(faces) == 'f 1//1 2//1 3//1\nf 1/1 2/2 3/3\n'
+
+
+def test_stl_roundtrip(tmp_path, box):
+    path = str(tmp_path / 'box.stl')
+    stl.write(path, box)
+    mesh = stl.read(path)
+    assert len(mesh['vertices']) == len(box['vertices'])
+    np.testing.assert_array_equal(stl.triangles(mesh), stl.triangles(box))
+    # facet normals are recomputed from the winding
+    np.testing.assert_allclose(mesh['normals'], box['normals'][box['faces'][:, 0, 2] - 1], atol=1e-6)
+
+
+def test_stl_ascii():
+    data = b'''solid test
+      facet normal 0 0 1
+        outer loop
+          vertex 0 0 0
+          vertex 1 0 0
+          vertex 0 1 0
+        endloop
+      endfacet
+    endsolid test'''
+    mesh = stl.decode(data)
+    np.testing.assert_array_equal(stl.triangles(mesh), [[[0, 0, 0], [1, 0, 0], [0, 1, 0]]])
+    np.testing.assert_array_equal(mesh['normals'], [[0, 0, 1]])
+    with pytest.raises(ValueError):
+        stl.decode(b'no mesh')
+
+
+@pytest.mark.parametrize('extension', ['.bobj', '.obj', '.stl'])
+def test_convert(tmp_path, box, extension):
+    source = str(tmp_path / 'box.bobj')
+    target = str(tmp_path / ('converted' + extension))
+    meshio.write(source, box, version=2)
+    meshio.convert(source, target)
+    np.testing.assert_allclose(stl.triangles(meshio.read(target)), stl.triangles(box), atol=1e-6)
+    with pytest.raises(ValueError):
+        meshio.module_for('box.ply')
+
+
+def test_obj_face_lines_mixed_corners():
+    faces = np.array([[[1, 1, 1], [2, 0, 1], [3, 2, 0]], [[12, 0, 0], [13, 0, 0], [14, 3, 0]]])
+    assert obj.face_lines(faces) == 'f 1/1/1 2//1 3/2\nf 12 13 14/3\n'
+
+
+@pytest.mark.parametrize('options', [{}, {'compression': 'zlib'}, {'quantize': True}, {'indexed': True}])
+def test_bobj_truncated(tmp_path, box, options):
+    path = str(tmp_path / 'box.bobj')
+    bobj.write(path, box, version=2, **options)
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    for size in (bobj.v2_header.size + 4, len(data) - 1):
+        with open(path, 'wb') as out:
+            out.write(data[:size])
+        with pytest.raises(ValueError):
+            bobj.read(path)
+        with pytest.raises(ValueError):
+            bobj.decode(data[:size])
+
+
+def test_bobj_section_out_of_range(tmp_path, box):
+    sections = bobj.pack(box['vertices'], box['uvs'], box['normals'], box['faces'], version=2)
+    values = list(bobj.v2_header.unpack(sections[0]))
+    values[-1] += 1 << 20
+    path = str(tmp_path / 'box.bobj')
+    with open(path, 'wb') as out:
+        out.write(b''.join([bobj.v2_header.pack(*values)] + sections[1:]))
+    with pytest.raises(ValueError):
+        bobj.read(path)
+
+
+def tessface_buffers(smooth, withuvs=True):
+    """
+    Returns the flat buffers Blender's tessfaces give for a box of six quads
+    and one triangle with the given smooth flags.
+    """
+    box = box_mesh()
+    coords = box['vertices']
+    facevertices = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3), (1, 5, 7, 0)]
+    facenormals = np.concatenate((box['normals'], [(0, 0, 1)]))
+    rng = np.random.default_rng(1)
+    faceuvs = np.tile(box['uvs'], (7, 1))
+    faceuvs[-4:] = rng.random((4, 2))
+    return {'coords': coords.ravel(), 'vertexnormals': (coords / np.linalg.norm(coords, axis=1)[:, None]).ravel(),
+            'facevertices': np.array(facevertices, dtype=np.int32).ravel(), 'facesmooth': np.array(smooth, dtype=bool),
+            'facenormals': facenormals.ravel(), 'faceuvs': faceuvs.ravel() if withuvs else None}
+
+
+@pytest.mark.parametrize('smooth', [[False] * 7, [True] * 7, [True, False] * 3 + [True]])
+@pytest.mark.parametrize('withuvs', [True, False])
+def test_weld_tessfaces(smooth, withuvs):
+    buffers = tessface_buffers(smooth, withuvs)
+    mesh = meshio.mesh.from_tessfaces(**buffers)
+    expected = bobj.weld(mesh['vertices'], mesh['uvs'], mesh['normals'], mesh['faces'])
+    actual = meshio.mesh.weld_tessfaces(**buffers)
+    np.testing.assert_array_equal(actual[3], expected[3])
+    for a, e in zip(actual[:3], expected[:3]):
+        np.testing.assert_allclose(a, e, atol=1e-6)
+
+
+def test_from_polygons():
+    # a quad, a pentagon and a triangle, the quad flat and the others smooth
+    coords = np.array([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0), (2, 0, 0), (2, 1, 0), (1.5, 2, 0)], dtype=np.float32)
+    loops = np.array([0, 1, 2, 3, 1, 4, 5, 6, 2, 3, 2, 6], dtype=np.int32)
+    looptotal = np.array([4, 5, 3])
+    loopstart = np.array([0, 4, 9])
+    vertexnormals = np.tile([0, 0, 1], (7, 1)).astype(np.float32)
+    vertexnormals[6] = (0, 0.6, 0.8)
+    mesh = meshio.mesh.from_polygons(coords, vertexnormals, loops, loopstart, looptotal, [False, True, True],
+                                     [(0, 0, 1)] * 3, coords[loops, :2])
+    assert mesh['polygons'].tolist() == [2, 3, 1]
+    np.testing.assert_array_equal(mesh['faces'][:2, :, 0], [[1, 2, 3], [1, 3, 4]])
+    assert len(mesh['normals']) == 2
+    corners, looptotal = meshio.mesh.join_fans(mesh['faces'], mesh['polygons'])
+    assert corners[:, 0].tolist() == (loops + 1).tolist()
+    np.testing.assert_allclose(mesh['uvs'][corners[:, 1] - 1], coords[loops, :2])
+
+
+def test_obj_dae_polygons(tmp_path):
+    data = b'\n'.join([b'v 0 0 0', b'v 1 0 0', b'v 1 1 0', b'v 0 1 0', b'v 2 0 0', b'vt 0 0', b'vn 0 0 1',
+                       b'f 1/1/1 2/1/1 3/1/1 4/1/1', b'f 2/1/1 5/1/1 3/1/1'])
+    mesh = obj.decode(data)
+    path = str(tmp_path / 'quad.obj')
+    obj.write(path, mesh)
+    with open(path) as stream:
+        assert [line for line in stream.read().splitlines() if line.startswith('f ')] == \
+            ['f 1/1/1 2/1/1 3/1/1 4/1/1', 'f 2/1/1 5/1/1 3/1/1']
+    path = str(tmp_path / 'quad.dae')
+    meshio.dae.write(path, mesh, name='quad')
+    with open(path) as stream:
+        text = stream.read()
+    assert '<polylist count="2">' in text and '<vcount>4 3</vcount>' in text
+    assert '<p>0 0 0 1 0 0 2 0 0 3 0 0 1 0 0 4 0 0 2 0 0</p>' in text
+
+
+def test_index_rounded_rows():
+    rng = np.random.default_rng(2)
+    ties = (rng.integers(-10 ** 6, 10 ** 6, (500, 3)) + 0.5) / 1e6
+    rows = np.concatenate((rng.random((500, 3)), ties, ties.astype(np.float32), [(0.0, -0.0, 1.0), (-0.0, 0.0, 1.0)]))
+    rows = rows[rng.integers(0, len(rows), 3000)].astype(np.float32)
+    keys = {}
+    expected = []
+    for row in rows.tolist():
+        key = tuple(round(c, 6) for c in row)
+        expected.append(keys.setdefault(key, len(keys)))
+    index, rounded = meshio.mesh.index_rounded_rows(rows)
+    assert index.tolist() == expected
+    np.testing.assert_array_equal(rounded, list(keys))
+
+
+@pytest.mark.parametrize('version, flags', [(3, 0), (2, 16)])
+def test_bobj_unsupported_header(tmp_path, box, version, flags):
+    sections = bobj.pack(box['vertices'], box['uvs'], box['normals'], box['faces'], version=2)
+    values = list(bobj.v2_header.unpack(sections[0]))
+    values[1:3] = version, flags
+    data = b''.join([bobj.v2_header.pack(*values)] + sections[1:])
+    path = str(tmp_path / 'box.bobj')
+    with open(path, 'wb') as out:
+        out.write(data)
+    with pytest.raises(ValueError, match='unsupported'):
+        bobj.read(path)
+    with pytest.raises(ValueError, match='unsupported'):
+        bobj.decode(data)
+
+
+def test_bobj_v1_unreadable_record(box):
+    data = b''.join(bobj.pack(box['vertices'], box['uvs'], box['normals'], box['faces']))
+    with pytest.raises(ValueError, match='offset %d' % (len(data) - 40)):
+        bobj.decode(data[:-6])
+    with pytest.raises(ValueError, match='offset 16'):
+        bobj.decode(data[:16] + struct.pack('i', 9) + data[20:])